@@ -1,16 +1,17 @@
 import sys
 import time
+import queue
 import threading
-import pyvisa
-from pyvisa.constants import Parity, StopBits
 from PyQt6.QtWidgets import (
-    QApplication, QWidget, QLabel, QLineEdit, QPushButton,QTextEdit,QHeaderView,QTableWidget,QTabWidget,
-    QVBoxLayout, QHBoxLayout, QComboBox, QGridLayout, QMessageBox, QStackedLayout, QTableWidgetItem,QFileDialog,QListView
+    QApplication, QWidget, QLabel, QLineEdit, QPushButton,QTextEdit,QHeaderView,QTableView,QTabWidget,
+    QVBoxLayout, QHBoxLayout, QComboBox, QGridLayout, QMessageBox, QStackedLayout, QFileDialog,QListView,
+    QCheckBox
 )
+import numpy as np
 import pyqtgraph as pg
 import random
 from PyQt6.QtGui import QColor
-from PyQt6.QtCore import QThread, QObject, pyqtSignal,Qt, pyqtSignal,QObject, pyqtSignal,QTimer,pyqtSlot,QEventLoop 
+from PyQt6.QtCore import pyqtSignal, Qt, QTimer
 
 from PyQt6.QtGui import QPixmap
 from PyQt6.QtWidgets import QGraphicsOpacityEffect
@@ -21,6 +22,18 @@ import os
 
 # from i_power_meter_gui import ControlScreen as PowerControlScreen
 from i_exg_n5173B import ControlScreen as RFControlScreen
+from sweep_engine import SweepEngine, SweepPlan, VERIFY_MODES
+from sweep_planner import ORDERS, format_progress
+from sweep_axis import linear_axis, list_axis
+from settling import SETTLE_MODES, SettleConfig
+from records import format_time, rf_derived, CompressionReference
+from results_store import ColumnStore
+from records_model import RecordsTableModel, fmt_plain, fmt_fixed, fmt_time
+from live_plot import LiveCurve, PlotRefresher
+from result_writer import ResultWriter, RESULT_FORMATS
+from instrument_discovery import InstrumentDiscovery, INSTRUMENT_KINDS
+from ngp800_driver import ngp800_for
+from trace_panel import TracePanel
 
 class IntroScreen(QWidget):
     def __init__(self, on_next_callback):
@@ -92,6 +105,8 @@ class IntroScreen(QWidget):
         self.setLayout(layout)
 
 class MultiInstrumentConnectScreen(QWidget):
+    discovery_done = pyqtSignal(object, object, str)  # kinds, {kind: (instr, idn)}, error
+
     def __init__(self, on_all_connected):
         super().__init__()
         self.on_all_connected = on_all_connected
@@ -100,6 +115,13 @@ class MultiInstrumentConnectScreen(QWidget):
         self.exg_instr = None
         self.nrx_instr = None
 
+        # One discovery service for all three instruments (parallel probe + cache)
+        self.discovery = InstrumentDiscovery(log=self.log)
+        self.scanning = False
+        self.instr_attrs = {"ngp800": "ngp800_instr", "exg": "exg_instr", "power_meter": "nrx_instr"}
+        self.kind_names = {"ngp800": "NGP800", "exg": "EXG", "power_meter": "NRX"}
+        self.discovery_done.connect(self.on_discovery_done)
+
         self.init_ui()
 
     def log(self, msg):
@@ -109,6 +131,10 @@ class MultiInstrumentConnectScreen(QWidget):
         layout = QVBoxLayout()
         layout.addWidget(QLabel("Connect to all instruments below:"))
 
+        self.all_button = QPushButton("Connect All")
+        self.all_button.clicked.connect(self.connect_all)
+        layout.addWidget(self.all_button, alignment=Qt.AlignmentFlag.AlignHCenter)
+
         # NGP800
         self.ngp800_status = QLabel("NGP800: Not connected")
         self.ngp800_button = QPushButton("Connect NGP800")
@@ -171,8 +197,10 @@ class MultiInstrumentConnectScreen(QWidget):
         for lbl in [self.ngp800_status, self.exg_status, self.nrx_status]:
             lbl.setStyleSheet(status_style)
 
+        self.status_labels = {"ngp800": self.ngp800_status, "exg": self.exg_status, "power_meter": self.nrx_status}
+
         # Buttons
-        for btn in [self.ngp800_button, self.exg_button, self.nrx_button]:
+        for btn in [self.all_button, self.ngp800_button, self.exg_button, self.nrx_button]:
             btn.setStyleSheet(button_style)
             btn.setFixedWidth(300)
 
@@ -180,127 +208,60 @@ class MultiInstrumentConnectScreen(QWidget):
         self.setLayout(layout)
 
     def connect_ngp800(self):
-        self.log("Scanning for NGP800...")
-        self.ngp800_status.setText("NGP800: Scanning...")
-        QApplication.processEvents()
-        try:
-            rm = pyvisa.ResourceManager()
-            resources = rm.list_resources()
-            self.log(f"Resources found: {resources}")
-            for res in resources:
-                if not ("USB" in res or res.startswith("ASRL")):
-                    self.log(f"Skipping unrelated resource: {res}")
-                    continue
-                try:
-                    self.log(f"Trying: {res}")
-                    instr = rm.open_resource(res)
-
-                    if res.startswith("ASRL"):
-                        instr.baud_rate = 115200
-                        instr.data_bits = 8
-                        instr.stop_bits = StopBits.one
-                        instr.parity = Parity.none
-                        instr.timeout = 2000
-                        instr.write_termination = '\n'
-                        instr.read_termination = '\n'
-                    else:
-                        instr.timeout = 2000
-
-                    idn = instr.query("*IDN?").strip()
-                    self.log(f"IDN for {res}: {idn}")
-
-                    if "NGP800" in idn or "NGP824" in idn  :
-                        self.ngp800_instr = instr
-                        self.ngp800_status.setText(f"Connected to: {idn}")
-                        self.ngp800_button.setEnabled(False)
-                        self.check_all_connected()
-                        return
-                    instr.close()
-                except Exception as e:
-                    self.log(f"Error connecting to {res}: {e}")
-            self.ngp800_status.setText("NGP800 not found.")
-        except Exception as e:
-            self.log(f"NGP800 VISA error: {e}")
-            self.ngp800_status.setText(f"Error: {e}")
+        self.start_discovery(("ngp800",))
 
+    def connect_exg(self):
+        self.start_discovery(("exg",))
 
+    def connect_nrx(self):
+        self.start_discovery(("power_meter",))
 
+    def connect_all(self):
+        self.start_discovery(INSTRUMENT_KINDS)
 
-    def connect_exg(self):
-        self.log("Scanning for EXG Signal Generator...")
-        self.exg_status.setText("EXG: Scanning...")
-        QApplication.processEvents()
-        try:
-            rm = pyvisa.ResourceManager()
-            resources = rm.list_resources()
-            self.log(f"Resources found: {resources}")
-            for res in resources:
-                if not res.startswith("USB"):
-                    self.log(f"Skipping non-USB resource: {res}")
-                    continue
-                try:
-                    self.log(f"Trying: {res}")
-                    instr = rm.open_resource(res)
-                    instr.timeout = 2000
-                    idn = instr.query("*IDN?").strip()
-                    self.log(f"IDN for {res}: {idn}")
-                    if "N5173B" in idn:
-                        self.exg_instr = instr
-                        self.exg_status.setText(f"Connected to: {idn}")
-                        self.exg_button.setEnabled(False)
-                        self.check_all_connected()
-                        return
-                    instr.close()
-                except Exception as e:
-                    self.log(f"Error connecting to {res}: {e}")
-            self.exg_status.setText("EXG not found.")
-        except Exception as e:
-            self.log(f"EXG VISA error: {e}")
-            self.exg_status.setText(f"Error: {e}")
-
+    def start_discovery(self, kinds):
+        # Probe on a background thread; results come back through discovery_done
+        kinds = [kind for kind in kinds if getattr(self, self.instr_attrs[kind]) is None]
+        if not kinds or self.scanning:
+            return
+        self.scanning = True
+        for kind in kinds:
+            self.status_labels[kind].setText(f"{self.kind_names[kind]}: Scanning...")
+        for btn in [self.all_button, self.ngp800_button, self.exg_button, self.nrx_button]:
+            btn.setEnabled(False)
 
+        exclude = {instr.resource_name for instr in (self.ngp800_instr, self.exg_instr, self.nrx_instr)
+                   if instr is not None}
+        threading.Thread(target=self.run_discovery, args=(kinds, exclude), daemon=True).start()
 
-    def connect_nrx(self):
-        self.log("Scanning for NRX Power Meter...")
-        self.nrx_status.setText("NRX: Scanning...")
-        QApplication.processEvents()
+    def run_discovery(self, kinds, exclude):
         try:
-            rm = pyvisa.ResourceManager()
-            resources = rm.list_resources()
-            self.log(f"Resources found: {resources}")
-            for res in resources:
-                if not res.startswith("USB"):
-                    self.log(f"Skipping non-USB resource: {res}")
-                    continue
-                try:
-                    self.log(f"Trying: {res}")
-                    instr = rm.open_resource(res)
-                    instr.timeout = 2000
-                    idn = instr.query("*IDN?").strip()
-                    self.log(f"IDN for {res}: {idn}")
-                    if "NRX" in idn:
-                        self.nrx_instr_type = "NRX"
-                    elif "NRP2" in idn:
-                        self.nrx_instr_type = "NRP2"
-                    else:
-                        self.nrx_instr_type = "UNKNOWN"
-
-                    if "NRX" in idn or "NRP2" in idn or "Rohde & Schwarz" in idn:
-                        self.nrx_instr = instr
-                        self.nrx_instr.device_type = self.nrx_instr_type
-                        self.nrx_status.setText(f"Connected to: {idn}")
-                        self.nrx_button.setEnabled(False)
-                        self.check_all_connected()
-                        return
-                    instr.close()
-                except Exception as e:
-                    self.log(f"Error connecting to {res}: {e}")
-            self.nrx_status.setText("NRX not found.")
+            found = self.discovery.discover(kinds, exclude=exclude)
+            self.discovery_done.emit(kinds, found, "")
         except Exception as e:
-            self.log(f"NRX VISA error: {e}")
-            self.nrx_status.setText(f"Error: {e}")
-
-
+            self.discovery_done.emit(kinds, {}, str(e))
+
+    def on_discovery_done(self, kinds, found, error):
+        self.scanning = False
+        for kind in kinds:
+            label = self.status_labels[kind]
+            if kind in found:
+                instr, idn = found[kind]
+                setattr(self, self.instr_attrs[kind], instr)
+                label.setText(f"Connected to: {idn}")
+            elif error:
+                self.log(f"VISA error: {error}")
+                label.setText(f"Error: {error}")
+            else:
+                label.setText(f"{self.kind_names[kind]} not found.")
+        if self.nrx_instr is not None:
+            self.nrx_instr_type = self.nrx_instr.device_type
+
+        self.ngp800_button.setEnabled(self.ngp800_instr is None)
+        self.exg_button.setEnabled(self.exg_instr is None)
+        self.nrx_button.setEnabled(self.nrx_instr is None)
+        self.all_button.setEnabled(None in (self.ngp800_instr, self.exg_instr, self.nrx_instr))
+        self.check_all_connected()
 
     def check_all_connected(self):
         if self.ngp800_instr and self.exg_instr and self.nrx_instr:
@@ -308,178 +269,9 @@ class MultiInstrumentConnectScreen(QWidget):
             self.on_all_connected(self.ngp800_instr, self.exg_instr, self.nrx_instr)
 
 
-class SweepWorker(QObject):
-    update_plot = pyqtSignal(object, list, list)
-    log_msg = pyqtSignal(str)
-    finished = pyqtSignal()
-    start_work = pyqtSignal()
-    plot_ready = pyqtSignal(str)
-    plot_data_signal = pyqtSignal(object, list, list)
-    plot_init_signal = pyqtSignal(object, object)  # plot_widget, plot_data_item
-
-
-
-
-    def __init__(self, instrument, vg_chan, vd_chan,
-             vg_values, vd_values, vg_dur, vd_dur,
-             stop_event, pause_event,
-             vg_max=None, vd_max=None, curr_max=None,
-             rf_instr=None, pm_instr=None,  plot_target=None):
-        super().__init__()
-        self.instrument = instrument
-        self.vg_chan = vg_chan
-        self.vd_chan = vd_chan
-        self.vg_values = vg_values
-        self.vd_values = vd_values
-        self.vg_dur = vg_dur
-        self.vd_dur = vd_dur
-        self.stop_event = stop_event
-        self.pause_event = pause_event
-        self.vg_max = vg_max
-        self.vd_max = vd_max
-        self.curr_max = curr_max
-        self.rf_instr = rf_instr
-        self.pm_instr = pm_instr
-        self.plot_target = plot_target
-        
-
-        self._plot_items = []  # Prevent PlotDataItem from being garbage collected
-
-    @pyqtSlot()
-    def run(self):
-        self.log_msg.emit("SweepWorker started (RF only mode)")
-
-        try:
-            self.instrument.write(f"INST:NSEL {self.vd_chan}")
-            self.instrument.write("MEAS:CURR?")
-            current = float(self.instrument.read())
-
-            rf_freq = None
-            power_in = None
-            live_power = None
-
-            if self.rf_instr:
-                try:
-                    rf_freq = float(self.rf_instr.query("FREQ?").strip())
-                    power_in = float(self.rf_instr.query("POW?").strip())
-                except Exception as e:
-                    self.log_msg.emit(f"[WARNING] RF read failed: {e}")
-
-            if self.pm_instr:
-                try:
-                    time.sleep(0.5)
-                    if hasattr(self.pm_instr, "device_type") and self.pm_instr.device_type == "NRP2":
-                        response = self.pm_instr.query("READ?").strip()
-                    else:
-                        response = self.pm_instr.query("MEAS:POW?").strip()
-                    live_power = float(response)
-                except Exception as e:
-                    self.log_msg.emit(f"[WARNING] Power meter read failed: {e}")
-
-            timestamp = time.strftime("%H:%M:%S")
-            self.log_msg.emit(
-                f"[RECORD] {timestamp}, Vg={self.app.latest_vg}, Vd={self.app.latest_vd}, I={current:.8f} A, "
-                f"Freq={rf_freq}, PowerIN={power_in}, Power={live_power}"
-            )
-
-            self.log_msg.emit(f"Measured current: {current:.8f} A")
-
-        except Exception as e:
-            self.log_msg.emit(f"[ERROR] Exception in SweepWorker: {e}")
-
-        self.finished.emit()
-
-class RFSweepWorker(QObject):
-    finished = pyqtSignal()
-    log_msg = pyqtSignal(str)
-    update_plot = pyqtSignal(object, list, list)
-
-    def __init__(self, app, rf_powers, vg_chan, vd_chan, vg_values, vd_values, vg_dur, vd_dur):
-        super().__init__()
-        self.app = app
-        self.rf_powers = rf_powers
-        self.vg_chan = vg_chan
-        self.vd_chan = vd_chan
-        self.vg_values = vg_values
-        self.vd_values = vd_values
-        self.vg_dur = vg_dur
-        self.vd_dur = vd_dur
-
-    def run(self):
-        for rf_power in self.rf_powers:
-            if self.app.stop_event.is_set():
-                break
-            try:
-                self.app.exg_instr.write("OUTP OFF")
-                self.app.exg_instr.write(f"POW {rf_power} dBm")
-                self.app.exg_instr.write("OUTP ON")
-                self.log_msg.emit(f"RF Power set to {rf_power} dBm")
-                time.sleep(1)
-            except Exception as e:
-                self.log_msg.emit(f"Error setting RF power: {e}")
-                break
-
-            self.app.stop_event.clear()
-
-            # Create sweep worker
-            plot_target = self.app.rf_plot_widgets.get(rf_power)
-            worker = SweepWorker(
-                
-                self.app.instrument, self.vg_chan, self.vd_chan,
-                self.vg_values, self.vd_values, self.vg_dur, self.vd_dur,
-                self.app.stop_event, self.app.pause_event,
-                vg_max=self.app.vg_max, vd_max=self.app.vd_max, curr_max=self.app.curr_max,
-                rf_instr=self.app.exg_instr, pm_instr=self.app.nrx_instr,
-                plot_target=plot_target
-            )
-            worker.app = self.app
-
-            worker.plot_data_signal.connect(self.app.safe_update_plot)
-            worker.plot_init_signal.connect(self.app.safe_add_plot_item)
-
-            thread = QThread()
-            thread.setObjectName(f"SweepThread-{rf_power}")
-            worker.moveToThread(thread)
-
-            # Connect signals
-            worker.update_plot.connect(self.update_plot)
-            worker.log_msg.connect(self.log_msg)
-            worker.finished.connect(thread.quit)
-            worker.finished.connect(worker.deleteLater)
-            thread.finished.connect(thread.deleteLater)
-
-            # Qt event loop to wait for this specific sweep iteration
-            loop = QEventLoop()
-
-            def on_done():
-                self.app.rf_control_screen.rf_output_off()
-                loop.quit()
-                # Safe to call plot after loop quit
-                QTimer.singleShot(0, self.app.plot_pae_vs_powerin)
-
-
-            worker.finished.connect(on_done)
-            worker.plot_ready.connect(self.app.archive_plot_signal)
-
-            thread.started.connect(worker.run)
-            thread.start()
-            self.log_msg.emit(f"Started thread: {thread.objectName()}")
-            self.log_msg.emit("SweepWorker thread started")
-
-            loop.exec()  #  This runs the event loop and waits for quit()
-            thread.wait()
-
-            if self.app.stop_event.is_set():
-                self.log_msg.emit("Sweep interrupted. Exiting remaining steps.")
-                break
-
-        self.finished.emit()
-
 class NGP800IVSweepApp(QWidget):
     update_plot = pyqtSignal(object, list, list)  # name, x, y
     reset_ui = pyqtSignal()
-    rf_sweep_finished = pyqtSignal()
-    archive_plot_signal = pyqtSignal(str)
 
 
 
@@ -488,11 +280,9 @@ class NGP800IVSweepApp(QWidget):
         self.setWindowTitle("RF_Power_Sweep")
         self.update_plot.connect(self.handle_update_plot)
         self.reset_ui.connect(self.handle_reset_ui)
-        self.archive_plot_signal.connect(self.archive_current_plot)
 
 
-        self.rf_plot_widgets = {}  # Dict to hold RF Power => PlotWidget
-        self.rf_sweep_worker = None  # already there, just reusing
+        self.sweep_engine = None  # long-lived measurement thread, created once instruments connect
 
 
         self.stack = QStackedLayout()
@@ -511,19 +301,24 @@ class NGP800IVSweepApp(QWidget):
         self.pause_event = threading.Event()
         self.is_paused = False
         self.setup_records_ui()
- 
-    def archive_current_plot(self, rf_power_label):
-        pass
-    def safe_add_plot_item(self, plot_widget, plot_data_item):
-        try:
-            if plot_widget is not None and plot_data_item is not None:
-                plot_widget.addItem(plot_data_item)
-        except Exception as e:
-            self.log(f"[ERROR] Failed to safely add plot item: {e}")
 
+        # Drains the engine's result queue on the GUI thread
+        self.results_timer = QTimer(self)
+        self.results_timer.setInterval(50)
+        self.results_timer.timeout.connect(self.drain_engine_results)
+        # Plot redraws are capped at 20 Hz regardless of point rate
+        self.plot_refresher = PlotRefresher(self, interval_ms=50)
+        self.result_curves = []
+        self.curve_segment = None
+        self.sweep_total = 0
+        self.sweep_reordered = False
+        self.result_writer = None
+        self.compression = None
+ 
 
     def on_all_connected(self, ngp800, exg, nrx):
         self.instrument = ngp800
+        self.ngp = ngp800_for(ngp800)
         self.exg_instr = exg
         self.nrx_instr = nrx
         self.nrx_instr_type = getattr(nrx, "device_type", "UNKNOWN")
@@ -531,103 +326,129 @@ class NGP800IVSweepApp(QWidget):
         # Set RF control screen instrument before loading GUI
         self.rf_control_screen = RFControlScreen(self)
         self.rf_control_screen.set_instrument(self.exg_instr)
+
+        self.sweep_engine = SweepEngine(
+            self.instrument, self.exg_instr, self.nrx_instr,
+            self.stop_event, self.pause_event, rf_control=self.rf_control_screen
+        )
+        self.sweep_engine.start()
         
 
         QTimer.singleShot(4000, self.setup_config_ui)
 
+    def drain_engine_results(self):
+        # Curves are appended in add_record; plot_refresher's own timer redraws them
+        while True:
+            try:
+                kind, payload = self.sweep_engine.results.get_nowait()
+            except queue.Empty:
+                break
+
+            if kind == "log":
+                self.log(payload)
+            elif kind == "record":
+                self.add_record(payload)
+            elif kind == "progress":
+                self.progress_label.setText(format_progress(payload))
+            elif kind == "finished":
+                self.handle_reset_ui()
+
 
 
     def log(self, message):
         timestamp = time.strftime("%H:%M:%S")
         self.log_widget.append(f"[{timestamp}] {message}")
 
-        if not hasattr(self, "first_gain_value"):
-            self.first_gain_value = None
-
-        if message.startswith("[RECORD]"):
-            parts = message.replace("[RECORD]", "").strip().split(",")
-            time_str = parts[0].strip()
-            try:
-                vg_str = parts[1].split("=")[1].strip()
-                vd_str = parts[2].split("=")[1].strip()
-                curr_str = parts[3].split("=")[1].split()[0].strip()
-
-                vg = float(vg_str) if vg_str != "N/A" else 0.0
-                vd = float(vd_str) if vd_str != "N/A" else 0.0
-                curr = float(curr_str) if curr_str != "N/A" else 0.0
-            except Exception as e:
-                self.log(f"[ERROR] Failed to parse Vg/Vd/Current: {e}")
-                return  # or set defaults
-
-            freq = parts[4].split("=")[1] if len(parts) > 4 else "N/A"
-            power_out = parts[6].split("=")[1] if len(parts) > 6 else "N/A"
-            power_in = parts[5].split("=")[1] if len(parts) > 5 else "N/A"
-
-            try:
-                pout_dbm = float(power_out)
-                pin_dbm = float(power_in)
-
-                # Adjusted values
-                pin_actual = pin_dbm - self.input_loss_db + self.input_gain_db
-                pout_actual = pout_dbm + self.output_loss_db
-
-                # Convert to Watts
-                pout_w = 10 ** (pout_actual / 10) * 0.001
-                pin_w = 10 ** (pin_actual / 10) * 0.001
-
-                pin_mw_str = f"{pin_w * 1000:.8f}"
-                pout_mw_str = f"{pout_w * 1000:.8f}"
-
-
-                pin_w_str = f"{pin_w:.8f}"
-                pout_w_str = f"{pout_w:.8f}"
-
-
-                denominator = vd * curr
-                pae = (pout_w - pin_w) * 100 / denominator if denominator > 0 else -1
-                gain = pout_actual - pin_actual
-
-                if self.first_gain_value is None and isinstance(gain, (int, float)):
-                    self.first_gain_value = gain
-
-                if self.first_gain_value is not None and isinstance(gain, (int, float)):
-                    compression = self.first_gain_value - gain
-                    compression_str = f"{compression:.8f}"
-                else:
-                    compression_str = "N/A"
-
-
-                # String formats
-                pin_actual_str = f"{pin_actual:.8f}"
-                pout_actual_str = f"{pout_actual:.8f}"
-                pae_str = f"{pae:.8f}"
-                gain_str = f"{gain:.8f}"
-            except:
-                pin_actual_str = pout_actual_str = pae_str = gain_str = compression_str = "N/A"
-                pin_mw_str = pout_mw_str = "N/A"
-
-            row = self.records_table.rowCount()
-            self.records_table.insertRow(row)
-            self.records_table.setItem(row, 0, QTableWidgetItem(time_str))
-            self.records_table.setItem(row, 1, QTableWidgetItem(f"{vg}"))
-            self.records_table.setItem(row, 2, QTableWidgetItem(f"{vd}"))
-            self.records_table.setItem(row, 3, QTableWidgetItem(f"{curr:.8f}"))
-            self.records_table.setItem(row, 4, QTableWidgetItem(freq))
-            self.records_table.setItem(row, 5, QTableWidgetItem(power_in))
-            self.records_table.setItem(row, 6, QTableWidgetItem(power_out))
-            self.records_table.setItem(row, 7, QTableWidgetItem(pin_actual_str))   # PowerIN (actual)
-            self.records_table.setItem(row, 8, QTableWidgetItem(pout_actual_str))  # PowerOUT (actual)
-            self.records_table.setItem(row, 9, QTableWidgetItem(pin_mw_str))        # NEW: Pin_actual (mW)
-            self.records_table.setItem(row, 10, QTableWidgetItem(pout_mw_str))      # NEW: Pout_actual (mW)
-            self.records_table.setItem(row, 11, QTableWidgetItem(gain_str))        # GAIN (dB)
-            self.records_table.setItem(row, 12, QTableWidgetItem(compression_str)) # Compression
-            self.records_table.setItem(row, 13, QTableWidgetItem(pae_str))         # PAE (%)
+    def add_record(self, rec):
+        vg = rec.vg if rec.vg is not None else 0.0
+        vd = rec.vd if rec.vd is not None else 0.0
+        curr = rec.current if rec.current is not None else 0.0
+
+        values = {
+            "timestamp": rec.timestamp, "vg": vg, "vd": vd, "current": curr,
+            "ig": rec.ig, "vg_actual": rec.vg_actual, "vd_actual": rec.vd_actual,
+            "freq": rec.freq, "power_in": rec.power_in, "power_out": rec.power_out,
+            "point": rec.point,
+        }
+
+        # Pin or Pout not measured for this point: derived columns stay NaN
+        derived = rf_derived(rec.power_in, rec.power_out, vd, curr,
+                             self.input_loss_db, self.input_gain_db, self.output_loss_db)
+        if derived:
+            values.update(derived)
+
+        def text(value):
+            return "N/A" if value is None else f"{value}"
+
+        self.log(f"Point: Pin={text(rec.power_in)} dBm, Pout={text(rec.power_out)} dBm, I={curr:.8f} A")
+        self.append_result_curves(values)
+        # Recorded as measured; a segment's earlier rows get their compression
+        # on screen when its reference arrives, and in the file when it closes
+        late = self.compression.add(values)
+        self.records_model.append(values)
+        if self.result_writer:
+            self.result_writer.write(values)
+        if late:
+            self.records_model.update("point", late, "compression")
 
 
     def handle_update_plot(self, plot_data, x_vals, y_vals):
         pass
 
+    def browse_results_path(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Stream Results To", "", "CSV / HDF5 (*.csv *.h5);;All Files (*)")
+        if path:
+            self.results_path_input.setText(path)
+
+    def open_result_writer(self):
+        # Returns the records to resume after ([] for a fresh run), or None if cancelled
+        self.result_writer = None
+        path = self.results_path_input.text().strip()
+        if not path:
+            return []
+
+        writer = ResultWriter(path, self.results.columns, fmt=self.results_format_combo.currentText(),
+                              log=self.sweep_engine.log)
+        existing = writer.existing_rows()
+        resume = False
+        if existing:
+            answer = QMessageBox.question(
+                self, "Resume Sweep",
+                f"{len(existing)} records already in {', '.join(writer.paths())}.\n"
+                "Resume after the last record? (No overwrites the file.)",
+                QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No | QMessageBox.StandardButton.Cancel
+            )
+            if answer == QMessageBox.StandardButton.Cancel:
+                return None
+            resume = answer == QMessageBox.StandardButton.Yes
+
+        try:
+            writer.open(resume=resume)
+        except Exception as e:
+            QMessageBox.warning(self, "Results File Error", f"Failed to open results file: {e}")
+            return None
+        writer.start()
+        self.result_writer = writer
+        self.log(f"Streaming results to {', '.join(writer.paths())}")
+        return existing if resume else []
+
+    def close_result_writer(self, sort_by=None):
+        if self.result_writer:
+            fill = self.compression.fill if self.compression and self.compression.unfilled else None
+            self.result_writer.close(sort_by=sort_by, fill=fill)
+            self.log(f"Results file closed ({self.result_writer.written} records)")
+            self.result_writer = None
+
     def handle_reset_ui(self):
+        # A complete out-of-order run goes back to canonical grid order, on
+        # screen and on disk; a partial one stays in run order so it can resume
+        canonical = None
+        if self.sweep_reordered and len(self.results) >= self.sweep_total:
+            self.records_model.sort_by("point")
+            canonical = "point"
+            self.log("Records sorted back to canonical grid order")
+        self.sweep_reordered = False
+        self.close_result_writer(sort_by=canonical)
         self.run_button.setEnabled(True)
         self.pause_resume_button.setEnabled(False)
         self.stop_button.setEnabled(False)
@@ -641,15 +462,33 @@ class NGP800IVSweepApp(QWidget):
         layout = QVBoxLayout(self.records_widget)
 
 
-        self.records_table = QTableWidget()
-        self.records_table.setColumnCount(14)
-        self.records_table.setHorizontalHeaderLabels([
-            "Timestamp", "Vgate (V)", "Vdrain (V)", "Current (A)",
-            "RF Freq (Hz)", "PowerIN (dBm)", "PowerOUT (dBm)",
-            "PowerIN (actual)", "PowerOUT (actual)",
-            "Pin_actual (mW)", "Pout_actual (mW)",
-            "GAIN (dB)", "Compression","PAE (%)"
-        ])
+        # Columnar store is the system of record; the table is only a view on it
+        fmt8 = fmt_fixed(8)
+        record_columns = [
+            ("Timestamp", "timestamp", fmt_time),
+            ("Vgate (V)", "vg", fmt_plain),
+            ("Vdrain (V)", "vd", fmt_plain),
+            ("Current (A)", "current", fmt8),
+            ("Ig (A)", "ig", fmt8),
+            ("Vgate actual (V)", "vg_actual", fmt_fixed(4)),
+            ("Vdrain actual (V)", "vd_actual", fmt_fixed(4)),
+            ("RF Freq (Hz)", "freq", fmt_plain),
+            ("PowerIN (dBm)", "power_in", fmt_plain),
+            ("PowerOUT (dBm)", "power_out", fmt_plain),
+            ("PowerIN (actual)", "pin_actual", fmt8),
+            ("PowerOUT (actual)", "pout_actual", fmt8),
+            ("Pin_actual (mW)", "pin_mw", fmt8),
+            ("Pout_actual (mW)", "pout_mw", fmt8),
+            ("GAIN (dB)", "gain", fmt8),
+            ("Compression", "compression", fmt8),
+            ("PAE (%)", "pae", fmt8),
+            ("Grid Point", "point", fmt_fixed(0)),
+        ]
+        self.results = ColumnStore([(name, np.float64) for _, name, _ in record_columns])
+        self.records_model = RecordsTableModel(self.results, record_columns, self)
+
+        self.records_table = QTableView()
+        self.records_table.setModel(self.records_model)
         column_widths = [
             130,  # Timestamp
             100,  # Vgate
@@ -678,7 +517,7 @@ class NGP800IVSweepApp(QWidget):
 
 
         self.records_table.setStyleSheet("""
-            QTableWidget {
+            QTableView {
                 font-size: 11pt;
                 border: 1px solid #7aa9ff;
                 border-radius: 6px;
@@ -692,7 +531,7 @@ class NGP800IVSweepApp(QWidget):
                 padding: 6px;
                 border: 1px solid #a0c4ff;
             }
-            QTableWidget::item {
+            QTableView::item {
                 padding-left: 8px;
                 padding-right: 8px;
             }
@@ -752,20 +591,25 @@ class NGP800IVSweepApp(QWidget):
     def show_records_screen(self):
         self.stack.setCurrentWidget(self.records_widget)
 
+    def show_trace_panel(self):
+        if getattr(self, "trace_panel", None) is None:
+            self.trace_panel = TracePanel()
+        self.trace_panel.show()
+        self.trace_panel.raise_()
+
     def export_records_to_csv(self):
         path, _ = QFileDialog.getSaveFileName(self, "Save Records as CSV", "", "CSV Files (*.csv);;All Files (*)")
         if path:
             try:
                 with open(path, 'w') as f:
                     # Write header
-                    headers = [self.records_table.horizontalHeaderItem(i).text() for i in range(self.records_table.columnCount())]
-                    f.write(",".join(headers) + "\n")
-                    # Write table data
-                    for row in range(self.records_table.rowCount()):
-                        row_data = []
-                        for col in range(self.records_table.columnCount()):
-                            item = self.records_table.item(row, col)
-                            row_data.append(item.text() if item else "")
+                    f.write(",".join(self.records_model.headers()) + "\n")
+                    # Write data straight from the results store, full precision
+                    for row in range(len(self.results)):
+                        row_data = [format_time(self.results.value(row, "timestamp"))]
+                        for name in self.results.columns[1:]:
+                            value = self.results.value(row, name)
+                            row_data.append("N/A" if np.isnan(value) else repr(float(value)))
                         f.write(",".join(row_data) + "\n")
                 self.log(f"Records exported to {path}")
             except Exception as e:
@@ -790,10 +634,9 @@ class NGP800IVSweepApp(QWidget):
             vd_chan = self.vd_chan_combo.currentText().replace("CH", "")
             vg_chan = self.vg_chan_combo.currentText().replace("CH", "")
 
-            self.instrument.write(f"INST:NSEL {vd_chan}")
-            self.instrument.write(f"CURR {idrain}")
-            self.instrument.write(f"INST:NSEL {vg_chan}")
-            self.instrument.write(f"CURR {igate}")
+            with self.ngp.batch():
+                self.ngp.set_current_limit(vd_chan, idrain)
+                self.ngp.set_current_limit(vg_chan, igate)
 
             self.log(f"Set current limits: Vdrain CH{vd_chan} = {idrain} A, Vgate CH{vg_chan} = {igate} A")
 
@@ -839,6 +682,15 @@ class NGP800IVSweepApp(QWidget):
         rf_layout.addWidget(QLabel("Duration (s):"), 2, 2)
         rf_layout.addWidget(self.rf_control_screen.power_dur, 2, 3)
 
+        # Optional frequency axis (same unit as RF Frequency, which is the start)
+        rf_layout.addWidget(QLabel("Freq Step:"), 3, 0)
+        self.freq_step_input = QLineEdit()
+        self.freq_step_input.setPlaceholderText("blank = single frequency")
+        rf_layout.addWidget(self.freq_step_input, 3, 1)
+        rf_layout.addWidget(QLabel("Freq End:"), 3, 2)
+        self.freq_end_input = QLineEdit()
+        rf_layout.addWidget(self.freq_end_input, 3, 3)
+
         layout.addLayout(rf_layout)
 
         # Channel selectors
@@ -878,6 +730,12 @@ class NGP800IVSweepApp(QWidget):
         self.vd_input.setPlaceholderText("e.g. 5")
         grid.addWidget(self.vd_input, 1, 1)
 
+        # Optional drain bias axis: one power (x frequency) sweep per Vd
+        grid.addWidget(QLabel("Vdrain list (V):"), 1, 2)
+        self.vd_list_input = QLineEdit()
+        self.vd_list_input.setPlaceholderText("blank = single Vd; e.g. 5, 10, 15")
+        grid.addWidget(self.vd_list_input, 1, 3, 1, 2)
+
         # Single Vg input
         grid.addWidget(QLabel("Vgate (V):"), 2, 0)
         self.vg_input = QLineEdit()
@@ -897,6 +755,78 @@ class NGP800IVSweepApp(QWidget):
         self.set_curr_limits_button = QPushButton("Set Actual Limits")
         grid.addWidget(self.set_curr_limits_button, 3, 3)
 
+        # Settling model per RF step (Fixed uses the RF "Duration (s)" field)
+        grid.addWidget(QLabel("Settling:"), 4, 0)
+        self.settle_mode_combo = QComboBox()
+        self.settle_mode_combo.addItems(SETTLE_MODES)
+        grid.addWidget(self.settle_mode_combo, 4, 1)
+
+        grid.addWidget(QLabel("Id tol (%):"), 4, 2)
+        self.settle_curr_tol_input = QLineEdit("1")
+        grid.addWidget(self.settle_curr_tol_input, 4, 3)
+
+        grid.addWidget(QLabel("Pout tol (dB):"), 4, 4)
+        self.settle_pout_tol_input = QLineEdit("0.05")
+        grid.addWidget(self.settle_pout_tol_input, 4, 5)
+
+        grid.addWidget(QLabel("Max settle (s):"), 5, 0)
+        self.settle_max_input = QLineEdit("3")
+        grid.addWidget(self.settle_max_input, 5, 1)
+
+        # Continuous RF: change level with output ON instead of cycling OUTP per point
+        self.continuous_rf_checkbox = QCheckBox("Keep RF ON between points")
+        self.continuous_rf_checkbox.setChecked(True)
+        grid.addWidget(self.continuous_rf_checkbox, 5, 2, 1, 2)
+
+        # Hardware-timed: EXG list sweep + triggered, buffered meter; RF "Duration (s)" is the dwell
+        self.hardware_list_checkbox = QCheckBox("Hardware list sweep (EXG list + triggered meter)")
+        grid.addWidget(self.hardware_list_checkbox, 6, 0, 1, 4)
+
+        # Power meter acquisition: blank fields leave the meter's own settings untouched
+        grid.addWidget(QLabel("Meter avg count:"), 7, 0)
+        self.meter_avg_input = QLineEdit()
+        self.meter_avg_input.setPlaceholderText("e.g. 16")
+        grid.addWidget(self.meter_avg_input, 7, 1)
+
+        grid.addWidget(QLabel("Aperture (s):"), 7, 2)
+        self.meter_aperture_input = QLineEdit()
+        self.meter_aperture_input.setPlaceholderText("e.g. 0.02")
+        grid.addWidget(self.meter_aperture_input, 7, 3)
+
+        self.buffered_pout_checkbox = QCheckBox("Buffered Pout (fetch all at end)")
+        grid.addWidget(self.buffered_pout_checkbox, 7, 4, 1, 2)
+
+        # Streaming results file: every record goes to disk as it is measured
+        grid.addWidget(QLabel("Stream results to:"), 8, 0)
+        self.results_path_input = QLineEdit()
+        self.results_path_input.setPlaceholderText("blank = off")
+        grid.addWidget(self.results_path_input, 8, 1, 1, 2)
+        results_browse_button = QPushButton("Browse")
+        results_browse_button.clicked.connect(self.browse_results_path)
+        grid.addWidget(results_browse_button, 8, 3)
+        self.results_format_combo = QComboBox()
+        self.results_format_combo.addItems(RESULT_FORMATS)
+        grid.addWidget(self.results_format_combo, 8, 4)
+
+        # Records carry the commanded Freq/Pin; the EXG is only read back to verify
+        grid.addWidget(QLabel("EXG readback:"), 9, 0)
+        self.verify_rf_combo = QComboBox()
+        self.verify_rf_combo.addItems(VERIFY_MODES)
+        grid.addWidget(self.verify_rf_combo, 9, 1)
+        grid.addWidget(QLabel("Every N:"), 9, 2)
+        self.verify_every_input = QLineEdit("10")
+        grid.addWidget(self.verify_every_input, 9, 3)
+
+        # Point order for frequency / Vd grids; "Estimate" shows the plan and run time
+        grid.addWidget(QLabel("Sweep order:"), 10, 0)
+        self.sweep_order_combo = QComboBox()
+        self.sweep_order_combo.addItems(ORDERS)
+        self.sweep_order_combo.setCurrentText("Slow axis outer")
+        grid.addWidget(self.sweep_order_combo, 10, 1)
+        self.estimate_button = QPushButton("Estimate")
+        self.estimate_button.clicked.connect(self.estimate_sweep)
+        grid.addWidget(self.estimate_button, 10, 2)
+
 
         layout.addLayout(grid)
 
@@ -934,6 +864,8 @@ class NGP800IVSweepApp(QWidget):
         layout.addWidget(QLabel("All RF Power Sweep Plots: "))
         layout.addWidget(self.history_tabs)
 
+        self.progress_label = QLabel("")
+        layout.addWidget(self.progress_label)
 
         # Log output
         self.log_output = QLineEdit()
@@ -951,6 +883,11 @@ class NGP800IVSweepApp(QWidget):
         layout.addWidget(self.view_records_button)
         self.view_records_button.clicked.connect(self.show_records_screen)
 
+        # Per-command VISA timing of every instrument session
+        self.trace_button = QPushButton("VISA Trace")
+        layout.addWidget(self.trace_button)
+        self.trace_button.clicked.connect(self.show_trace_panel)
+
         # Style for input fields
         input_style = """
             QLineEdit {
@@ -1058,6 +995,9 @@ class NGP800IVSweepApp(QWidget):
         self.vg_max = None
         self.curr_max = None
 
+        self.results_timer.start()
+        self.plot_refresher.start()
+
 
     def emergency_stop_all(self):
         self.log("EMERGENCY STOP: Aborting sweep and turning off all devices.")
@@ -1069,9 +1009,7 @@ class NGP800IVSweepApp(QWidget):
             if self.instrument:
                 try:
                     if self.instrument:
-                        for ch in range(1, 5):
-                            self.instrument.write(f"INST:NSEL {ch}")
-                            self.instrument.write("OUTP OFF")
+                        self.ngp.outputs_off()
                         self.log("All NGP800 channels turned OFF.")
                 except Exception as e:
                     self.log(f"Failed to turn off NGP800 channels: {e}")
@@ -1100,16 +1038,11 @@ class NGP800IVSweepApp(QWidget):
                 return
 
             if self.instrument:
-                # Set Vgate
-                self.instrument.write(f"INST:NSEL {vg_chan}")
-                self.instrument.write(f"VOLT {vg}")
-                self.instrument.write("OUTP ON")
+                # Vgate first, then Vdrain, sent as one message
+                with self.ngp.batch():
+                    self.ngp.apply(vg_chan, vg)
+                    self.ngp.apply(vd_chan, vd)
                 self.log(f"Set Vgate to {vg} V on channel {vg_chan}")
-
-                # Set Vdrain
-                self.instrument.write(f"INST:NSEL {vd_chan}")
-                self.instrument.write(f"VOLT {vd}")
-                self.instrument.write("OUTP ON")
                 self.log(f"Set Vdrain to {vd} V on channel {vd_chan}")
         except Exception as e:
             QMessageBox.warning(self, "Set Error", f"Failed to set voltages: {e}")
@@ -1136,28 +1069,25 @@ class NGP800IVSweepApp(QWidget):
 
         try:
             # Turn off all channels (1 to 4)
-            for ch in range(1, 5):
-                self.instrument.write(f"INST:NSEL {ch}")
-                self.instrument.write("OUTP OFF")
+            self.ngp.outputs_off()
             self.log("All channels turned OFF.")
         except Exception as e:
             self.log(f"Failed to turn off channels: {e}")
-            
-        self.reset_ui.emit()
 
+        # A running plan resets the UI itself once the engine reports "finished"
+        if not (self.sweep_engine and self.sweep_engine.busy):
+            self.reset_ui.emit()
 
-    def run_sweep_threaded(self):
+
+    def build_sweep_plan(self):
+        # SweepPlan from the config inputs, or None after warning about a bad field.
+        # Touches no instrument, so it also backs the run time estimate.
         try:
             vg_value = float(self.vg_input.text())
             vd_value = float(self.vd_input.text())
             self.latest_vg = vg_value
             self.latest_vd = vd_value
 
-            vg_values = [vg_value]
-            vd_values = [vd_value]
-            vg_dur = 1.0  # use a fixed or configurable duration
-            vd_dur = 1.0
-
 
             # RF Power Sweep setup
             rf_start, rf_step, rf_end, rf_dur = self.rf_control_screen.get_rf_power_sweep_values()
@@ -1166,23 +1096,24 @@ class NGP800IVSweepApp(QWidget):
                 unit = self.rf_freq_unit.currentText()
                 mult = {"Hz": 1, "kHz": 1e3, "MHz": 1e6, "GHz": 1e9}
                 freq_hz = freq * mult[unit]
-                self.exg_instr.write(f"FREQ {freq_hz} Hz")
-                self.log(f"RF Frequency set to {freq_hz} Hz")
-                if self.nrx_instr:
-                    try:
-                        self.nrx_instr.write(f"SENS:FREQ {freq_hz} Hz")
-                        self.log(f"Power Meter Frequency set to {freq_hz} Hz")
-                    except Exception as e:
-                        self.log(f"[WARNING] Failed to set power meter frequency: {e}")
-
-            except Exception as e:
-                QMessageBox.warning(self, "RF Frequency Error", f"Failed to set frequency: {e}")
-                return
+            except ValueError as e:
+                QMessageBox.warning(self, "RF Frequency Error", f"Invalid frequency: {e}")
+                return None
+
+            # Frequency and Vd axes; the engine runs the whole grid in one plan
+            rf_freqs = None
+            if self.freq_step_input.text().strip():
+                freq_step = float(self.freq_step_input.text())
+                freq_end = float(self.freq_end_input.text())
+                rf_freqs = (linear_axis(freq, freq_end, freq_step) * mult[unit]).tolist()
+            biases = None
+            if self.vd_list_input.text().strip():
+                biases = [(vg_value, vd) for vd in list_axis(self.vd_list_input.text()).tolist()]
 
             if None in [rf_start, rf_step, rf_end, rf_dur]:
                 QMessageBox.warning(self, "Input Error", "Invalid RF sweep values.")
-                return
-            rf_powers = self.frange(rf_start, rf_end, rf_step)
+                return None
+            rf_powers = linear_axis(rf_start, rf_end, rf_step).tolist()
 
             # RF Power Sweep Values
             try:
@@ -1192,14 +1123,14 @@ class NGP800IVSweepApp(QWidget):
                 rf_dur = float(self.rf_control_screen.power_dur.text())
             except ValueError:
                 QMessageBox.warning(self, "Input Error", "Please enter valid RF power sweep values.")
-                return
+                return None
 
-            rf_powers = self.frange(rf_start, rf_end, rf_step)
+            rf_powers = linear_axis(rf_start, rf_end, rf_step).tolist()
 
 
         except ValueError:
             QMessageBox.warning(self, "Input Error", "Please enter valid numeric values for all fields.")
-            return
+            return None
 
         try:
             self.input_loss_db = float(self.input_loss_input.text())
@@ -1207,11 +1138,87 @@ class NGP800IVSweepApp(QWidget):
             self.output_loss_db = float(self.output_loss_input.text())
         except ValueError:
             QMessageBox.warning(self, "Calibration Error", "Please enter valid numeric values for input/output losses/gains.")
+            return None
+
+        try:
+            settle = SettleConfig(
+                mode=self.settle_mode_combo.currentText(),
+                delay=rf_dur,
+                current_tol=float(self.settle_curr_tol_input.text()) / 100.0,
+                power_tol_db=float(self.settle_pout_tol_input.text()),
+                max_time=float(self.settle_max_input.text()),
+            )
+        except ValueError:
+            QMessageBox.warning(self, "Settling Error", "Please enter valid numeric settling tolerances and max time.")
+            return None
+
+        try:
+            avg_text = self.meter_avg_input.text().strip()
+            aperture_text = self.meter_aperture_input.text().strip()
+            meter_averaging = int(avg_text) if avg_text else None
+            meter_aperture = float(aperture_text) if aperture_text else None
+        except ValueError:
+            QMessageBox.warning(self, "Power Meter Error", "Please enter a whole averaging count and a numeric aperture.")
+            return None
+
+        try:
+            verify_every = int(self.verify_every_input.text())
+            if verify_every < 1:
+                raise ValueError
+        except ValueError:
+            QMessageBox.warning(self, "Input Error", "EXG readback interval must be a whole number of points (1 or more).")
+            return None
+
+        vg_chan = self.vg_chan_combo.currentText().replace("CH", "")
+        vd_chan = self.vd_chan_combo.currentText().replace("CH", "")
+        return SweepPlan(
+            rf_powers, vg_value, vd_value, vg_chan, vd_chan, settle=settle,
+            continuous_rf=self.continuous_rf_checkbox.isChecked(), curr_max=self.curr_max,
+            hardware_list=self.hardware_list_checkbox.isChecked(), dwell=rf_dur,
+            meter_averaging=meter_averaging, meter_aperture=meter_aperture,
+            buffered_pout=self.buffered_pout_checkbox.isChecked(),
+            rf_freq=freq_hz, verify_rf=self.verify_rf_combo.currentText(), verify_every=verify_every,
+            rf_freqs=rf_freqs, biases=biases, order=self.sweep_order_combo.currentText()
+        )
+
+    def estimate_sweep(self):
+        plan = self.build_sweep_plan()
+        if plan is None:
+            return
+        grid = plan.grid()
+        self.progress_label.setText(f"Plan: {grid.describe()}")
+        self.log(f"Plan: {grid.describe()}, outer to inner: {', '.join(a.name for a in grid.axes)}")
+
+    def run_sweep_threaded(self):
+        plan = self.build_sweep_plan()
+        if plan is None:
+            return
+        grid = plan.grid()
+
+        try:
+            self.exg_instr.write(f"FREQ {plan.rf_freq} Hz")
+            self.log(f"RF Frequency set to {plan.rf_freq} Hz")
+        except Exception as e:
+            QMessageBox.warning(self, "RF Frequency Error", f"Failed to set frequency: {e}")
+            return
+        if self.nrx_instr:
+            try:
+                self.nrx_instr.write(f"SENS:FREQ {plan.rf_freq} Hz")
+                self.log(f"Power Meter Frequency set to {plan.rf_freq} Hz")
+            except Exception as e:
+                self.log(f"[WARNING] Failed to set power meter frequency: {e}")
+
+        self.compression = CompressionReference(plan.rf_powers)  # small-signal gain per segment
+        resumed_rows = self.open_result_writer()
+        if resumed_rows is None:
+            return
+        if resumed_rows and len(resumed_rows) >= grid.total:
+            self.close_result_writer()
+            QMessageBox.information(self, "Resume", "All points of this sweep are already recorded.")
             return
 
         # Clear previous records
-        self.records_table.setRowCount(0)
-        self.first_gain_value = None  # Reset first gain for new compression calculation
+        self.records_model.clear()
 
 
         self.stop_event.clear()
@@ -1222,11 +1229,7 @@ class NGP800IVSweepApp(QWidget):
         self.stop_button.setEnabled(True)
         self.run_button.setEnabled(False)
 
-        vg_chan = self.vg_chan_combo.currentText().replace("CH", "")
-        vd_chan = self.vd_chan_combo.currentText().replace("CH", "")
-
 
-        self.rf_plot_widgets.clear()
         self.history_tabs.clear()
 
         # === Create single tab for combined plot (PowerOUT, PAE, GAIN vs PowerIN) ===
@@ -1272,98 +1275,61 @@ class NGP800IVSweepApp(QWidget):
         gain_layout = QVBoxLayout(self.gain_plot_tab)
         gain_layout.addWidget(self.gain_plot_widget)
         self.history_tabs.addTab(self.gain_plot_tab, "GAIN vs Pin")
+        self.setup_result_curves()
+
+        for values in resumed_rows:
+            self.compression.seed(values)
+            self.records_model.append(values)
+            self.append_result_curves(values)
+        if resumed_rows:
+            self.log(f"Resuming after {len(resumed_rows)} recorded points")
+
+        plan.start_index = len(resumed_rows)
+        # Out-of-order runs are sorted back to canonical grid order once complete
+        self.sweep_total = grid.total
+        self.sweep_reordered = grid.reordered()
+        self.progress_label.setText(f"Plan: {grid.describe()}")
+        self.sweep_engine.submit(plan)
+        self.log(f"Submitted RF sweep plan: {grid.total - len(resumed_rows)} points")
+
+
+    def setup_result_curves(self):
+        # Persistent curves for this run; add_record appends, the refresher redraws
+        self.plot_refresher.clear()
+        self.curve_segment = None
+        combined = self.combined_plot_widget
+        combined.setTitle("PAE, PowerOUT, GAIN vs PowerIN")
+        combined.setLabel("left", "Value (dBm / %)")
+
+        def curve(widget, pen, name, symbol):
+            item = widget.plot([], [], pen=pg.mkPen(pen, width=2), name=name, symbol=symbol, symbolSize=6,
+                               connect="finite")
+            return self.plot_refresher.add(LiveCurve(item))
+
+        self.result_curves = [
+            ("pout_actual", curve(combined, "b", "PowerOUT (dBm)", "o")),
+            ("pae", curve(combined, "g", "PAE (%)", "x")),
+            ("gain", curve(combined, "r", "GAIN", "t")),
+            ("pae", curve(self.pae_plot_widget, "m", "PAE", "x")),
+            ("pout_actual", curve(self.pout_plot_widget, "c", "Pout_actual", "o")),
+            ("gain", curve(self.gain_plot_widget, "y", "Gain", "t")),
+        ]
 
-        self.rf_sweep_thread = QThread()
-        self.rf_sweep_worker = RFSweepWorker(
-            self, rf_powers, vg_chan, vd_chan, vg_values, vd_values, vg_dur, vd_dur
-        )
-        self.rf_sweep_worker.moveToThread(self.rf_sweep_thread)
-
-        self.rf_sweep_worker.finished.connect(self.rf_sweep_thread.quit)
-        self.rf_sweep_worker.finished.connect(self.rf_sweep_worker.deleteLater)
-        self.rf_sweep_thread.finished.connect(self.rf_sweep_thread.deleteLater)
-        self.rf_sweep_worker.log_msg.connect(self.log)
-        self.rf_sweep_worker.update_plot.connect(self.handle_update_plot)
-
-        self.rf_sweep_thread.started.connect(self.rf_sweep_worker.run)
-
-
-        self.rf_sweep_thread.start()
-
-    def safe_update_plot(self, plot_widget, x_vals, y_vals):
+    def append_result_curves(self, values):
         try:
-            if plot_widget is not None:
-                items = plot_widget.listDataItems()
-                if items:
-                    # Always update the last added plot line
-                    items[-1].setData(x_vals, y_vals)
-        except Exception as e:
-            self.log(f"[ERROR] Failed to update plot safely: {e}")
-
-
-    def frange(self, start, stop, step):
-        values = []
-        v = start
-        if step > 0:
-            while v <= stop:
-                values.append(round(v, 6))  # rounding here to keep consistency
-                v += step
-        elif step < 0:
-            while v >= stop:
-                values.append(round(v, 6))
-                v += step
-        else:
-            raise ValueError("Step must not be zero")
-        return values
-
-    def plot_pae_vs_powerin(self):
-        pin_vals, pout_vals, gain_vals, pae_vals = [], [], [], []
-
-        for row in range(self.records_table.rowCount()):
-            try:
-                pin = float(self.records_table.item(row, 7).text())  # PowerIN actual
-                pout = float(self.records_table.item(row, 8).text()) # PowerOUT actual
-                gain = float(self.records_table.item(row, 11).text())
-                pae = float(self.records_table.item(row, 13).text())
-
-
-                pin_vals.append(pin)
-                pout_vals.append(pout)
-                gain_vals.append(gain)
-                pae_vals.append(pae)
-            except Exception:
-                continue
-
-        if not pin_vals:
-            self.log("No valid data found for plotting combined graph.")
+            point = [values[name] for name in ("pin_actual", "pout_actual", "gain", "pae")]
+        except KeyError:
+            return  # Pin or Pout missing, nothing to plot
+        if not all(np.isfinite(point)):
             return
-
-        # Clear and set up single Y-axis plot
-        self.combined_plot_widget.clear()
-        self.combined_plot_widget.setTitle("PAE, PowerOUT, GAIN vs PowerIN")
-        self.combined_plot_widget.setLabel("bottom", "PowerIN (actual)")
-        self.combined_plot_widget.setLabel("left", "Value (dBm / %)")
-        self.combined_plot_widget.addLegend()
-        self.combined_plot_widget.showGrid(x=True, y=True)
-
-        # Plot all 3 on the same axis
-        self.combined_plot_widget.plot(pin_vals, pout_vals, pen=pg.mkPen("b", width=2), name="PowerOUT (dBm)", symbol="o",symbolSize=6)
-        self.combined_plot_widget.plot(pin_vals, pae_vals, pen=pg.mkPen("g", width=2), name="PAE (%)", symbol="x",symbolSize=6)
-        self.combined_plot_widget.plot(pin_vals, gain_vals, pen=pg.mkPen("r", width=2), name="GAIN", symbol="t",symbolSize=6)
-
-        self.log("Plotted combined graph: PowerOUT, PAE, and GAIN vs PowerIN")
-
-        # Plot PAE vs PowerIN
-        self.pae_plot_widget.clear()
-        self.pae_plot_widget.plot(pin_vals, pae_vals, pen=pg.mkPen("m", width=2), symbol="x", name="PAE",symbolSize=6)
-
-        # Plot PowerOUT vs PowerIN
-        self.pout_plot_widget.clear()
-        self.pout_plot_widget.plot(pin_vals, pout_vals, pen=pg.mkPen("c", width=2), symbol="o", name="Pout_actual",symbolSize=6)
-
-        # Plot GAIN vs PowerIN
-        self.gain_plot_widget.clear()
-        self.gain_plot_widget.plot(pin_vals, gain_vals, pen=pg.mkPen("y", width=2), symbol="t", name="Gain",symbolSize=6)
+        # New frequency / bias segment of a grid run: break the lines (NaN gap)
+        segment = (values["freq"], values["vg"], values["vd"])
+        if self.curve_segment is not None and segment != self.curve_segment:
+            for _, curve in self.result_curves:
+                curve.append(np.nan, np.nan)
+        self.curve_segment = segment
+        for name, curve in self.result_curves:
+            curve.append(values["pin_actual"], values[name])
 
 
     def closeEvent(self, event):
@@ -1374,9 +1340,7 @@ class NGP800IVSweepApp(QWidget):
             if self.rf_control_screen:
                 self.rf_control_screen.rf_output_off()
             if self.instrument:
-                for ch in range(1, 5):
-                    self.instrument.write(f"INST:NSEL {ch}")
-                    self.instrument.write("OUTP OFF")
+                self.ngp.outputs_off()
                 self.log("NGP800: All channels turned OFF.")
             if self.exg_instr:
                 self.exg_instr.write("OUTP OFF")
@@ -1388,15 +1352,16 @@ class NGP800IVSweepApp(QWidget):
             self.log(f"[ERROR] Exception during close shutdown: {e}")
 
         try:
-            if hasattr(self, "rf_sweep_thread") and self.rf_sweep_thread:
-                if self.rf_sweep_thread.isRunning():
-                    self.log("Waiting for RF sweep thread to quit...")
-                    self.rf_sweep_thread.quit()
-                    self.rf_sweep_thread.wait()  # <-- make sure thread fully exits
-                self.rf_sweep_worker = None
-                self.rf_sweep_thread = None
+            if self.sweep_engine and self.sweep_engine.is_alive():
+                self.log("Waiting for sweep engine to quit...")
+                self.sweep_engine.shutdown()
+                self.sweep_engine.join(timeout=5)  # <-- make sure thread fully exits
+                self.drain_engine_results()  # last records still go to the results file
+            self.sweep_engine = None
         except Exception as e:
-            self.log(f"[ERROR] Exception while terminating RF sweep thread: {e}")
+            self.log(f"[ERROR] Exception while terminating sweep engine: {e}")
+
+        self.close_result_writer()
 
     
         self.log("Application closed safely. All outputs OFF.")
@@ -0,0 +1,44 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+
+class InstrumentIO:
+    # asyncio facade over blocking pyvisa calls. Every instrument gets its own
+    # single-thread executor, so calls to one instrument stay in order while
+    # calls to instruments on different buses overlap. The event loop belongs
+    # to the thread that calls run() (the sweep engine thread).
+
+    def __init__(self, names):
+        self.executors = {
+            name: ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"io-{name}")
+            for name in names
+        }
+        self.loop = None
+
+    async def call(self, name, fn, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executors[name], functools.partial(fn, *args))
+
+    async def gather(self, *calls):
+        # calls: (name, fn, *args) or None. Results come back in order; a failed
+        # call returns its exception instead of cancelling the others.
+        async def skip():
+            return None
+        tasks = [self.call(*c) if c is not None else skip() for c in calls]
+        return await asyncio.gather(*tasks, return_exceptions=True)
+
+    def run(self, coro):
+        if self.loop is None:
+            self.loop = asyncio.new_event_loop()
+        return self.loop.run_until_complete(coro)
+
+    def run_concurrently(self, *calls):
+        return self.run(self.gather(*calls))
+
+    def close(self):
+        for executor in self.executors.values():
+            executor.shutdown(wait=False)
+        if self.loop is not None:
+            self.loop.close()
+            self.loop = None
@@ -0,0 +1,365 @@
+import os
+import sys
+import json
+import math
+import time
+import queue
+import argparse
+import platform
+import tempfile
+import threading
+import subprocess
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+import numpy as np
+import pyqtgraph as pg
+from PyQt6.QtCore import QThread, QTimer, QEventLoop
+from PyQt6.QtWidgets import QApplication, QWidget, QVBoxLayout, QTextEdit, QTableView
+
+from sim_instruments import SimResourceManager, NGP800_RESOURCE, EXG_RESOURCE, NRX_RESOURCE
+from visa_pool import VisaPool
+from ngp800_driver import ngp800_for
+from settling import SettleConfig
+from sweep_engine import SweepEngine, SweepPlan
+from records import RF_COLUMNS, IV_COLUMNS, rf_derived, CompressionReference
+from id_vd_char import SweepWorker
+from results_store import ColumnStore
+from records_model import RecordsTableModel, fmt_plain
+from result_writer import ResultWriter
+from live_plot import LiveCurve
+
+
+# Sweep throughput benchmark. Runs the RF sweep engine and the Id-Vd sweep
+# worker against the simulated bench (sim_instruments) with a fixed latency
+# per bus transfer, feeds their output through the same table model, result
+# writer, live curves and log widget the apps use (offscreen), and reports
+# points/s plus where each point's time went:
+#
+#   settle   settling delay (RF: records' settle_s; Id-Vd: timed Vg/Vd dwells)
+#   set      EXG level / RF output / retune / bias writes
+#   measure  NGP800 readback, EXG verify and power meter read of a point
+#   record   table model insert + result writer queueing
+#   render   live curve appends, redraws and repaints (20 Hz like the apps)
+#   log      log widget and progress text updates
+#   other    rest of the run time (dispatch, queues, worker bookkeeping)
+#
+# Both workers run in their own thread as in the apps: the RF engine's queue
+# is drained every 50 ms, the Id-Vd worker's signals are queued to the GUI
+# thread. record/render/log therefore overlap the worker's settle/set/measure
+# and "other" is the run time not covered by the worker's phases.
+#
+#   python bench_sweep.py --points 10 100 1000 10000 --output bench.json
+#   python bench_sweep.py --compare bench_old.json bench.json
+
+PHASES = ["settle", "set", "measure", "record", "render", "log", "other"]
+WORKERS = ["rf", "iv"]
+GUI_INTERVAL_MS = 50  # results drain / plot refresh period of both apps
+
+
+class PhaseTimer:
+    # Seconds per phase. A call wrapped with wrap() is timed unless it runs
+    # inside another timed call on the same thread (nested calls count once,
+    # in the outer phase) or on a thread other than `thread` when one is given.
+
+    def __init__(self):
+        self.totals = dict.fromkeys(PHASES, 0.0)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def add(self, phase, seconds):
+        with self._lock:
+            self.totals[phase] += seconds
+
+    def wrap(self, phase, fn, thread=None):
+        def timed(*args, **kwargs):
+            if getattr(self._local, "active", False) or (thread is not None and threading.current_thread() is not thread):
+                return fn(*args, **kwargs)
+            self._local.active = True
+            t0 = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self._local.active = False
+                self.add(phase, time.perf_counter() - t0)
+        return timed
+
+
+class GuiSide:
+    # Offscreen stand-in for an app's records table, plot and log widget
+    def __init__(self, columns, timer, workdir, name):
+        self.timer = timer
+        self.window = QWidget()
+        layout = QVBoxLayout(self.window)
+        self.store = ColumnStore([(c, np.float64) for c in columns])
+        self.model = RecordsTableModel(self.store, [(c, c, fmt_plain) for c in columns])
+        self.table = QTableView()
+        self.table.setModel(self.model)
+        self.plot = pg.PlotWidget()
+        self.log_widget = QTextEdit()
+        for widget in (self.table, self.plot, self.log_widget):
+            layout.addWidget(widget)
+        self.window.resize(1280, 900)
+        self.curves = []
+        self.writer = ResultWriter(os.path.join(workdir, name), columns, fmt="CSV")
+        self.writer.open()
+        self.writer.start()
+
+        self.record = timer.wrap("record", self._record)
+        self.log = timer.wrap("log", self._log)
+        self.refresh = timer.wrap("render", self._refresh)
+
+    def add_curve(self, name):
+        item = self.plot.plot([], [], pen=pg.mkPen("c", width=2), name=name, symbol="o",
+                              symbolSize=6, connect="finite")
+        curve = LiveCurve(item)
+        self.curves.append(curve)
+        return curve
+
+    def _record(self, values):
+        self.model.append(values)
+        self.writer.write(values)
+
+    def _log(self, message):
+        self.log_widget.append(f"[{time.strftime('%H:%M:%S')}] {message}")
+
+    def _refresh(self):
+        if not any(curve.dirty for curve in self.curves):
+            return
+        for curve in self.curves:
+            curve.refresh()
+        self.plot.grab()  # paint now: offscreen widgets are never painted by the event loop
+
+    def close(self):
+        self.writer.close()
+        self.window.deleteLater()
+
+
+def open_bench(latency):
+    pool = VisaPool(SimResourceManager(latency=latency))
+    return pool, [pool.open(name) for name in (NGP800_RESOURCE, EXG_RESOURCE, NRX_RESOURCE)]
+
+
+def run_rf(points, latency, settle, workdir):
+    pool, (ngp, exg, meter) = open_bench(latency)
+    driver = ngp800_for(ngp)
+    with driver.batch():
+        driver.apply("1", -1.0)
+        driver.apply("2", 10.0)
+    exg.write("FREQ 2000000000.0 Hz")
+
+    stop_event, pause_event = threading.Event(), threading.Event()
+    engine = SweepEngine(ngp, exg, meter, stop_event, pause_event)
+    timer = PhaseTimer()
+    engine.measure_point = timer.wrap("measure", engine.measure_point, engine)
+    engine.set_bias = timer.wrap("set", engine.set_bias, engine)
+    engine.retune = timer.wrap("set", engine.retune, engine)
+    exg.write = timer.wrap("set", exg.write, engine)
+
+    gui = GuiSide(RF_COLUMNS, timer, workdir, f"rf_{points}.csv")
+    curves = [(name, gui.add_curve(name)) for name in ("power_out", "gain", "pae")]
+
+    def plot_point(values):
+        for name, curve in curves:
+            curve.append(values["power_in"], values[name])
+
+    plot_point = timer.wrap("render", plot_point)
+
+    powers = np.round(np.linspace(-20.0, 20.0, points), 4).tolist()
+    compression = CompressionReference(powers)
+
+    def add_record(rec):
+        # Same derived columns as RF_power_sweep.add_record
+        values = {name: getattr(rec, name, None) for name in RF_COLUMNS}
+        values.update(rf_derived(rec.power_in, rec.power_out, rec.vd or 0.0, rec.current or 0.0))
+        gui.log(f"Point: Pin={rec.power_in} dBm, Pout={rec.power_out} dBm, I={rec.current} A")
+        if values.get("gain") is not None:
+            plot_point(values)
+        compression.add(values)
+        gui.record(values)
+
+    plan = SweepPlan(powers, -1.0, 10.0, "1", "2", settle=SettleConfig(mode="Fixed", delay=settle),
+                     rf_freq=2e9)
+
+    settle_total = 0.0
+    engine.start()
+    t0 = time.perf_counter()
+    engine.submit(plan)
+    finished = False
+    while not finished:
+        # Drain every GUI_INTERVAL_MS like RF_power_sweep's results timer
+        time.sleep(GUI_INTERVAL_MS / 1000)
+        point_done = False
+        while True:
+            try:
+                kind, payload = engine.results.get_nowait()
+            except queue.Empty:
+                break
+            if kind == "log":
+                gui.log(payload)
+            elif kind == "record":
+                settle_total += payload.settle_s or 0.0
+                add_record(payload)
+            elif kind == "point_done":
+                point_done = True
+            elif kind == "progress":
+                gui.log(f"{payload['done']}/{payload['total']} points")
+            elif kind == "finished":
+                finished = True
+        if point_done:
+            gui.refresh()
+    wall = time.perf_counter() - t0
+
+    engine.shutdown()
+    engine.join(5)
+    gui.close()
+    pool.close_all()
+
+    timer.totals["settle"] = settle_total
+    return result("rf", len(gui.store), wall, timer.totals, latency, settle)
+
+
+def iv_axes(points):
+    # 10 Vg traces once there are enough points, Vd filling the rest
+    n_vg = 10 if points >= 100 else 1
+    n_vd = max(1, math.ceil(points / n_vg))
+    return np.round(np.linspace(-3.0, 0.0, n_vg), 4).tolist(), np.round(np.linspace(0.0, 10.0, n_vd), 4).tolist()
+
+
+def run_iv(points, latency, settle, workdir):
+    app = QApplication.instance()
+    pool, (ngp, _, _) = open_bench(latency)
+    vg_values, vd_values = iv_axes(points)
+
+    stop_event, pause_event = threading.Event(), threading.Event()
+    worker = SweepWorker(ngp, "1", "2", vg_values, vd_values, settle, settle, stop_event, pause_event)
+    timer = PhaseTimer()
+    worker.ngp.apply = timer.wrap("set", worker.ngp.apply)
+    worker.ngp.readback = timer.wrap("measure", worker.ngp.readback)
+    worker.sweep.dwell = timer.wrap("settle", worker.sweep.dwell)
+
+    gui = GuiSide(IV_COLUMNS, timer, workdir, f"iv_{points}.csv")
+    traces = {}
+
+    def start_trace(vg):
+        traces[vg] = gui.add_curve(f"Vg={vg}V")
+
+    def add_record(rec):
+        gui.log(f"Measured current: {rec.current:.6f} A (Vg={rec.vg}, Vd={rec.vd})")
+        gui.record({name: getattr(rec, name) for name in IV_COLUMNS})
+
+    thread = QThread()
+    worker.moveToThread(thread)
+    thread.started.connect(worker.run)
+    worker.trace_started.connect(timer.wrap("render", start_trace))
+    worker.points_ready.connect(timer.wrap("render", lambda vg, vd, i: traces[vg].extend(vd, i)))
+    worker.log_msg.connect(gui.log)
+    worker.record_ready.connect(add_record)
+    worker.parameters_ready.connect(lambda *args: gui.log(f"Parameters: {args}"))
+
+    loop = QEventLoop()
+    worker.finished.connect(loop.quit)
+    refresher = QTimer()
+    refresher.setInterval(GUI_INTERVAL_MS)
+    refresher.timeout.connect(gui.refresh)
+    refresher.start()
+
+    t0 = time.perf_counter()
+    thread.start()
+    loop.exec()
+    app.processEvents()  # points and records still queued behind finished
+    gui.refresh()
+    wall = time.perf_counter() - t0
+
+    refresher.stop()
+    thread.quit()
+    thread.wait()
+    gui.close()
+    pool.close_all()
+
+    return result("iv", len(gui.store), wall, timer.totals, latency, settle)
+
+
+def result(worker, points, wall, totals, latency, settle):
+    totals["other"] = max(0.0, wall - sum(totals[p] for p in ("settle", "set", "measure")))
+    per_point = {p: totals[p] / points * 1000 if points else None for p in PHASES}
+    return {
+        "worker": worker, "points": points, "latency_s": latency, "settle_s": settle,
+        "wall_s": round(wall, 6),
+        "points_per_s": round(points / wall, 3) if wall > 0 else None,
+        "phase_s": {p: round(v, 6) for p, v in totals.items()},
+        "phase_ms_per_point": {p: (round(v, 4) if v is not None else None) for p, v in per_point.items()},
+    }
+
+
+def git_revision():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                             cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5)
+        return out.stdout.strip() or None
+    except Exception:
+        return None
+
+
+def format_row(r):
+    phases = " ".join(f"{p} {r['phase_ms_per_point'][p]:7.3f}" for p in PHASES)
+    return f"{r['worker']:>2} {r['points']:>6} pts {r['wall_s']:8.2f} s {r['points_per_s']:9.1f} pts/s | ms/pt: {phases}"
+
+
+def compare(old_path, new_path):
+    # Points/s and ms/point of every (worker, points) run in both files
+    with open(old_path) as f:
+        old = {(r["worker"], r["points"]): r for r in json.load(f)["runs"]}
+    with open(new_path) as f:
+        new = json.load(f)["runs"]
+    for r in new:
+        base = old.get((r["worker"], r["points"]))
+        if base is None:
+            continue
+        change = (r["points_per_s"] / base["points_per_s"] - 1) * 100
+        phases = " ".join(f"{p} {r['phase_ms_per_point'][p] - base['phase_ms_per_point'][p]:+.3f}" for p in PHASES)
+        print(f"{r['worker']:>2} {r['points']:>6} pts {base['points_per_s']:9.1f} -> {r['points_per_s']:9.1f} pts/s "
+              f"({change:+.1f}%) | ms/pt change: {phases}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sweep throughput benchmark on the simulated bench")
+    parser.add_argument("--points", type=int, nargs="+", default=[10, 100, 1000, 10000])
+    parser.add_argument("--workers", nargs="+", choices=WORKERS, default=WORKERS)
+    parser.add_argument("--latency", type=float, default=0.002, help="seconds per bus transfer")
+    parser.add_argument("--settle", type=float, default=0.0, help="settle / dwell time per step (s)")
+    parser.add_argument("--output", help="write results to this JSON file")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two result files and exit")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        compare(*args.compare)
+        return 0
+
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    runners = {"rf": run_rf, "iv": run_iv}
+    runs = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for worker in args.workers:
+            for points in args.points:
+                r = runners[worker](points, args.latency, args.settle, workdir)
+                print(format_row(r), flush=True)
+                runs.append(r)
+
+    report = {
+        "revision": git_revision(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "qt_platform": app.platformName(),
+        "runs": runs,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
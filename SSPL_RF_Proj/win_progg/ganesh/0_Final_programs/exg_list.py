@@ -0,0 +1,45 @@
+class ExgListSweep:
+    # EXG N5173B hardware list sweep (power only, CW frequency unchanged) on a
+    # bare session. This is the rf_control the sweep engine needs for
+    # hardware_list plans; the GUI's ControlScreen delegates to it.
+
+    def __init__(self, instr):
+        self.instr = instr
+
+    def load_power_list(self, powers, dwell):
+        self.instr.write("INIT:CONT OFF")
+        self.instr.write("LIST:TYPE LIST")
+        self.instr.write("LIST:POW " + ",".join(f"{p}" for p in powers))
+        self.instr.write("LIST:DWEL:TYPE STEP")
+        self.instr.write(f"SWE:DWEL {dwell}")
+        self.instr.write("LIST:TRIG:SOUR IMM")
+        self.instr.write("POW:MODE LIST")
+        # Pulse TRIG 2 out each time a list point has settled -> power meter EXT trigger
+        self.instr.write("ROUT:TRIG2:OUTP SETT")
+
+    def start_list_sweep(self):
+        self.instr.write("OUTP ON")
+        self.instr.write("INIT")
+
+    def wait_list_sweep(self, timeout_s):
+        old_timeout = self.instr.timeout
+        try:
+            self.instr.timeout = int(timeout_s * 1000)
+            self.instr.query("*OPC?")
+        finally:
+            self.instr.timeout = old_timeout
+
+    def stop_list_sweep(self, rf_off=True, hold_power=None):
+        # rf_off=False leaves RF on at hold_power (dBm) CW, e.g. between the
+        # segments of one plan; the caller then owns switching it off
+        try:
+            self.instr.write("ABOR")
+            if hold_power is not None:
+                self.instr.write(f"POW {hold_power} dBm")
+            self.instr.write("POW:MODE FIX")
+        finally:
+            if rf_off:
+                try:
+                    self.instr.write("OUTP OFF")
+                except Exception:
+                    pass
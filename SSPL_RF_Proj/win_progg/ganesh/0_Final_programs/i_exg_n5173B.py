@@ -1,11 +1,14 @@
 import sys
-import pyvisa
+import time
 from PyQt6.QtWidgets import (
     QApplication, QWidget, QLabel, QVBoxLayout, QPushButton,
     QComboBox, QLineEdit, QHBoxLayout, QMessageBox, QStackedLayout
 )
 from PyQt6.QtCore import Qt
 
+from instrument_discovery import InstrumentDiscovery
+from exg_list import ExgListSweep
+
 class MainWindow(QWidget):
     def __init__(self):
         super().__init__()
@@ -49,6 +52,8 @@ class ConnectScreen(QWidget):
         self.init_ui()
         self.setLayout(self.layout)
 
+    def log(self, msg):
+        print(f"[{time.strftime('%H:%M:%S')}] {msg}")
 
     def init_ui(self):
         self.layout = QVBoxLayout()
@@ -63,29 +68,13 @@ class ConnectScreen(QWidget):
         self.setLayout(self.layout)
 
     def find_instrument(self):
-        rm = pyvisa.ResourceManager()
-        resources = rm.list_resources()
-
-        found = False
-        for resource in resources:
-            try:
-                inst = rm.open_resource(resource)
-                inst.timeout = 2000  # 2 seconds for quick response
-                idn = inst.query("*IDN?")
-                if "N5173B" in idn:
-                    self.status_label.setText(f"Connected to: {idn.strip()}")
-                    self.main_window.instrument_found(inst)
-                    found = True
-                    break
-                else:
-                    inst.close()
-            except pyvisa.errors.VisaIOError as e:
-                if e.error_code != pyvisa.constants.StatusCode.error_timeout:
-                    print(f"VISA IO Error on {resource}: {e}")
-            except Exception as e:
-                print(f"Error on {resource}: {e}")
-
-        if not found:
+        # Shared discovery: reuses an EXG session already open in this process
+        found = InstrumentDiscovery(log=self.log).discover(("exg",))
+        if "exg" in found:
+            inst, idn = found["exg"]
+            self.status_label.setText(f"Connected to: {idn}")
+            self.main_window.instrument_found(inst)
+        else:
             self.status_label.setText("Instrument not found.")
 
 class LimitsScreen(QWidget):
@@ -250,6 +239,24 @@ class ControlScreen(QWidget):
         except:
             pass
 
+    # --- Hardware list sweep (power only, CW frequency unchanged) ---
+    def load_power_list(self, powers, dwell):
+        ExgListSweep(self.instr).load_power_list(powers, dwell)
+
+    def start_list_sweep(self):
+        ExgListSweep(self.instr).start_list_sweep()
+        self.rf_on = True
+
+    def wait_list_sweep(self, timeout_s):
+        ExgListSweep(self.instr).wait_list_sweep(timeout_s)
+
+    def stop_list_sweep(self, rf_off=True, hold_power=None):
+        try:
+            ExgListSweep(self.instr).stop_list_sweep(rf_off, hold_power)
+        finally:
+            if rf_off:
+                self.rf_on = False
+
 
     # def set_values(self):
     #     if not self.instr:
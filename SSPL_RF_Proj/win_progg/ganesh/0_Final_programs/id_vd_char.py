@@ -1,12 +1,11 @@
 import sys
 import time
 import threading
-import pyvisa
-from pyvisa.constants import Parity, StopBits
 from PyQt6.QtWidgets import (
     QApplication, QWidget, QLabel, QLineEdit, QPushButton,
-    QVBoxLayout, QHBoxLayout, QComboBox, QGridLayout, QMessageBox, QStackedLayout, QTableWidgetItem
+    QVBoxLayout, QHBoxLayout, QComboBox, QGridLayout, QMessageBox, QStackedLayout, QTableView
 )
+import numpy as np
 import pyqtgraph as pg
 import random
 from PyQt6.QtGui import QColor
@@ -22,6 +21,18 @@ from PyQt6.QtWidgets import QHeaderView,QSizePolicy
 from PyQt6.QtWidgets import QComboBox, QListView  
 import os
 
+from records import format_time
+from results_store import ColumnStore
+from records_model import RecordsTableModel, fmt_fixed, fmt_time
+from live_plot import LiveCurve, PlotRefresher
+from result_writer import ResultWriter, RESULT_FORMATS
+from instrument_discovery import InstrumentDiscovery
+from ngp800_driver import ngp800_for
+from trace_panel import TracePanel
+from sweep_planner import ORDERS
+from sweep_axis import linear_axis
+from iv_sweep import IVSweep, iv_grid, order_note, IV_DEFAULT_ORDER
+
 class IntroScreen(QWidget):
     def __init__(self, on_next_callback):
         super().__init__()
@@ -95,13 +106,20 @@ class IntroScreen(QWidget):
 
 
 class ConnectScreen(QWidget):
+    discovery_done = pyqtSignal(object, str)  # {kind: (instr, idn)}, error
+
     def __init__(self, on_connected_callback):
         super().__init__()
         self.on_connected_callback = on_connected_callback
-        self.rm = None
         self.inst = None
+        # Shared discovery service: parallel *IDN? probe, cached addresses first
+        self.discovery = InstrumentDiscovery(log=self.log)
+        self.discovery_done.connect(self.on_discovery_done)
         self.init_ui()
 
+    def log(self, msg):
+        print(f"[{time.strftime('%H:%M:%S')}] {msg}")
+
     def init_ui(self):
         layout = QVBoxLayout()
 
@@ -143,229 +161,86 @@ class ConnectScreen(QWidget):
 
     def try_connect(self):
         self.status_label.setText("Status: Scanning...")
-        QApplication.processEvents()
+        self.connect_btn.setEnabled(False)
+        threading.Thread(target=self.run_discovery, daemon=True).start()
 
+    def run_discovery(self):
         try:
-            self.rm = pyvisa.ResourceManager()
-            resources = self.rm.list_resources()
-            print("Available VISA resources:", resources)
-
-            for res in resources:
-                if "USB" in res or "ASRL" in res:
-                    try:
-                        instr = self.rm.open_resource(res)
-                        if res.startswith("ASRL"):
-                            instr.baud_rate = 115200
-                            instr.data_bits = 8
-                            instr.stop_bits = StopBits.one
-                            instr.parity = Parity.none
-                            instr.timeout = 2000
-                            instr.write_termination = '\n'
-                            instr.read_termination = '\n'
-                        idn = instr.query("*IDN?")
-                        if "NGP800" in idn or "NGP824" in idn:
-                            self.inst = instr
-                            self.status_label.setText(f"Status: Connected to {idn.strip()}")
-                            self.connect_btn.setEnabled(False)
-                            self.on_connected_callback(self.inst)
-                            print(f"[LOG] Connected to {idn.strip()}")
-                            return
-                        instr.close()
-                    except Exception as e:
-                        print(f"Could not open {res}: {e}")
-            self.status_label.setText("Status: NGP800 not found. Please check connection.")
+            found = self.discovery.discover(("ngp800",))
+            self.discovery_done.emit(found, "")
         except Exception as e:
-            self.status_label.setText(f"Error: {e}")
+            self.discovery_done.emit({}, str(e))
+
+    def on_discovery_done(self, found, error):
+        if "ngp800" in found:
+            self.inst, idn = found["ngp800"]
+            self.status_label.setText(f"Status: Connected to {idn}")
+            print(f"[LOG] Connected to {idn}")
+            self.on_connected_callback(self.inst)
+            return
+        self.connect_btn.setEnabled(True)
+        if error:
+            self.status_label.setText(f"Error: {error}")
+        else:
+            self.status_label.setText("Status: NGP800 not found. Please check connection.")
+
+
+def get_bright_color():
+    while True:
+        r, g, b = [random.randint(0, 255) for _ in range(3)]
+        brightness = 0.299 * r + 0.587 * g + 0.114 * b  # Perceived brightness formula
+        if brightness > 100:  # Avoid dark colors like black, dark gray, etc.
+            return QColor(r, g, b)
 
 
 class SweepWorker(QObject):
-    update_plot = pyqtSignal(object, list, list)
+    # Qt face of iv_sweep.IVSweep: runs it in the worker QThread and re-emits
+    # its messages as signals for the GUI thread
+    trace_started = pyqtSignal(float)  # Vg of the new Id-Vd trace
+    points_ready = pyqtSignal(float, list, list)  # Vg, new Vd values, new currents (delta only)
     log_msg = pyqtSignal(str)
+    record_ready = pyqtSignal(object)  # IVRecord per measured point
     finished = pyqtSignal()
     parameters_ready = pyqtSignal(object, object, object)
 
-
-    def __init__(self, instrument, vg_chan, vd_chan,
-             vg_values, vd_values, vg_dur, vd_dur,
-             stop_event, pause_event,
-             vg_max=None, vd_max=None, curr_max=None, gm_vd_percent=0.7,pinch_current_limit=0.01):
+    def __init__(self, *args, writer=None, **kwargs):
         super().__init__()
-        self.instrument = instrument
-        self.vg_chan = vg_chan
-        self.vd_chan = vd_chan
-        self.vg_values = vg_values
-        self.vd_values = vd_values
-        self.vg_dur = vg_dur
-        self.vd_dur = vd_dur
-        self.stop_event = stop_event
-        self.pause_event = pause_event
-        self.vg_max = vg_max
-        self.vd_max = vd_max
-        self.curr_max = curr_max
-        self.data_points = []  # (vg, vd, id)
-        self.gm_vd_percent = gm_vd_percent
-        self.pinch_current_limit = pinch_current_limit
-
-
+        self.sweep = IVSweep(*args, emit=self.dispatch, **kwargs)
+        self.grid = self.sweep.grid
+        self.ngp = self.sweep.ngp
+        # This run's ResultWriter (or None); records go to it from the worker
+        # thread, so a later run can never write into it
+        self.writer = writer
+
+    def dispatch(self, kind, payload):
+        if kind == "log":
+            self.log_msg.emit(payload)
+        elif kind == "record":
+            if self.writer:
+                self.writer.write({name: getattr(payload, name) for name in self.writer.columns})
+            self.record_ready.emit(payload)
+        elif kind == "points":
+            self.points_ready.emit(*payload)
+        elif kind == "trace_started":
+            self.trace_started.emit(payload)
+        elif kind == "parameters":
+            self.parameters_ready.emit(*payload)
 
     def run(self):
-
-        try:
-
-            for vg in self.vg_values:
-                if self.stop_event.is_set():
-                    break
-                self.log_msg.emit(f"Setting Vgate to {vg} V on channel {self.vg_chan}")
-                self.instrument.write(f"INST:NSEL {self.vg_chan}")
-                self.instrument.write(f"VOLT {vg}")
-                self.instrument.write(f"OUTP ON")
-                # Check Vgate limit
-                if self.vg_max is not None and vg > self.vg_max:
-                    self.log_msg.emit(f"Vgate limit exceeded: {vg} > {self.vg_max}. Stopping sweep.")
-                    self.stop_event.set()
-                    break
-                time.sleep(self.vg_dur)
-
-
-                currents = []
-                def get_bright_color():
-                    while True:
-                        r, g, b = [random.randint(0, 255) for _ in range(3)]
-                        brightness = 0.299 * r + 0.587 * g + 0.114 * b  # Perceived brightness formula
-                        if brightness > 100:  # Avoid dark colors like black, dark gray, etc.
-                            return QColor(r, g, b)
-
-                plot_data = pg.PlotDataItem(
-                    pen=pg.mkPen(get_bright_color(), width=2),
-                    name=f"Vg={vg}V"
-                )
-
-                self.update_plot.emit(plot_data, [], [])
-
-                for i, vd in enumerate(self.vd_values):
-                    while self.pause_event.is_set():
-                        time.sleep(0.1)
-                    if self.stop_event.is_set():
-                        break
-
-                    self.log_msg.emit(f"Setting Vdrain to {vd} V on channel {self.vd_chan}")
-                    self.instrument.write(f"INST:NSEL {self.vd_chan}")
-                    self.instrument.write(f"VOLT {vd}")
-                    self.instrument.write(f"OUTP ON")
-                    time.sleep(self.vd_dur)
-
-                    self.instrument.write("MEAS:CURR?")
-                    current = float(self.instrument.read())
-                    timestamp = time.strftime("%H:%M:%S")
-                    # Check limits
-                    if self.vd_max is not None and vd > self.vd_max:
-                        self.log_msg.emit(f"Vdrain limit exceeded: {vd} > {self.vd_max}. Stopping sweep.")
-                        self.stop_event.set()
-                        break
-                    if self.curr_max is not None and current > self.curr_max:
-                        self.log_msg.emit(f"Current limit exceeded: {current} > {self.curr_max}. Stopping sweep.")
-                        self.stop_event.set()
-                        break
-
-                    self.log_msg.emit(f"[RECORD] {timestamp}, Vg={vg}, Vd={vd}, I={current:.6f} A")
-                    # Signal used for record logging - handled via log_msg for simplicity
-
-                    record_signal = pyqtSignal(str, float, float, float)
-                    self.log_msg.emit(f"Measured current: {current:.6f} A")
-                    currents.append(current)
-                    self.data_points.append((vg, vd, current))
-
-                    self.update_plot.emit(plot_data, self.vd_values[:i+1], currents)
-
-        except Exception as e:
-            self.log_msg.emit(f"Error: {str(e)}")
-        
-        # Turn off Vdrain and Vgate channels
-        try:
-            self.instrument.write(f"INST:NSEL {self.vg_chan}")
-            self.instrument.write("OUTP OFF")
-            self.instrument.write(f"INST:NSEL {self.vd_chan}")
-            self.instrument.write("OUTP OFF")
-            self.log_msg.emit("Turned OFF Vgate and Vdrain channels after sweep completion.")
-        except Exception as e:
-            self.log_msg.emit(f"Failed to turn off channels after sweep: {e}")
-        
-        try:
-            idss = max((i for (vg, vd, i) in self.data_points if abs(vg) < 1e-4), default=None)
-
-            vd_max_val = max(vd for (_, vd, _) in self.data_points)
-            self.log_msg.emit(f"[DEBUG] Using Vd max = {vd_max_val}")
-
-            # Log all (vg, id) pairs at that vd
-            for vg, vd, i in self.data_points:
-                if round(vd, 6) == round(vd_max_val, 6):
-                    self.log_msg.emit(f"[DEBUG] Vg={vg}, Vd={vd}, Id={i}")
-
-
-            pinch_off_vgs = sorted(set(
-                round(vg, 3)
-                for (vg, vd, i) in self.data_points
-                if round(vd, 6) == round(vd_max_val, 6) and 0 <= i <= self.pinch_current_limit
-            ))
-            self.log_msg.emit(f"[DEBUG] Pinch-off I threshold: {self.pinch_current_limit} A")
-
-            print(pinch_off_vgs)
-
-            pinch_off = f"{min(pinch_off_vgs):.3f}V" if pinch_off_vgs else None
-
-
-
-
-            # Determine Vd value at 70% index into the vd_values list
-            vd_range_vals = sorted(set(vd for (_, vd, _) in self.data_points))
-            if len(vd_range_vals) < 2:
-                self.log_msg.emit("[DEBUG] Not enough Vd points to calculate GM.")
-                gm_max = None
-            else:
-                vd_index_custom = int(self.gm_vd_percent * (len(vd_range_vals) - 1))
-                vd_gm_val = vd_range_vals[vd_index_custom]
-                self.log_msg.emit(f"[DEBUG] GM calculated at Vd ≈ {vd_gm_val:.3f} V (user-selected %)")
-
-                gm_pairs = sorted([
-                    (vg, id_val)
-                    for (vg, vd, id_val) in self.data_points
-                    if round(vd, 6) == round(vd_gm_val, 6)
-                ], key=lambda x: x[0])
-
-                gm_values = []
-                gm_strings = []
-
-                for j in range(1, len(gm_pairs)):
-                    vg1, i1 = gm_pairs[j - 1]
-                    vg2, i2 = gm_pairs[j]
-                    if vg1 != vg2:
-                        gm = abs((i2 - i1) / (vg2 - vg1))
-                        gm_values.append(gm)
-                        gm_strings.append(f"{gm:.6f}")
-
-                gm_max = max(gm_values) if gm_values else None
-                gm_list_str = ", ".join(gm_strings)
-                self.log_msg.emit(f"[DEBUG] GMs at Vd={vd_gm_val}: {gm_list_str}")
-
-
-
-
-            self.parameters_ready.emit(idss, pinch_off, gm_max)
-
-        except Exception as e:
-            self.log_msg.emit(f"Parameter calc error: {e}")
-
-
+        self.sweep.run()
         self.finished.emit()
 
 class NGP800IVSweepApp(QWidget):
-    update_plot = pyqtSignal(object, list, list)  # name, x, y
     reset_ui = pyqtSignal()
+    writer_log = pyqtSignal(str)  # ResultWriter messages from its own thread
     def __init__(self):
         super().__init__()
         self.setWindowTitle("NGP800 I-V Characterization")
-        self.update_plot.connect(self.handle_update_plot)
         self.reset_ui.connect(self.handle_reset_ui)
+        self.writer_log.connect(self.log)
+        self.result_writer = None
+        self.sweep_total = 0
+        self.sweep_reordered = False
 
         self.stack = QStackedLayout()
         self.setLayout(self.stack)
@@ -379,41 +254,95 @@ class NGP800IVSweepApp(QWidget):
         self.is_paused = False
         self.setup_records_ui()
 
+        # Id-Vd traces are redrawn at most 20 times a second
+        self.plot_refresher = PlotRefresher(self, interval_ms=50)
+        self.traces = {}
+        self.plot_refresher.start()
+
 
     def on_connected(self, inst):
         self.instrument = inst
+        self.ngp = ngp800_for(inst)
         self.setup_config_ui()
 
     def log(self, message):
         timestamp = time.strftime("%H:%M:%S")
         self.log_widget.append(f"[{timestamp}] {message}")
 
-        if message.startswith("[RECORD]"):
-            try:
-                parts = message.replace("[RECORD]", "").strip().split(",")
-                time_str = parts[0].strip()
-                vg = float(parts[1].split("=")[1])
-                vd = float(parts[2].split("=")[1])
-                curr = float(parts[3].split("=")[1].split()[0])
-
-                row = self.records_table.rowCount()
-                self.records_table.insertRow(row)
-                self.records_table.setItem(row, 0, QTableWidgetItem(time_str))
-                self.records_table.setItem(row, 1, QTableWidgetItem(f"{vg:.3f}"))
-                self.records_table.setItem(row, 2, QTableWidgetItem(f"{vd:.3f}"))
-                self.records_table.setItem(row, 3, QTableWidgetItem(f"{curr:.6f}"))
-            except Exception as e:
-                print(f"[RECORD PARSE ERROR] {e}")
+    def add_record(self, rec):
+        self.log(f"Measured current: {rec.current:.6f} A (Vg={rec.vg}, Vd={rec.vd})")
+
+        values = {name: getattr(rec, name) for name in self.results.columns}
+        self.records_model.append(values)
 
 
 
-    def handle_update_plot(self, plot_data, x_vals, y_vals):
-        if plot_data not in self.plot_widget.listDataItems():
-            self.plot_widget.addItem(plot_data)
-        plot_data.setData(x_vals, y_vals)
+    def start_trace(self, vg):
+        if vg in self.traces:
+            return  # Trace already started from resumed records
+        item = self.plot_widget.plot([], [], pen=pg.mkPen(get_bright_color(), width=2), name=f"Vg={vg}V")
+        self.traces[vg] = self.plot_refresher.add(LiveCurve(item))
 
+    def append_trace_points(self, vg, vd_values, currents):
+        self.traces[vg].extend(vd_values, currents)
 
-    def handle_reset_ui(self):
+
+    def browse_results_path(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Stream Results To", "", "CSV / HDF5 (*.csv *.h5);;All Files (*)")
+        if path:
+            self.results_path_input.setText(path)
+
+    def open_result_writer(self):
+        # Returns the records to resume after ([] for a fresh run), or None if cancelled
+        self.result_writer = None
+        path = self.results_path_input.text().strip()
+        if not path:
+            return []
+
+        writer = ResultWriter(path, self.results.columns, fmt=self.results_format_combo.currentText(),
+                              log=self.writer_log.emit)
+        existing = writer.existing_rows()
+        resume = False
+        if existing:
+            answer = QMessageBox.question(
+                self, "Resume Sweep",
+                f"{len(existing)} records already in {', '.join(writer.paths())}.\n"
+                "Resume after the last record? (No overwrites the file.)",
+                QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No | QMessageBox.StandardButton.Cancel
+            )
+            if answer == QMessageBox.StandardButton.Cancel:
+                return None
+            resume = answer == QMessageBox.StandardButton.Yes
+
+        try:
+            writer.open(resume=resume)
+        except Exception as e:
+            QMessageBox.warning(self, "Results File Error", f"Failed to open results file: {e}")
+            return None
+        writer.start()
+        self.result_writer = writer
+        self.log(f"Streaming results to {', '.join(writer.paths())}")
+        return existing if resume else []
+
+    def close_result_writer(self, writer, sort_by=None):
+        if writer:
+            writer.close(sort_by=sort_by)
+            self.log(f"Results file closed ({writer.written} records)")
+        if self.result_writer is writer:
+            self.result_writer = None
+
+    def handle_reset_ui(self, writer=None):
+        # Runs once the worker thread of the run that owns writer has exited
+        self.plot_refresher.refresh()
+        # A complete out-of-order run goes back to canonical (Vg, Vd) order, on
+        # screen and on disk; a partial one stays in run order so it can resume
+        canonical = None
+        if self.sweep_reordered and len(self.results) >= self.sweep_total:
+            self.records_model.sort_by("point")
+            canonical = "point"
+            self.log("Records sorted back to canonical grid order")
+        self.sweep_reordered = False
+        self.close_result_writer(writer, sort_by=canonical)
         self.run_button.setEnabled(True)
         self.pause_resume_button.setEnabled(False)
         self.stop_button.setEnabled(False)
@@ -426,11 +355,23 @@ class NGP800IVSweepApp(QWidget):
         self.records_widget = QWidget()
         layout = QVBoxLayout(self.records_widget)
 
-        from PyQt6.QtWidgets import QTableWidget, QTableWidgetItem
-
-        self.records_table = QTableWidget()
-        self.records_table.setColumnCount(4)
-        self.records_table.setHorizontalHeaderLabels(["Timestamp", "Vgate (V)", "Vdrain (V)", "Current (A)"])
+        # (header, store column, display formatter); the store is the system of
+        # record, the table only formats the rows that are visible
+        self.record_columns = [
+            ("Timestamp", "timestamp", fmt_time),
+            ("Vgate (V)", "vg", fmt_fixed(3)),
+            ("Vdrain (V)", "vd", fmt_fixed(3)),
+            ("Current (A)", "current", fmt_fixed(6)),
+            ("Ig (A)", "ig", fmt_fixed(6)),
+            ("Vgate actual (V)", "vg_actual", fmt_fixed(4)),
+            ("Vdrain actual (V)", "vd_actual", fmt_fixed(4)),
+            ("Grid Point", "point", fmt_fixed(0)),
+        ]
+        self.results = ColumnStore([(name, np.float64) for _, name, _ in self.record_columns])
+        self.records_model = RecordsTableModel(self.results, self.record_columns, self)
+
+        self.records_table = QTableView()
+        self.records_table.setModel(self.records_model)
         
         self.records_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
         self.records_table.horizontalHeader().setStretchLastSection(False)
@@ -441,7 +382,7 @@ class NGP800IVSweepApp(QWidget):
 
 
         self.records_table.setStyleSheet("""
-            QTableWidget {
+            QTableView {
                 font-size: 11pt;
                 border: 1px solid #7aa9ff;
                 border-radius: 6px;
@@ -453,15 +394,13 @@ class NGP800IVSweepApp(QWidget):
                 font-size: 11pt;
                 border: 1px solid #a0c4ff;
             }
-            QTableWidget::item {
+            QTableView::item {
                 padding: 4px;
             }
         """)
         self.records_table.verticalHeader().setVisible(False)
 
-        
-        self.records_table.setColumnCount(4)
-        self.records_table.setHorizontalHeaderLabels(["Timestamp", "Vgate (V)", "Vdrain (V)", "Current (A)"])
+
         layout.addWidget(self.records_table)
 
         back_button = QPushButton("Back")
@@ -510,20 +449,25 @@ class NGP800IVSweepApp(QWidget):
     def show_records_screen(self):
         self.stack.setCurrentWidget(self.records_widget)
 
+    def show_trace_panel(self):
+        if getattr(self, "trace_panel", None) is None:
+            self.trace_panel = TracePanel()
+        self.trace_panel.show()
+        self.trace_panel.raise_()
+
     def export_records_to_csv(self):
         path, _ = QFileDialog.getSaveFileName(self, "Save Records as CSV", "", "CSV Files (*.csv);;All Files (*)")
         if path:
             try:
                 with open(path, 'w') as f:
                     # Write header
-                    headers = [self.records_table.horizontalHeaderItem(i).text() for i in range(self.records_table.columnCount())]
-                    f.write(",".join(headers) + "\n")
-                    # Write table data
-                    for row in range(self.records_table.rowCount()):
-                        row_data = []
-                        for col in range(self.records_table.columnCount()):
-                            item = self.records_table.item(row, col)
-                            row_data.append(item.text() if item else "")
+                    f.write(",".join(self.records_model.headers()) + "\n")
+                    # Write data straight from the results store, full precision
+                    for row in range(len(self.results)):
+                        row_data = [format_time(self.results.value(row, "timestamp"))]
+                        for name in self.results.columns[1:]:
+                            value = self.results.value(row, name)
+                            row_data.append("N/A" if np.isnan(value) else repr(float(value)))
                         f.write(",".join(row_data) + "\n")
                 self.log(f"Records exported to {path}")
             except Exception as e:
@@ -548,10 +492,9 @@ class NGP800IVSweepApp(QWidget):
             vd_chan = self.vd_chan_combo.currentText().replace("CH", "")
             vg_chan = self.vg_chan_combo.currentText().replace("CH", "")
 
-            self.instrument.write(f"INST:NSEL {vd_chan}")
-            self.instrument.write(f"CURR {idrain}")
-            self.instrument.write(f"INST:NSEL {vg_chan}")
-            self.instrument.write(f"CURR {igate}")
+            with self.ngp.batch():
+                self.ngp.set_current_limit(vd_chan, idrain)
+                self.ngp.set_current_limit(vg_chan, igate)
 
             self.log(f"Set current limits: Vdrain CH{vd_chan} = {idrain} A, Vgate CH{vg_chan} = {igate} A")
 
@@ -667,6 +610,30 @@ class NGP800IVSweepApp(QWidget):
         self.set_limits_button = QPushButton("Set Limits")
         grid.addWidget(self.set_limits_button, 5, 4)
 
+        # Streaming results file: every record goes to disk as it is measured
+        grid.addWidget(QLabel("Stream results to:"), 6, 0)
+        self.results_path_input = QLineEdit()
+        self.results_path_input.setPlaceholderText("blank = off")
+        grid.addWidget(self.results_path_input, 6, 1, 1, 2)
+        results_browse_button = QPushButton("Browse")
+        results_browse_button.clicked.connect(self.browse_results_path)
+        grid.addWidget(results_browse_button, 6, 3)
+        self.results_format_combo = QComboBox()
+        self.results_format_combo.addItems(RESULT_FORMATS)
+        grid.addWidget(self.results_format_combo, 6, 4)
+
+        # Point order over the Vg x Vd grid; "Estimate" shows the plan and run time
+        grid.addWidget(QLabel("Sweep order:"), 7, 0)
+        self.sweep_order_combo = QComboBox()
+        self.sweep_order_combo.addItems(ORDERS)
+        self.sweep_order_combo.setCurrentText(IV_DEFAULT_ORDER)
+        grid.addWidget(self.sweep_order_combo, 7, 1)
+        self.estimate_button = QPushButton("Estimate")
+        self.estimate_button.clicked.connect(self.estimate_sweep)
+        grid.addWidget(self.estimate_button, 7, 2)
+        self.plan_label = QLabel("")
+        grid.addWidget(self.plan_label, 7, 3, 1, 2)
+
         layout.addLayout(grid)
 
 
@@ -723,6 +690,11 @@ class NGP800IVSweepApp(QWidget):
         layout.addWidget(self.view_records_button)
         self.view_records_button.clicked.connect(self.show_records_screen)
 
+        # Per-command VISA timing of every instrument session
+        self.trace_button = QPushButton("VISA Trace")
+        layout.addWidget(self.trace_button)
+        self.trace_button.clicked.connect(self.show_trace_panel)
+
         # Connect buttons
         self.run_button.clicked.connect(self.run_sweep_threaded)
         self.pause_resume_button.clicked.connect(self.toggle_pause_resume)
@@ -887,14 +859,13 @@ class NGP800IVSweepApp(QWidget):
 
         try:
             # Turn off all channels (1 to 4)
-            for ch in range(1, 5):
-                self.instrument.write(f"INST:NSEL {ch}")
-                self.instrument.write("OUTP OFF")
+            self.ngp.outputs_off()
             self.log("All channels turned OFF.")
         except Exception as e:
             self.log(f"Failed to turn off channels: {e}")
-            
-        self.run_button.setEnabled(True)
+
+        # Run comes back in handle_reset_ui once the worker thread has exited
+        self.pause_event.clear()
         self.pause_resume_button.setEnabled(False)
         self.stop_button.setEnabled(False)
         self.pause_resume_button.setText("Pause")
@@ -934,6 +905,9 @@ class NGP800IVSweepApp(QWidget):
             QMessageBox.warning(self, "Input Error", "Please enter a valid GM % (e.g. 70, between 1 and 100).")
             return
 
+        resumed_rows = self.open_result_writer()
+        if resumed_rows is None:
+            return
 
         self.stop_event.clear()
         self.pause_event.clear()
@@ -945,42 +919,82 @@ class NGP800IVSweepApp(QWidget):
 
         vg_chan = self.vg_chan_combo.currentText().replace("CH", "")
         vd_chan = self.vd_chan_combo.currentText().replace("CH", "")
-        vg_values = [round(v, 6) for v in self.frange(vg_start, vg_end, vg_step)]
-        vd_values = [round(v, 6) for v in self.frange(vd_start, vd_end, vd_step)]
+        vg_values = linear_axis(vg_start, vg_end, vg_step).tolist()
+        vd_values = linear_axis(vd_start, vd_end, vd_step).tolist()
 
         self.plot_widget.clear()
         self.plot_widget.addLegend()
+        self.plot_refresher.clear()
+        self.traces = {}
         # Reset parameters
         self.idss_value.setText("--")
         self.pinch_value.setText("--")
         self.gm_value.setText("--")
 
         # Clear records table
-        self.records_table.setRowCount(0)
+        self.records_model.clear()
+
+        resume_points = []
+        for values in resumed_rows:
+            self.records_model.append(values)
+            self.start_trace(values["vg"])
+            self.traces[values["vg"]].append(values["vd"], values["current"])
+            resume_points.append((values["vg"], values["vd"], values["current"]))
+        if resumed_rows:
+            self.log(f"Resuming after {len(resumed_rows)} recorded points")
 
 
         self.worker = SweepWorker(
             self.instrument, vg_chan, vd_chan, vg_values, vd_values, vg_dur, vd_dur,
             self.stop_event, self.pause_event,
-            vg_max=self.vg_max, vd_max=self.vd_max, curr_max=self.curr_max,gm_vd_percent=gm_vd_pct,pinch_current_limit=pinch_curr_ma
+            vg_max=self.vg_max, vd_max=self.vd_max, curr_max=self.curr_max,gm_vd_percent=gm_vd_pct,pinch_current_limit=pinch_curr_ma,
+            resume_points=resume_points, order=self.sweep_order_combo.currentText(),
+            writer=self.result_writer
         )
+        grid = self.worker.grid
+        self.sweep_total = grid.total
+        self.sweep_reordered = grid.reordered()
+        self.show_plan(grid)
 
         self.thread = QThread()
         self.worker.moveToThread(self.thread)
 
         # Connect signals
-        self.worker.update_plot.connect(self.handle_update_plot)
+        self.worker.trace_started.connect(self.start_trace)
+        self.worker.points_ready.connect(self.append_trace_points)
         self.worker.log_msg.connect(self.log)
+        self.worker.record_ready.connect(self.add_record)
         self.worker.parameters_ready.connect(self.update_parameters_display)
 
         self.worker.finished.connect(self.thread.quit)
         self.worker.finished.connect(self.worker.deleteLater)
         self.thread.finished.connect(self.thread.deleteLater)
-        self.thread.finished.connect(self.handle_reset_ui)
+        writer = self.worker.writer
+        self.thread.finished.connect(lambda: self.handle_reset_ui(writer))
 
         self.thread.started.connect(self.worker.run)
         self.thread.start()
 
+    def estimate_sweep(self):
+        try:
+            vg_values = linear_axis(float(self.vg_start.text()), float(self.vg_end.text()), float(self.vg_step.text()))
+            vd_values = linear_axis(float(self.vd_start.text()), float(self.vd_end.text()), float(self.vd_step.text()))
+            vg_dur = float(self.vg_dur.text())
+            vd_dur = float(self.vd_dur.text())
+        except ValueError:
+            QMessageBox.warning(self, "Input Error", "Please enter valid numeric values for all fields.")
+            return
+        self.show_plan(iv_grid(vg_values, vd_values, vg_dur, vd_dur, self.sweep_order_combo.currentText()))
+
+    def show_plan(self, grid):
+        # Estimate and loop nesting, with a warning when Vd runs outer
+        outer = " > ".join(a.name for a in grid.axes)
+        self.plan_label.setText(f"est. {grid.format_estimate()}, {outer}")
+        self.log(f"Plan: {grid.describe()}, outer to inner: {', '.join(a.name for a in grid.axes)}")
+        note = order_note(grid)
+        if note:
+            self.log(note)
+
     def update_parameters_display(self, idss, pinch, gm_max):
         self.idss_value.setText(f"{idss:.6f} A" if idss is not None else "--")
         self.pinch_value.setText(pinch if pinch is not None else "--")
@@ -988,30 +1002,15 @@ class NGP800IVSweepApp(QWidget):
 
 
 
-    def frange(self, start, stop, step):
-        values = []
-        v = start
-        if step > 0:
-            while v <= stop:
-                values.append(round(v, 6))  # rounding here to keep consistency
-                v += step
-        elif step < 0:
-            while v >= stop:
-                values.append(round(v, 6))
-                v += step
-        else:
-            raise ValueError("Step must not be zero")
-        return values
-
-
     def closeEvent(self, event):
         if self.instrument:
             try:
-                for ch in range(1, 5):
-                    self.instrument.write(f"INST:NSEL {ch}")
-                    self.instrument.write("OUTP OFF")
+                self.ngp.outputs_off()
             except Exception as e:
                 print(f"Error turning off channels: {e}")
+        if self.result_writer:
+            self.result_writer.close()
+            self.result_writer = None
         event.accept()
 
 
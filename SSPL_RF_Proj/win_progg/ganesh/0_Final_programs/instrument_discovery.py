@@ -0,0 +1,136 @@
+import os
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+from pyvisa.constants import Parity, StopBits
+
+from visa_pool import get_pool
+from sim_instruments import simulation_enabled
+
+
+INSTRUMENT_KINDS = ("ngp800", "exg", "power_meter")
+
+
+def default_cache_path():
+    # Simulated runs keep their own cache so they never shadow the real bench.
+    # Resolved per discovery, so SSPL_RF_SIM can be set after import (sweep_cli --sim)
+    name = ".sspl_rf_instruments_sim.json" if simulation_enabled() else ".sspl_rf_instruments.json"
+    return os.path.join(os.path.expanduser("~"), name)
+
+
+def classify(idn):
+    # (kind, device_type) for a *IDN? response, (None, None) if not a bench instrument.
+    # NGP800 is checked first since its IDN also carries the R&S vendor string.
+    if "NGP800" in idn or "NGP824" in idn:
+        return "ngp800", "NGP800"
+    if "N5173B" in idn:
+        return "exg", "N5173B"
+    if "NRX" in idn:
+        return "power_meter", "NRX"
+    if "NRP2" in idn:
+        return "power_meter", "NRP2"
+    if "Rohde & Schwarz" in idn:
+        return "power_meter", "UNKNOWN"
+    return None, None
+
+
+def is_candidate(resource):
+    return "USB" in resource or resource.startswith("ASRL")
+
+
+class InstrumentDiscovery:
+    # Finds the NGP800, EXG and power meter in one pass. Resources are probed
+    # with *IDN? concurrently on a thread pool; addresses that identified last
+    # time (JSON cache on disk) are tried first so a normal startup never has
+    # to scan the whole bus. Sessions live in the shared VisaPool, so a second
+    # discovery in the same process costs no *IDN? round trips.
+
+    def __init__(self, pool=None, cache_path=None, timeout_ms=2000, max_workers=8, log=None):
+        self.pool = pool or get_pool()
+        self.cache_path = cache_path or default_cache_path()
+        self.timeout_ms = timeout_ms
+        self.max_workers = max_workers
+        self.log = log or (lambda message: None)
+
+    def load_cache(self):
+        try:
+            with open(self.cache_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def save_cache(self, cache):
+        try:
+            with open(self.cache_path, "w") as f:
+                json.dump(cache, f, indent=2)
+        except OSError as e:
+            self.log(f"[WARNING] Could not write instrument cache {self.cache_path}: {e}")
+
+    def setup_session(self, instr):
+        if instr.resource_name.startswith("ASRL"):
+            instr.baud_rate = 115200
+            instr.data_bits = 8
+            instr.stop_bits = StopBits.one
+            instr.parity = Parity.none
+            instr.write_termination = '\n'
+            instr.read_termination = '\n'
+        instr.timeout = self.timeout_ms
+
+    def identify(self, resource):
+        # (instr, idn) from the pool, or (None, None) if the resource does not answer
+        try:
+            instr, idn = self.pool.identify(resource, setup=self.setup_session)
+        except Exception as e:
+            self.log(f"Error identifying {resource}: {e}")
+            return None, None
+        self.log(f"IDN for {resource}: {idn}")
+        return instr, idn
+
+    def probe(self, resources, wanted, found, identified):
+        if not resources:
+            return
+        workers = min(self.max_workers, len(resources))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="visa-probe") as pool:
+            results = list(pool.map(self.identify, resources))
+
+        for resource, (instr, idn) in zip(resources, results):
+            if instr is None:
+                continue
+            kind, device_type = classify(idn)
+            if kind:
+                identified[resource] = idn
+            if kind in wanted and kind not in found:
+                instr.device_type = device_type
+                found[kind] = (instr, idn)
+            elif kind is None:
+                # Not a bench instrument: don't hold its port open
+                self.pool.close(resource)
+
+    def discover(self, wanted=INSTRUMENT_KINDS, exclude=()):
+        # Returns {kind: (instr, idn)} for every wanted kind that was found.
+        # exclude: resource names already open elsewhere, never probed again.
+        wanted = set(wanted)
+        found = {}
+        cache = self.load_cache()
+        identified = {}
+
+        cached = [res for res, idn in cache.items()
+                  if res not in exclude and classify(idn)[0] in wanted]
+        if cached:
+            self.log(f"Trying cached instruments first: {cached}")
+            self.probe(cached, wanted, found, identified)
+
+        if wanted - set(found):
+            resources = self.pool.list_resources()
+            self.log(f"Resources found: {resources}")
+            rest = [res for res in resources
+                    if is_candidate(res) and res not in exclude and res not in cached]
+            self.probe(rest, wanted, found, identified)
+
+        # Cached addresses that no longer answer are dropped
+        for res in cached:
+            if res not in identified:
+                cache.pop(res, None)
+        cache.update(identified)
+        self.save_cache(cache)
+        return found
@@ -0,0 +1,228 @@
+import time
+
+import numpy as np
+
+from records import IVRecord
+from ngp800_driver import ngp800_for
+from sweep_planner import Axis, compile_grid
+from sweep_axis import axis_index
+
+
+# Vg outer, Vd inner: one Id-Vd trace per gate voltage, the classic family.
+# "Slow axis outer" / "Auto" may put Vd outer when its dwell is longer,
+# which measures transfer curves (Id-Vg per Vd) instead.
+IV_DEFAULT_ORDER = "As entered"
+
+
+def iv_grid(vg_values, vd_values, vg_dur, vd_dur, order=IV_DEFAULT_ORDER):
+    # Vg x Vd grid (canonical order: Vg outer); an axis change costs its dwell
+    return compile_grid([Axis("vg", vg_values, vg_dur), Axis("vd", vd_values, vd_dur)], order)
+
+
+def order_note(grid):
+    # Warning text when the execution order runs Vd outer, else None
+    if grid.axes and grid.axes[0].name == "vd" and len(grid.axes[0]) > 1 and len(grid.axes[1]) > 1:
+        return (f"[WARNING] {grid.order} runs Vd outer, Vg inner (transfer curves per Vd), "
+                f"not Id-Vd families; choose \"As entered\" for Vg outer")
+    return None
+
+
+class IVSweep:
+    # Id-Vd family measurement on the NGP800, free of any GUI. Everything it
+    # reports goes through emit(kind, payload), like SweepEngine's results:
+    #   ("log", str), ("trace_started", vg), ("points", (vg, [vd], [id])),
+    #   ("record", IVRecord), ("parameters", (idss, pinch_off, gm_max))
+    # id_vd_char.SweepWorker turns these into Qt signals; sweep_cli consumes
+    # them directly.
+
+    def __init__(self, instrument, vg_chan, vd_chan,
+                 vg_values, vd_values, vg_dur, vd_dur,
+                 stop_event, pause_event,
+                 vg_max=None, vd_max=None, curr_max=None, gm_vd_percent=0.7, pinch_current_limit=0.01,
+                 resume_points=None, order=IV_DEFAULT_ORDER, emit=None, grid=None):
+        self.instrument = instrument
+        self.ngp = ngp800_for(instrument)  # state cache shared with the GUI thread
+        self.vg_chan = vg_chan
+        self.vd_chan = vd_chan
+        self.vg_values = vg_values
+        self.vd_values = vd_values
+        # grid: precompiled iv_grid() of these axes (recipes), else built here
+        self.grid = grid if grid is not None else iv_grid(vg_values, vd_values, vg_dur, vd_dur, order)
+        self.vg_dur = vg_dur
+        self.vd_dur = vd_dur
+        self.stop_event = stop_event
+        self.pause_event = pause_event
+        self.vg_max = vg_max
+        self.vd_max = vd_max
+        self.curr_max = curr_max
+        self.emit = emit or (lambda kind, payload: None)
+        # Id per (Vg index, Vd index), NaN until measured; seeded with points already on disk
+        self.id_map = np.full((len(vg_values), len(vd_values)), np.nan)
+        self.done_points = set()
+        vg_index, vd_index = axis_index(vg_values), axis_index(vd_values)
+        for vg, vd, current in resume_points or []:
+            if vg in vg_index and vd in vd_index:
+                self.id_map[vg_index[vg], vd_index[vd]] = current
+                self.done_points.add((vg, vd))
+        self.gm_vd_percent = gm_vd_percent
+        self.pinch_current_limit = pinch_current_limit
+        self.flush_interval = 0.05  # s between plot deltas sent to the GUI
+
+    def log(self, message):
+        self.emit("log", message)
+
+    def dwell(self, seconds):
+        # Settling time after a Vg / Vd step
+        time.sleep(seconds)
+
+    def run(self):
+        try:
+            self.measure()
+        except Exception as e:
+            self.log(f"Error: {str(e)}")
+
+        # Turn off Vdrain and Vgate channels
+        try:
+            self.ngp.outputs_off((self.vg_chan, self.vd_chan))
+            self.log("Turned OFF Vgate and Vdrain channels after sweep completion.")
+        except Exception as e:
+            self.log(f"Failed to turn off channels after sweep: {e}")
+
+        try:
+            self.emit("parameters", self.extract_parameters())
+        except Exception as e:
+            self.log(f"Parameter calc error: {e}")
+
+    def measure(self):
+        grid = self.grid
+        # Cached NGP800 state may be stale (front panel, OCP trip, failed
+        # outputs_off): start from a clean cache so every set point is sent
+        self.ngp.invalidate()
+        vg_set = vd_set = None
+        trace_vg = None
+        pending_vd, pending_id = [], []
+        last_flush = time.monotonic()
+        writes0, reads0 = self.ngp.transactions()
+        points = 0
+
+        for k in range(grid.total):
+            point = grid.point(k)
+            vg, vd = point["vg"], point["vd"]
+            if (vg, vd) in self.done_points:
+                continue
+            while self.pause_event.is_set():
+                time.sleep(0.1)
+            if self.stop_event.is_set():
+                break
+
+            if vg != vg_set:
+                self.log(f"Setting Vgate to {vg} V on channel {self.vg_chan}")
+                self.ngp.apply(self.vg_chan, vg)
+                # Check Vgate limit
+                if self.vg_max is not None and vg > self.vg_max:
+                    self.log(f"Vgate limit exceeded: {vg} > {self.vg_max}. Stopping sweep.")
+                    self.stop_event.set()
+                    break
+                self.dwell(self.vg_dur)
+                vg_set = vg
+
+            if vg != trace_vg:
+                if pending_vd:
+                    self.emit("points", (trace_vg, pending_vd, pending_id))
+                    pending_vd, pending_id = [], []
+                self.emit("trace_started", vg)
+                trace_vg = vg
+
+            if vd != vd_set:
+                self.log(f"Setting Vdrain to {vd} V on channel {self.vd_chan}")
+                self.ngp.apply(self.vd_chan, vd)
+                self.dwell(self.vd_dur)
+                vd_set = vd
+
+            # Vg/Ig/Vd/Id of both rails in one query
+            vg_actual, ig, vd_actual, current = [float(v) for v in self.ngp.readback((self.vg_chan, self.vd_chan))]
+            timestamp = time.time()
+            # Check limits
+            if self.vd_max is not None and vd > self.vd_max:
+                self.log(f"Vdrain limit exceeded: {vd} > {self.vd_max}. Stopping sweep.")
+                self.stop_event.set()
+                break
+            if self.curr_max is not None and current > self.curr_max:
+                self.log(f"Current limit exceeded: {current} > {self.curr_max}. Stopping sweep.")
+                self.stop_event.set()
+                self.ngp.invalidate()
+                break
+
+            canonical = grid.canonical_index(k)
+            self.emit("record", IVRecord(timestamp, vg, vd, current, ig=ig,
+                                         vg_actual=vg_actual, vd_actual=vd_actual, point=canonical))
+            self.id_map[divmod(canonical, len(self.vd_values))] = current
+            points += 1
+
+            # Only new points cross to the GUI thread, batched per flush interval
+            pending_vd.append(vd)
+            pending_id.append(current)
+            if time.monotonic() - last_flush >= self.flush_interval:
+                self.emit("points", (vg, pending_vd, pending_id))
+                pending_vd, pending_id = [], []
+                last_flush = time.monotonic()
+
+        if pending_vd:
+            self.emit("points", (trace_vg, pending_vd, pending_id))
+
+        writes, reads = self.ngp.transactions()
+        if points:
+            self.log(f"[NGP800] {writes - writes0} writes, {reads - reads0} reads "
+                     f"for {points} points ({(writes - writes0 + reads - reads0) / points:.1f}/point)")
+
+    def extract_parameters(self):
+        # (idss, pinch_off, gm_max) from the measured Id map. Id is taken as
+        # a (Vg, Vd) matrix: rows and columns are picked by index, not by
+        # comparing rounded voltages
+        vg_arr = np.asarray(self.vg_values, dtype=float)
+        vd_arr = np.asarray(self.vd_values, dtype=float)
+        id_map = self.id_map
+        measured = np.isfinite(id_map)
+
+        at_zero = id_map[np.abs(vg_arr) < 1e-4]
+        idss = float(np.nanmax(at_zero)) if np.isfinite(at_zero).any() else None
+
+        vd_cols = np.flatnonzero(measured.any(axis=0))
+        col_max = vd_cols[np.argmax(vd_arr[vd_cols])]
+        vd_max_val = vd_arr[col_max]
+        self.log(f"[DEBUG] Using Vd max = {vd_max_val}")
+
+        # Log all (vg, id) pairs at that vd
+        for row in np.flatnonzero(measured[:, col_max]):
+            self.log(f"[DEBUG] Vg={vg_arr[row]}, Vd={vd_max_val}, Id={id_map[row, col_max]}")
+
+        at_vd_max = id_map[:, col_max]
+        pinched = measured[:, col_max] & (at_vd_max >= 0) & (at_vd_max <= self.pinch_current_limit)
+        pinch_off_vgs = sorted(set(np.round(vg_arr[pinched], 3).tolist()))
+        self.log(f"[DEBUG] Pinch-off I threshold: {self.pinch_current_limit} A")
+
+        pinch_off = f"{min(pinch_off_vgs):.3f}V" if pinch_off_vgs else None
+
+        # Determine Vd value at 70% index into the measured Vd columns
+        vd_cols = vd_cols[np.argsort(vd_arr[vd_cols])]
+        if len(vd_cols) < 2:
+            self.log("[DEBUG] Not enough Vd points to calculate GM.")
+            gm_max = None
+        else:
+            col_gm = vd_cols[int(self.gm_vd_percent * (len(vd_cols) - 1))]
+            vd_gm_val = vd_arr[col_gm]
+            self.log(f"[DEBUG] GM calculated at Vd ≈ {vd_gm_val:.3f} V (user-selected %)")
+
+            rows = np.flatnonzero(measured[:, col_gm])
+            rows = rows[np.argsort(vg_arr[rows], kind="stable")]
+            dvg = np.diff(vg_arr[rows])
+            did = np.diff(id_map[rows, col_gm])
+            step = dvg != 0
+            gm_values = np.abs(did[step] / dvg[step]).tolist()
+            gm_strings = [f"{gm:.6f}" for gm in gm_values]
+
+            gm_max = max(gm_values) if gm_values else None
+            gm_list_str = ", ".join(gm_strings)
+            self.log(f"[DEBUG] GMs at Vd={vd_gm_val}: {gm_list_str}")
+
+        return idss, pinch_off, gm_max
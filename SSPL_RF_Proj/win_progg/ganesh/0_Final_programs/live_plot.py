@@ -0,0 +1,85 @@
+import numpy as np
+from PyQt6.QtCore import QTimer
+
+
+class LiveCurve:
+    # Append-only x/y buffer behind one persistent pg.PlotDataItem. Appending
+    # only marks the curve dirty; the item is redrawn by a PlotRefresher tick,
+    # so point arrival rate never drives redraw work.
+
+    def __init__(self, item, capacity=256):
+        self.item = item
+        self._capacity = max(1, int(capacity))
+        self._x = np.empty(self._capacity)
+        self._y = np.empty(self._capacity)
+        self.size = 0
+        self.dirty = False
+
+    def __len__(self):
+        return self.size
+
+    def _reserve(self, count):
+        if self.size + count <= self._capacity:
+            return
+        while self._capacity < self.size + count:
+            self._capacity *= 2
+        for name in ("_x", "_y"):
+            grown = np.empty(self._capacity)
+            grown[:self.size] = getattr(self, name)[:self.size]
+            setattr(self, name, grown)
+
+    def append(self, x, y):
+        self._reserve(1)
+        self._x[self.size] = x
+        self._y[self.size] = y
+        self.size += 1
+        self.dirty = True
+
+    def extend(self, xs, ys):
+        xs = np.asarray(xs, dtype=float)
+        ys = np.asarray(ys, dtype=float)
+        n = len(xs)
+        if not n:
+            return
+        self._reserve(n)
+        self._x[self.size:self.size + n] = xs
+        self._y[self.size:self.size + n] = ys
+        self.size += n
+        self.dirty = True
+
+    def clear(self):
+        self.size = 0
+        self.dirty = True
+
+    def refresh(self):
+        if not self.dirty:
+            return
+        self.dirty = False
+        self.item.setData(self._x[:self.size], self._y[:self.size])
+
+
+class PlotRefresher:
+    # Redraws dirty LiveCurves at a capped rate (20 Hz by default)
+
+    def __init__(self, parent=None, interval_ms=50):
+        self.curves = []
+        self.timer = QTimer(parent)
+        self.timer.setInterval(interval_ms)
+        self.timer.timeout.connect(self.refresh)
+
+    def add(self, curve):
+        self.curves.append(curve)
+        return curve
+
+    def clear(self):
+        self.curves = []
+
+    def start(self):
+        self.timer.start()
+
+    def stop(self):
+        self.timer.stop()
+
+    def refresh(self):
+        for curve in self.curves:
+            curve.refresh()
@@ -0,0 +1,185 @@
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+
+from visa_pool import get_pool
+
+
+CHANNELS = ("1", "2", "3", "4")
+
+
+class NGP800:
+    # Thread-safe NGP800 driver. Remembers the selected channel and each
+    # channel's set voltage, current limit and output state, and skips commands
+    # that would change nothing (INST:NSEL to the channel already selected,
+    # OUTP ON on an enabled output, ...). All access goes through the session's
+    # VisaPool lock, shared with any lease() on the same resource.
+    # Use ngp800_for(instr) so every thread talks to the same cache.
+    #
+    # The commands of one operation go out as a single compound SCPI message
+    # ("INST:NSEL 2;:VOLT 1.5;:OUTP ON"), and inside batch() everything up to
+    # the next query is joined too, so setting Vg and Vd and reading both
+    # currents is one write plus one read. writes / reads count bus transfers.
+
+    def __init__(self, instr, pool=None):
+        self.instr = instr
+        self.lock = (pool or get_pool()).lock(instr)
+        self._batch = None
+        self.invalidate()
+        self.writes = 0
+        self.reads = 0
+
+    def invalidate(self):
+        # Forget cached state (after an error or a change from the front panel)
+        with self.lock:
+            self.selected = None
+            self.voltage = {}
+            self.current_limit = {}
+            self.output = {}
+
+    def transactions(self):
+        # (writes, reads) so far; diff two snapshots for per-step counts
+        return self.writes, self.reads
+
+    def _send(self, commands, reply=False):
+        if self._batch is not None:
+            if not reply:
+                self._batch.extend(commands)
+                return None
+            commands = self._batch + commands
+            self._batch = []
+        if not commands:
+            return None
+        self.instr.write(";:".join(commands))
+        self.writes += 1
+        if reply:
+            self.reads += 1
+            return self.instr.read()
+        return None
+
+    def _guarded(self, fn, *args):
+        # A failed transfer leaves the instrument state unknown
+        with self.lock:
+            try:
+                return fn(*args)
+            except Exception:
+                self.invalidate()
+                raise
+
+    @contextmanager
+    def batch(self):
+        # Hold the lock and join every command issued inside into one message
+        with self.lock:
+            if self._batch is not None:
+                yield self
+                return
+            self._batch = []
+            try:
+                yield self
+                commands, self._batch = self._batch, None
+                self._send(commands)
+            except Exception:
+                self._batch = None
+                self.invalidate()
+                raise
+
+    def _select(self, ch):
+        ch = str(ch)
+        if self.selected == ch:
+            return []
+        self.selected = ch
+        return [f"INST:NSEL {ch}"]
+
+    def _voltage(self, ch, volts):
+        commands = self._select(ch)
+        if self.voltage.get(str(ch)) != volts:
+            commands.append(f"VOLT {volts}")
+            self.voltage[str(ch)] = volts
+        return commands
+
+    def _output(self, ch, on, force=False):
+        commands = self._select(ch)
+        if force or self.output.get(str(ch)) != on:
+            commands.append("OUTP ON" if on else "OUTP OFF")
+            self.output[str(ch)] = on
+        return commands
+
+    def _current_limit(self, ch, amps):
+        commands = self._select(ch)
+        if self.current_limit.get(str(ch)) != amps:
+            commands.append(f"CURR {amps}")
+            self.current_limit[str(ch)] = amps
+        return commands
+
+    def select(self, ch):
+        self._guarded(lambda: self._send(self._select(ch)))
+
+    def set_voltage(self, ch, volts):
+        self._guarded(lambda: self._send(self._voltage(ch, volts)))
+
+    def set_current_limit(self, ch, amps):
+        self._guarded(lambda: self._send(self._current_limit(ch, amps)))
+
+    def set_output(self, ch, on, force=False):
+        self._guarded(lambda: self._send(self._output(ch, on, force)))
+
+    def apply(self, ch, volts, on=True):
+        # Select + set + enable in one message
+        self._guarded(lambda: self._send(self._voltage(ch, volts) + self._output(ch, on)))
+
+    def measure_currents(self, channels):
+        # One query message for all channels; the NGP800 answers "i1;i2;..."
+        def measure():
+            commands = []
+            for ch in channels:
+                commands += self._select(ch) + ["MEAS:CURR?"]
+            response = self._send(commands, reply=True)
+            return [float(v) for v in response.strip().split(";")]
+        return self._guarded(measure)
+
+    def measure_current(self, ch):
+        return self.measure_currents((ch,))[0]
+
+    def readback(self, channels=None):
+        # Voltage and current of every channel in one composed query, parsed to
+        # a fixed row [V1, I1, V2, I2, ...] in the order given. channels=None
+        # reads every channel whose output the driver turned on.
+        def measure():
+            chans = list(channels) if channels is not None else \
+                [ch for ch in CHANNELS if self.output.get(ch)]
+            if not chans:
+                return np.empty(0)
+            commands = []
+            for ch in chans:
+                commands += self._select(ch) + ["MEAS:VOLT?", "MEAS:CURR?"]
+            response = self._send(commands, reply=True)
+            row = np.array(response.strip().split(";"), dtype=float)
+            if len(row) != 2 * len(chans):
+                raise ValueError(f"NGP800 readback returned {len(row)} values for {len(chans)} channels")
+            return row
+        return self._guarded(measure)
+
+    def outputs_off(self, channels=CHANNELS):
+        # Safety path: always sent, whatever the cache says
+        def off():
+            commands = []
+            for ch in channels:
+                commands += self._output(ch, False, force=True)
+            self._send(commands)
+        self._guarded(off)
+
+
+_drivers = {}
+_drivers_lock = threading.Lock()
+
+
+def ngp800_for(instr):
+    # One driver (and state cache) per session, shared by the GUI and worker threads
+    key = get_pool().key(instr)
+    with _drivers_lock:
+        driver = _drivers.get(key)
+        if driver is None or driver.instr is not instr:
+            driver = NGP800(instr)
+            _drivers[key] = driver
+        return driver
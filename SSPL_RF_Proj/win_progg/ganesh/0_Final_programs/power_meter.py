@@ -0,0 +1,78 @@
+import struct
+
+import numpy as np
+from pyvisa.errors import VisaIOError, InvalidBinaryFormat
+
+
+class PowerMeter:
+    # Thin driver over an NRX / NRP2 VISA session. Single readings keep the old
+    # READ? / MEAS:POW? behaviour; buffered mode collects one reading per trigger
+    # on the meter and returns the whole buffer as a NumPy array in one transfer.
+
+    def __init__(self, instr, log=None):
+        self.instr = instr
+        self.device_type = getattr(instr, "device_type", "UNKNOWN")
+        self.buffer_size = 0
+        self.log = log or (lambda message: None)
+
+    def configure(self, averaging=None, aperture=None):
+        if averaging:
+            self.instr.write(f"SENS:AVER:COUN {int(averaging)}")
+            self.instr.write("SENS:AVER:COUN:AUTO OFF")
+            self.instr.write("SENS:AVER:STAT ON")
+        else:
+            self.instr.write("SENS:AVER:STAT OFF")
+        if aperture:
+            self.instr.write(f"SENS:POW:AVG:APER {aperture}")
+
+    def set_frequency(self, freq_hz):
+        self.instr.write(f"SENS:FREQ {freq_hz} Hz")
+
+    def read(self):
+        if self.device_type == "NRP2":
+            response = self.instr.query("READ?").strip()
+        else:
+            response = self.instr.query("MEAS:POW?").strip()
+        return float(response)
+
+    # --- Buffered acquisition ---
+    def arm_buffer(self, count, trigger="EXT"):
+        # trigger: "EXT" for a hardware trigger (e.g. EXG TRIG out), "BUS" for *TRG
+        self.buffer_size = int(count)
+        self.instr.write("INIT:CONT OFF")
+        self.instr.write(f"TRIG:SOUR {trigger}")
+        self.instr.write(f"TRIG:COUN {self.buffer_size}")
+        self.instr.write(f"SENS:BUFF:SIZE {self.buffer_size}")
+        self.instr.write("SENS:BUFF:STAT ON")
+        self.instr.write("INIT")
+
+    def trigger(self):
+        self.instr.write("*TRG")
+
+    def fetch_buffer(self):
+        # One binary block read; R&S NORMal byte order is LSB first
+        values = None
+        try:
+            self.instr.write("FORM REAL,32")
+            self.instr.write("FORM:BORD NORM")
+            values = self.instr.query_binary_values(
+                "FETC?", datatype="f", is_big_endian=False, container=np.array
+            )
+        except (VisaIOError, InvalidBinaryFormat, ValueError, struct.error) as e:
+            # Older firmware without binary FETC? support; anything else
+            # (lost session, bug) propagates
+            self.log(f"[WARNING] Binary FETC? failed ({type(e).__name__}: {e}), reading the buffer as ASCII")
+        self.instr.write("FORM ASC")
+        if values is None:
+            raw = self.instr.query("FETC?").strip()
+            values = [float(v) for v in raw.split(",") if v]
+        return np.asarray(values, dtype=float)
+
+    def release_buffer(self):
+        self.buffer_size = 0
+        self.instr.write("SENS:BUFF:STAT OFF")
+        self.instr.write("TRIG:SOUR IMM")
+
+    def abort(self):
+        self.instr.write("ABOR")
+        self.release_buffer()
@@ -0,0 +1,561 @@
+import os
+import re
+import json
+import time
+import pickle
+import hashlib
+from types import MappingProxyType
+
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+if yaml is not None:
+    class RecipeLoader(yaml.SafeLoader):
+        # PyYAML follows YAML 1.1, where only "2.4e+9" is a float and "2.4e9"
+        # or "1e-3" load as strings; take every exponent form as a number
+        pass
+
+    RecipeLoader.add_implicit_resolver(
+        "tag:yaml.org,2002:float", re.compile(r"^[-+]?(\d+(\.\d*)?|\.\d+)[eE][-+]?\d+$"),
+        list("-+.0123456789"))
+
+try:
+    import tomllib
+except ImportError:
+    try:
+        import tomli as tomllib
+    except ImportError:
+        tomllib = None
+
+from settling import SETTLE_MODES, SettleConfig
+from sweep_engine import SweepPlan, VERIFY_MODES
+from sweep_planner import ORDERS
+from sweep_axis import linear_axis, log_axis, list_axis, adaptive_axis
+from iv_sweep import IVSweep, iv_grid, IV_DEFAULT_ORDER
+from result_writer import RESULT_FORMATS
+import settling
+import sweep_engine
+import sweep_planner
+import sweep_axis
+import iv_sweep
+
+
+# Sweep recipes for unattended / production runs. A recipe file (YAML, TOML
+# or JSON, same keys in all three) is validated and compiled once into a
+# CompiledPlan: the axes, the precompiled execution grid, a step summary,
+# the limits and the expected duration. Plans are cached by
+# the file's content hash, so running the same recipe again skips parsing,
+# validation and planning. Qt-free; sweep_cli runs the plans.
+#
+#   name: lot42_pa_2g4            # default: file name
+#   sweep: rf                     # rf | iv
+#   output: results/{name}_{date}.csv   # {name}, {date} (YYYYMMDD), {time} (HHMMSS)
+#   format: CSV                   # CSV | HDF5 | CSV + HDF5
+#   bias: {vg: -1.5, vd: 28, vg_channel: 1, vd_channel: 2}
+#   limits: {vg_max: 0, vd_max: 32, current_max: 0.8}
+#   rf: {freq_hz: 2.4e9, power_start: -20, power_stop: 10, power_step: 1, dwell: 0.5}
+#
+# "instruments": {ngp800, exg, power_meter} pins VISA resources (else
+# discovery). An iv sweep has an "iv" section instead of "rf":
+#   iv: {vg_start: -3, vg_stop: 0, vg_step: 0.5, vd_start: 0, vd_stop: 10, vd_step: 1}
+# In "rf", freq_stop_hz with freq_step_hz sweeps the frequency too, or with
+# freq_spacing: Log and freq_points on a log scale.
+# Any axis (rf power, iv vg / vd) takes an optional fine window, e.g.
+# vg_fine_step: 0.05, vg_fine_start: -2.5, vg_fine_stop: -1.5.
+
+# Modules whose code shapes a compiled plan (schema, axes, grid order and
+# estimate, engine plan); their source is part of the plan cache key
+PLAN_SOURCES = (__file__, settling.__file__, sweep_engine.__file__, sweep_planner.__file__,
+                sweep_axis.__file__, iv_sweep.__file__)
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".sspl_rf_recipes")
+RECIPE_SUFFIXES = (".yaml", ".yml", ".toml", ".json")
+SWEEP_KINDS = ("rf", "iv")
+INSTRUMENTS_NEEDED = {"rf": ("ngp800", "exg", "power_meter"), "iv": ("ngp800",)}
+
+# Recipe schema: {key: (type, default)}; REQUIRED marks keys without default.
+# float accepts integers, list accepts a list of numbers or "5, 10, 15".
+REQUIRED = object()
+TOP_FIELDS = {
+    "name": (str, None), "sweep": (str, REQUIRED), "output": (str, None), "format": (str, "CSV"),
+    "instruments": (dict, {}), "bias": (dict, {}), "limits": (dict, {}), "rf": (dict, None), "iv": (dict, None),
+}
+INSTRUMENT_FIELDS = {"ngp800": (str, None), "exg": (str, None), "power_meter": (str, None)}
+BIAS_FIELDS = {"vg": (float, None), "vd": (float, None), "vg_channel": (int, 1), "vd_channel": (int, 2)}
+LIMIT_FIELDS = {"vg_max": (float, None), "vd_max": (float, None), "current_max": (float, None)}
+# Frequency axis: "Linear" steps freq_step_hz from freq_hz to freq_stop_hz,
+# "Log" spreads freq_points over the same span on a log scale
+FREQ_SPACINGS = ["Linear", "Log"]
+RF_FIELDS = {
+    "freq_hz": (float, REQUIRED), "freq_stop_hz": (float, None), "freq_step_hz": (float, None),
+    "freq_spacing": (str, "Linear"), "freq_points": (int, None),
+    "vd_list": (list, None),
+    "power_start": (float, REQUIRED), "power_stop": (float, REQUIRED), "power_step": (float, REQUIRED),
+    "power_fine_step": (float, None), "power_fine_start": (float, None), "power_fine_stop": (float, None),
+    "dwell": (float, 1.0), "settle": (dict, {}),
+    "continuous_rf": (bool, True), "rf_off_between_segments": (bool, False),
+    "hardware_list": (bool, False), "buffered_pout": (bool, False),
+    "meter_averaging": (int, None), "meter_aperture": (float, None),
+    "verify_rf": (str, "First/Last"), "verify_every": (int, 10), "order": (str, "Slow axis outer"),
+    "input_loss_db": (float, 0.0), "input_gain_db": (float, 0.0), "output_loss_db": (float, 0.0),
+}
+SETTLE_FIELDS = {"mode": (str, "Fixed"), "current_tol": (float, 0.01), "power_tol_db": (float, 0.05),
+                 "max_time": (float, 3.0)}
+IV_FIELDS = {
+    "vg_start": (float, REQUIRED), "vg_stop": (float, REQUIRED), "vg_step": (float, REQUIRED),
+    "vg_fine_step": (float, None), "vg_fine_start": (float, None), "vg_fine_stop": (float, None),
+    "vg_dwell": (float, 0.0),
+    "vd_start": (float, REQUIRED), "vd_stop": (float, REQUIRED), "vd_step": (float, REQUIRED),
+    "vd_fine_step": (float, None), "vd_fine_start": (float, None), "vd_fine_stop": (float, None),
+    "vd_dwell": (float, 0.0),
+    "gm_vd_percent": (float, 70.0), "pinch_current_ma": (float, 1.0), "order": (str, IV_DEFAULT_ORDER),
+}
+CHOICES = {
+    ("", "sweep"): SWEEP_KINDS, ("", "format"): RESULT_FORMATS,
+    ("rf", "verify_rf"): VERIFY_MODES, ("rf", "freq_spacing"): FREQ_SPACINGS, ("rf", "order"): ORDERS, ("iv", "order"): ORDERS,
+    ("rf.settle", "mode"): SETTLE_MODES,
+}
+
+
+class RecipeError(Exception):
+    pass
+
+
+def parse_recipe(data, suffix, path="recipe"):
+    try:
+        if suffix in (".yaml", ".yml"):
+            if yaml is None:
+                raise RecipeError("YAML recipes need PyYAML (pip install pyyaml)")
+            recipe = yaml.load(data, Loader=RecipeLoader)
+        elif suffix == ".toml":
+            if tomllib is None:
+                raise RecipeError("TOML recipes need Python 3.11+ or tomli (pip install tomli)")
+            recipe = tomllib.loads(data.decode("utf-8"))
+        else:
+            recipe = json.loads(data)
+    except RecipeError:
+        raise
+    except Exception as e:
+        raise RecipeError(f"Cannot parse recipe {path}: {e}")
+    if not isinstance(recipe, dict):
+        raise RecipeError(f"{path}: a recipe must be a mapping of keys to values")
+    return recipe
+
+
+def check_value(value, kind, where):
+    # value converted to kind, or raises ValueError naming the key
+    if kind is float:
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise ValueError(f"{where} must be a number, got {value!r}")
+        return float(value)
+    if kind is int:
+        if isinstance(value, bool) or not isinstance(value, int):
+            raise ValueError(f"{where} must be an integer, got {value!r}")
+        return value
+    if kind is list:
+        try:
+            values = list_axis(value).tolist()
+        except (TypeError, ValueError):
+            raise ValueError(f"{where} must be a list of numbers, got {value!r}")
+        if not values:
+            raise ValueError(f"{where} must not be empty")
+        return values
+    if not isinstance(value, kind):
+        raise ValueError(f"{where} must be a {kind.__name__}, got {value!r}")
+    return value
+
+
+def check_section(data, fields, section, errors):
+    # Section with defaults filled in; problems are appended to errors so a
+    # recipe reports all of them at once
+    prefix = f"{section}." if section else ""
+    if not isinstance(data, dict):
+        errors.append(f"{section} must be a mapping")
+        return {}
+    result = {}
+    for key in data:
+        if key not in fields:
+            errors.append(f"unknown key {prefix}{key}")
+    for key, (kind, default) in fields.items():
+        if data.get(key) is None:
+            if default is REQUIRED:
+                errors.append(f"{prefix}{key} is required")
+            result[key] = None if default is REQUIRED else default
+            continue
+        try:
+            value = check_value(data[key], kind, prefix + key)
+        except ValueError as e:
+            errors.append(str(e))
+            result[key] = None
+            continue
+        choices = CHOICES.get((section, key))
+        if choices and value not in choices:
+            errors.append(f"{prefix}{key} must be one of {', '.join(choices)}, got {value!r}")
+        result[key] = value
+    return result
+
+
+def check_axis(section, values, name, errors):
+    # Linear axis start/stop/step from a checked section, None on error. With
+    # <name>_fine_step/_fine_start/_fine_stop the axis also gets the fine
+    # points of that window (e.g. around pinch-off or the compression knee).
+    start, stop, step = (values[f"{name}_{k}"] for k in ("start", "stop", "step"))
+    if None in (start, stop, step):
+        return None
+    if step == 0:
+        errors.append(f"{section}.{name}_step must not be zero")
+        return None
+    fine = [values.get(f"{name}_fine_{k}") for k in ("step", "start", "stop")]
+    if any(v is not None for v in fine):
+        if None in fine:
+            errors.append(f"{section}.{name}_fine_step, {name}_fine_start and {name}_fine_stop go together")
+            return None
+        if fine[0] == 0:
+            errors.append(f"{section}.{name}_fine_step must not be zero")
+            return None
+        axis = adaptive_axis(start, stop, step, *fine).tolist()
+    else:
+        axis = linear_axis(start, stop, step).tolist()
+    if not axis:
+        errors.append(f"{section}.{name}_step points away from {name}_stop ({start} -> {stop} by {step})")
+        return None
+    return axis
+
+
+def validate_recipe(raw, default_name="recipe"):
+    # Normalized recipe (every key present, defaults filled in) or RecipeError
+    # listing every problem found
+    errors = []
+    recipe = check_section(raw, TOP_FIELDS, "", errors)
+    recipe["name"] = recipe["name"] or default_name
+    recipe["instruments"] = check_section(recipe["instruments"], INSTRUMENT_FIELDS, "instruments", errors)
+    recipe["bias"] = check_section(recipe["bias"], BIAS_FIELDS, "bias", errors)
+    recipe["limits"] = check_section(recipe["limits"], LIMIT_FIELDS, "limits", errors)
+    for channel in ("vg_channel", "vd_channel"):
+        if recipe["bias"][channel] is not None and not 1 <= recipe["bias"][channel] <= 4:
+            errors.append(f"bias.{channel} must be 1..4")
+    if recipe["bias"]["vg_channel"] is not None and recipe["bias"]["vg_channel"] == recipe["bias"]["vd_channel"]:
+        errors.append("bias.vg_channel and bias.vd_channel must differ")
+    if recipe["limits"]["current_max"] is not None and recipe["limits"]["current_max"] <= 0:
+        errors.append("limits.current_max must be positive")
+
+    kind = recipe["sweep"]
+    other = {"rf": "iv", "iv": "rf"}.get(kind)
+    if other and recipe[other] is not None:
+        errors.append(f"\"{other}\" section given for a {kind} sweep")
+    if kind == "rf":
+        rf = recipe["rf"] = check_section(recipe["rf"] or {}, RF_FIELDS, "rf", errors)
+        rf["settle"] = check_section(rf["settle"] or {}, SETTLE_FIELDS, "rf.settle", errors)
+        for key in ("vg", "vd"):
+            if recipe["bias"][key] is None and not any(e.startswith(f"bias.{key} ") for e in errors):
+                errors.append(f"bias.{key} is required for an rf sweep")
+        if rf["freq_spacing"] == "Log":
+            if rf["freq_stop_hz"] is None or rf["freq_points"] is None:
+                errors.append("rf.freq_spacing Log needs freq_stop_hz and freq_points")
+            if rf["freq_step_hz"] is not None:
+                errors.append("rf.freq_step_hz does not apply to freq_spacing Log, use freq_points")
+            if rf["freq_points"] is not None and rf["freq_points"] < 2:
+                errors.append("rf.freq_points must be at least 2")
+            if any(f is not None and f <= 0 for f in (rf["freq_hz"], rf["freq_stop_hz"])):
+                errors.append("rf.freq_spacing Log needs positive freq_hz and freq_stop_hz")
+        else:
+            if (rf["freq_stop_hz"] is None) != (rf["freq_step_hz"] is None):
+                errors.append("rf.freq_stop_hz and rf.freq_step_hz go together")
+            if rf["freq_points"] is not None:
+                errors.append("rf.freq_points only applies to freq_spacing Log")
+        if rf["dwell"] is not None and rf["dwell"] < 0:
+            errors.append("rf.dwell must not be negative")
+        if rf["verify_every"] is not None and rf["verify_every"] < 1:
+            errors.append("rf.verify_every must be at least 1")
+    elif kind == "iv":
+        iv = recipe["iv"] = check_section(recipe["iv"] or {}, IV_FIELDS, "iv", errors)
+        for key in ("vg_dwell", "vd_dwell"):
+            if iv[key] is not None and iv[key] < 0:
+                errors.append(f"iv.{key} must not be negative")
+        if iv["gm_vd_percent"] is not None and not 0 <= iv["gm_vd_percent"] <= 100:
+            errors.append("iv.gm_vd_percent must be 0..100")
+    if errors:
+        raise RecipeError(f"{recipe['name']}: " + "; ".join(errors))
+    return recipe
+
+
+def check_limits(recipe, vg_values, vd_values, errors):
+    # Set points beyond the recipe's own limits would trip the run part way
+    # through; refuse them before any instrument is touched
+    limits = recipe["limits"]
+    if limits["vg_max"] is not None and max(vg_values) > limits["vg_max"]:
+        errors.append(f"Vg up to {max(vg_values)} V exceeds limits.vg_max {limits['vg_max']} V")
+    if limits["vd_max"] is not None and max(vd_values) > limits["vd_max"]:
+        errors.append(f"Vd up to {max(vd_values)} V exceeds limits.vd_max {limits['vd_max']} V")
+
+
+def freeze(value):
+    # Read-only copy of a normalized recipe: dicts become mapping proxies,
+    # lists tuples
+    if isinstance(value, (dict, MappingProxyType)):
+        return MappingProxyType({key: freeze(v) for key, v in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(v) for v in value)
+    return value
+
+
+def thaw(value):
+    if isinstance(value, MappingProxyType):
+        return {key: thaw(v) for key, v in value.items()}
+    if isinstance(value, tuple):
+        return [thaw(v) for v in value]
+    return value
+
+
+def restore_plan(fields):
+    return CompiledPlan(**fields)
+
+
+class CompiledPlan:
+    # Immutable result of compiling one recipe; settings (the normalized
+    # recipe) and limits are read-only mappings. kind is "rf" or "iv"; axes
+    # are tuples; grid is the sweep_planner.GridPlan in execution order;
+    # steps summarizes the run as (point, instrument, action) for review,
+    # nothing executes from it; expected_duration is the planner's estimate
+    # in seconds. sweep_plan() / iv_sweep() build fresh engine objects from
+    # it for every run.
+
+    def __init__(self, **fields):
+        fields["settings"] = freeze(fields["settings"])
+        fields["limits"] = freeze(fields["limits"])
+        for key, value in fields.items():
+            object.__setattr__(self, key, value)
+
+    def __reduce__(self):
+        # Mapping proxies do not pickle; the cache stores plain dicts
+        fields = dict(self.__dict__, settings=thaw(self.settings), limits=thaw(self.limits))
+        return restore_plan, (fields,)
+
+    def __setattr__(self, key, value):
+        raise AttributeError("CompiledPlan is immutable")
+
+    def __delattr__(self, key):
+        raise AttributeError("CompiledPlan is immutable")
+
+    def describe(self):
+        return f"{self.name} ({self.kind}): {self.grid.describe()}"
+
+    def output_path(self, override=None, now=None):
+        # Recipe's output with {name}, {date}, {time} filled in
+        path = override or self.settings["output"]
+        if not path:
+            return None
+        now = time.localtime(now)
+        return path.format(name=self.name, date=time.strftime("%Y%m%d", now), time=time.strftime("%H%M%S", now))
+
+    def sweep_plan(self):
+        rf, bias, limits = self.settings["rf"], self.settings["bias"], self.settings["limits"]
+        settle = rf["settle"]
+        return SweepPlan(
+            list(self.powers), bias["vg"], bias["vd"], str(bias["vg_channel"]), str(bias["vd_channel"]),
+            settle=SettleConfig(mode=settle["mode"], delay=rf["dwell"], current_tol=settle["current_tol"],
+                                power_tol_db=settle["power_tol_db"], max_time=settle["max_time"]),
+            continuous_rf=rf["continuous_rf"], rf_off_between_segments=rf["rf_off_between_segments"],
+            curr_max=limits["current_max"],
+            hardware_list=rf["hardware_list"], dwell=rf["dwell"],
+            meter_averaging=rf["meter_averaging"], meter_aperture=rf["meter_aperture"],
+            buffered_pout=rf["buffered_pout"], rf_freq=rf["freq_hz"],
+            verify_rf=rf["verify_rf"], verify_every=rf["verify_every"],
+            rf_freqs=list(self.freqs) if len(self.freqs) > 1 else None,
+            biases=list(self.biases) if rf["vd_list"] else None,
+            order=rf["order"], grid_plan=self.grid,
+        )
+
+    def iv_sweep(self, instrument, stop_event, pause_event, resume_points=None, emit=None):
+        iv, bias, limits = self.settings["iv"], self.settings["bias"], self.settings["limits"]
+        return IVSweep(
+            instrument, str(bias["vg_channel"]), str(bias["vd_channel"]),
+            list(self.vg_values), list(self.vd_values), iv["vg_dwell"], iv["vd_dwell"], stop_event, pause_event,
+            vg_max=limits["vg_max"], vd_max=limits["vd_max"], curr_max=limits["current_max"],
+            gm_vd_percent=iv["gm_vd_percent"] / 100.0, pinch_current_limit=iv["pinch_current_ma"] / 1000.0,
+            resume_points=resume_points, order=iv["order"], emit=emit, grid=self.grid,
+        )
+
+
+def rf_steps(recipe, grid):
+    # What the plan sets and measures, in execution order. A summary for
+    # review and --dry-run only: SweepEngine and the drivers send the SCPI
+    rf = recipe["rf"]
+    steps = [(0, "ngp800", "bias outputs on"), (0, "exg", "RF on")]
+    last = {}
+    segments = grid.segments("power")
+    for first, fixed, powers in segments:
+        freq, (vg, vd) = fixed["freq"], fixed["bias"]
+        if freq != last.get("freq"):
+            steps.append((first, "exg", f"frequency {freq} Hz"))
+        if (vg, vd) != last.get("bias"):
+            steps.append((first, "ngp800", f"Vg {vg} V, Vd {vd} V"))
+        last = fixed
+        if rf["hardware_list"]:
+            steps.append((first, "exg", f"list sweep {powers[0]} .. {powers[-1]} dBm, "
+                                        f"{len(powers)} points, dwell {rf['dwell']} s"))
+            continue
+        for k, power in enumerate(powers, first):
+            steps.append((k, "exg", f"power {power} dBm"))
+            steps.append((k, "meter", "measure"))
+    steps += [(grid.total, "exg", "RF off"), (grid.total, "ngp800", "bias outputs off")]
+    return tuple(steps)
+
+
+def iv_steps(recipe, grid):
+    steps = []
+    last = {}
+    for k in range(grid.total):
+        point = grid.point(k)
+        if point["vg"] != last.get("vg"):
+            steps.append((k, "ngp800", f"Vg {point['vg']} V"))
+        if point["vd"] != last.get("vd"):
+            steps.append((k, "ngp800", f"Vd {point['vd']} V"))
+        steps.append((k, "ngp800", "measure"))
+        last = point
+    steps.append((grid.total, "ngp800", "bias outputs off"))
+    return tuple(steps)
+
+
+def compile_recipe(recipe, digest=None):
+    # Normalized recipe -> CompiledPlan; RecipeError if the plan is not runnable
+    errors = []
+    kind = recipe["sweep"]
+    fields = {"name": recipe["name"], "kind": kind, "digest": digest, "settings": recipe,
+              "limits": dict(recipe["limits"]), "instruments": INSTRUMENTS_NEEDED[kind]}
+    if kind == "rf":
+        rf, bias = recipe["rf"], recipe["bias"]
+        freqs = [rf["freq_hz"]]
+        if rf["freq_spacing"] == "Log":
+            # to the mHz, so 2e9 is not sent as 2000000000.0000002 Hz
+            freqs = log_axis(rf["freq_hz"], rf["freq_stop_hz"], rf["freq_points"]).round(3).tolist()
+        elif rf["freq_step_hz"] is not None:
+            if rf["freq_step_hz"] == 0:
+                errors.append("rf.freq_step_hz must not be zero")
+            else:
+                freqs = linear_axis(rf["freq_hz"], rf["freq_stop_hz"], rf["freq_step_hz"]).tolist()
+                if not freqs:
+                    errors.append("rf.freq_step_hz points away from freq_stop_hz")
+        biases = [(bias["vg"], v) for v in rf["vd_list"]] if rf["vd_list"] else [(bias["vg"], bias["vd"])]
+        powers = check_axis("rf", rf, "power", errors)
+        check_limits(recipe, [vg for vg, vd in biases], [vd for vg, vd in biases], errors)
+        if errors:
+            raise RecipeError(f"{recipe['name']}: " + "; ".join(errors))
+        fields.update(freqs=tuple(freqs), biases=tuple(biases), powers=tuple(powers))
+        plan = CompiledPlan(grid=None, **fields)
+        grid = plan.sweep_plan().grid()
+        steps = rf_steps(recipe, grid)
+    else:
+        iv = recipe["iv"]
+        vg_values = check_axis("iv", iv, "vg", errors)
+        vd_values = check_axis("iv", iv, "vd", errors)
+        if vg_values and vd_values:
+            check_limits(recipe, vg_values, vd_values, errors)
+        if errors:
+            raise RecipeError(f"{recipe['name']}: " + "; ".join(errors))
+        fields.update(vg_values=tuple(vg_values), vd_values=tuple(vd_values))
+        grid = iv_grid(vg_values, vd_values, iv["vg_dwell"], iv["vd_dwell"], iv["order"])
+        steps = iv_steps(recipe, grid)
+    return CompiledPlan(grid=grid, steps=steps, total_points=grid.total,
+                        expected_duration=grid.estimate(), **fields)
+
+
+_source_hash = None
+
+
+def plan_source_hash():
+    # sha256 over PLAN_SOURCES, worked out once per process
+    global _source_hash
+    if _source_hash is None:
+        h = hashlib.sha256()
+        for path in PLAN_SOURCES:
+            with open(path, "rb") as f:
+                h.update(f.read())
+        _source_hash = h.hexdigest()
+    return _source_hash
+
+
+def recipe_digest(data, name, suffix):
+    # Content hash of a recipe file. The planning code's source hash is part
+    # of it so a changed compiler, planner or axis builder never reuses an
+    # old plan, the file name because it is the recipe's default name
+    h = hashlib.sha256(f"sspl-rf-recipe/{plan_source_hash()}/{name}{suffix}\n".encode())
+    h.update(data)
+    return h.hexdigest()
+
+
+class PlanCache:
+    # Compiled plans pickled under cache_dir by content hash. Unreadable or
+    # stale entries are compiled again; the cache is only ever an accelerator.
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, enabled=True):
+        self.cache_dir = cache_dir
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+
+    def path(self, digest):
+        return os.path.join(self.cache_dir, f"{digest}.plan")
+
+    def get(self, digest):
+        if not self.enabled:
+            return None
+        try:
+            with open(self.path(digest), "rb") as f:
+                plan = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"[WARNING] Ignoring unreadable plan cache entry {digest[:12]}: {e}")
+            return None
+        return plan if isinstance(plan, CompiledPlan) and plan.digest == digest else None
+
+    def put(self, plan):
+        if not self.enabled:
+            return
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp = self.path(plan.digest) + f".{os.getpid()}.tmp"
+            with open(tmp, "wb") as f:
+                pickle.dump(plan, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, self.path(plan.digest))
+        except OSError as e:
+            print(f"[WARNING] Could not cache plan {plan.name}: {e}")
+
+    def load(self, path):
+        # (CompiledPlan, from_cache) for a recipe file
+        suffix = os.path.splitext(path)[1].lower()
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except OSError as e:
+            raise RecipeError(f"Cannot read recipe {path}: {e}")
+        name = os.path.splitext(os.path.basename(path))[0]
+        digest = recipe_digest(data, name, suffix)
+        plan = self.get(digest)
+        if plan is not None:
+            self.hits += 1
+            return plan, True
+        self.misses += 1
+        if suffix not in RECIPE_SUFFIXES:
+            raise RecipeError(f"{path}: unknown recipe type (use {', '.join(RECIPE_SUFFIXES)})")
+        recipe = validate_recipe(parse_recipe(data, suffix, path), default_name=name)
+        plan = compile_recipe(recipe, digest=digest)
+        self.put(plan)
+        return plan, False
+
+
+def load_plan(path, cache_dir=DEFAULT_CACHE_DIR, use_cache=True):
+    return PlanCache(cache_dir, enabled=use_cache).load(path)
+
+
+def format_plan(plan, steps=False):
+    # Multi-line description for --dry-run
+    lines = [plan.describe(), f"  expected duration {plan.grid.format_estimate()}, "
+                              f"{len(plan.steps)} steps, digest {plan.digest[:12] if plan.digest else '-'}"]
+    limits = ", ".join(f"{k}={v}" for k, v in plan.limits.items() if v is not None)
+    lines.append(f"  limits: {limits or 'none'}")
+    if steps:
+        lines += [f"  {k:>6}  {instrument:<8} {action}" for k, instrument, action in plan.steps]
+    return "\n".join(lines)
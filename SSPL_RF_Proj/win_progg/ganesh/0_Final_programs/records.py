@@ -0,0 +1,145 @@
+import time
+
+
+def format_time(timestamp):
+    return time.strftime("%H:%M:%S", time.localtime(timestamp))
+
+
+# Result file columns, in the order of the apps' records tables, so a file
+# written by sweep_cli resumes in the app and the other way round
+RF_COLUMNS = ["timestamp", "vg", "vd", "current", "ig", "vg_actual", "vd_actual", "freq", "power_in",
+              "power_out", "pin_actual", "pout_actual", "pin_mw", "pout_mw", "gain", "compression", "pae",
+              "point"]
+IV_COLUMNS = ["timestamp", "vg", "vd", "current", "ig", "vg_actual", "vd_actual", "point"]
+
+
+def rf_derived(power_in, power_out, vd, current, input_loss_db=0.0, input_gain_db=0.0, output_loss_db=0.0):
+    # Path-corrected Pin/Pout, mW, gain and PAE of one RF point; {} when Pin
+    # or Pout was not measured. Compression needs the segment's small-signal
+    # gain and is left to CompressionReference.
+    try:
+        pin_actual = power_in - input_loss_db + input_gain_db
+        pout_actual = power_out + output_loss_db
+        pout_w = 10 ** (pout_actual / 10) * 0.001
+        pin_w = 10 ** (pin_actual / 10) * 0.001
+    except (TypeError, OverflowError):
+        return {}
+    denominator = vd * current
+    return {
+        "pin_actual": pin_actual, "pout_actual": pout_actual,
+        "pin_mw": pin_w * 1000, "pout_mw": pout_w * 1000,
+        "gain": pout_actual - pin_actual,
+        "pae": (pout_w - pin_w) * 100 / denominator if denominator > 0 else -1,
+    }
+
+
+class CompressionReference:
+    # Gain compression per grid segment (one frequency and bias, power swept),
+    # against the small-signal gain at the segment's lowest input power.
+    # Rows are keyed by their canonical point index: with power the innermost
+    # canonical axis, point // len(powers) is the segment. A segment run from
+    # the top down (serpentine, or a falling power list) reaches its
+    # reference last: its rows are recorded without compression as they come
+    # and add() hands them back, filled in, once the reference arrives; fill()
+    # does the same for the rows in the results file when it is closed.
+
+    def __init__(self, powers):
+        self.n_powers = max(1, len(powers))
+        self.ref_index = min(range(len(powers)), key=lambda i: powers[i]) if len(powers) else 0
+        self.gains = {}
+        self.waiting = {}
+        self.unfilled = 0  # rows recorded before their reference (file needs fill())
+
+    def _key(self, values):
+        point, gain = values.get("point"), values.get("gain")
+        if point is None or point != point or gain is None or gain != gain:
+            return None, None
+        return divmod(int(point), self.n_powers)
+
+    def seed(self, values):
+        # Reference from a row already on disk (resume)
+        segment, index = self._key(values)
+        if segment is None:
+            return
+        if index == self.ref_index:
+            self.gains[segment] = values["gain"]
+        compression = values.get("compression")
+        if compression is None or compression != compression:
+            self.unfilled += 1
+
+    def add(self, values):
+        # Fills in values["compression"] when the segment's reference is
+        # known; returns the earlier rows of the segment it completes
+        segment, index = self._key(values)
+        if segment is None:
+            return []
+        if index == self.ref_index:
+            self.gains[segment] = values["gain"]
+        reference = self.gains.get(segment)
+        if reference is None:
+            self.waiting.setdefault(segment, []).append(values)
+            self.unfilled += 1
+            return []
+        values["compression"] = reference - values["gain"]
+        late = self.waiting.pop(segment, [])
+        for row in late:
+            row["compression"] = reference - row["gain"]
+        return late
+
+    def fill(self, rows):
+        # Compression for every row (dicts, e.g. read back from the results
+        # file) whose segment reference is known; returns how many changed
+        changed = 0
+        for row in rows:
+            segment, _ = self._key(row)
+            compression = row.get("compression")
+            if segment in self.gains and (compression is None or compression != compression):
+                row["compression"] = self.gains[segment] - row["gain"]
+                changed += 1
+        return changed
+
+
+class RFRecord:
+    # One RF sweep point. Raw instrument values only; path losses, PAE, gain and
+    # compression are derived by the app. None means "not measured".
+    # vg / vd are the set points, vg_actual / vd_actual / ig the NGP800 readback.
+    # point is the record's index in the sweep's canonical grid.
+    __slots__ = ("timestamp", "vg", "vd", "current", "freq", "power_in", "power_out", "settle_s",
+                 "ig", "vg_actual", "vd_actual", "point")
+
+    def __init__(self, timestamp, vg, vd, current, freq=None, power_in=None, power_out=None,
+                 settle_s=None, ig=None, vg_actual=None, vd_actual=None, point=None):
+        self.timestamp = timestamp
+        self.vg = vg
+        self.vd = vd
+        self.current = current
+        self.freq = freq
+        self.power_in = power_in
+        self.power_out = power_out
+        self.settle_s = settle_s
+        self.ig = ig
+        self.vg_actual = vg_actual
+        self.vd_actual = vd_actual
+        self.point = point
+
+    def __repr__(self):
+        return (f"RFRecord({format_time(self.timestamp)}, Vg={self.vg}, Vd={self.vd}, I={self.current} A, "
+                f"Freq={self.freq}, PowerIN={self.power_in}, Power={self.power_out})")
+
+
+class IVRecord:
+    # One I-V sweep point; point is its index in the canonical Vg x Vd grid
+    __slots__ = ("timestamp", "vg", "vd", "current", "ig", "vg_actual", "vd_actual", "point")
+
+    def __init__(self, timestamp, vg, vd, current, ig=None, vg_actual=None, vd_actual=None, point=None):
+        self.timestamp = timestamp
+        self.vg = vg
+        self.vd = vd
+        self.current = current
+        self.ig = ig
+        self.vg_actual = vg_actual
+        self.vd_actual = vd_actual
+        self.point = point
+
+    def __repr__(self):
+        return f"IVRecord({format_time(self.timestamp)}, Vg={self.vg}, Vd={self.vd}, I={self.current} A)"
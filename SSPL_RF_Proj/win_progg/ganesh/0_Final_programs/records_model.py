@@ -0,0 +1,80 @@
+import math
+
+from PyQt6.QtCore import Qt, QAbstractTableModel, QModelIndex
+
+from records import format_time
+
+
+def fmt_plain(value):
+    return "N/A" if math.isnan(value) else f"{value}"
+
+
+def fmt_fixed(digits):
+    def fmt(value):
+        return "N/A" if math.isnan(value) else f"{value:.{digits}f}"
+    return fmt
+
+
+def fmt_time(value):
+    return format_time(value)
+
+
+class RecordsTableModel(QAbstractTableModel):
+    # Read-only table view over a ColumnStore. columns is a list of
+    # (header, store column name, formatter); only visible rows get formatted.
+
+    def __init__(self, store, columns, parent=None):
+        super().__init__(parent)
+        self.store = store
+        self.columns = columns
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.store)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.columns)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or role != Qt.ItemDataRole.DisplayRole:
+            return None
+        _, name, fmt = self.columns[index.column()]
+        return fmt(float(self.store.value(index.row(), name)))
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return self.columns[section][0]
+        return None
+
+    def headers(self):
+        return [header for header, _, _ in self.columns]
+
+    def format_row(self, row):
+        return [fmt(float(self.store.value(row, name))) for _, name, fmt in self.columns]
+
+    def append(self, values):
+        row = len(self.store)
+        self.beginInsertRows(QModelIndex(), row, row)
+        self.store.append(values)
+        self.endInsertRows()
+
+    def update(self, key, rows, name):
+        # Rewrites column `name` of the stored rows matching each given row's
+        # `key` value (e.g. compression filled in after the row was shown)
+        names = [n for _, n, _ in self.columns]
+        column = names.index(name) if name in names else None
+        for values in rows:
+            for row in self.store.find(key, values[key]):
+                self.store.set_value(int(row), name, values.get(name))
+                if column is not None:
+                    index = self.index(int(row), column)
+                    self.dataChanged.emit(index, index)
+
+    def sort_by(self, name):
+        self.beginResetModel()
+        self.store.sort_by(name)
+        self.endResetModel()
+
+    def clear(self):
+        self.beginResetModel()
+        self.store.clear()
+        self.endResetModel()
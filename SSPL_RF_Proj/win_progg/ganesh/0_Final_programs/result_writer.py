@@ -0,0 +1,262 @@
+import os
+import math
+import time
+import queue
+import threading
+
+import numpy as np
+
+try:
+    import h5py
+except ImportError:
+    h5py = None
+
+
+RESULT_FORMATS = ["CSV", "HDF5", "CSV + HDF5"]
+
+
+class CsvSink:
+    # Journal CSV: one line per record, epoch timestamps and full precision
+    # floats, empty field for a missing value. Only whole lines count on resume.
+
+    def __init__(self, path, columns):
+        self.path = path
+        self.columns = columns
+        self.file = None
+
+    def existing_rows(self):
+        # Read-only: a partial last line from an interrupted write is ignored
+        # here and cut off by open() once the caller decides to resume
+        if not os.path.exists(self.path):
+            return []
+        with open(self.path, "rb") as f:
+            data = f.read()
+        end = data.rfind(b"\n") + 1
+        lines = data[:end].decode().splitlines()
+        if not lines or lines[0].split(",") != self.columns:
+            return []
+        rows = []
+        for line in lines[1:]:
+            fields = line.split(",")
+            rows.append({name: float(v) if v else math.nan for name, v in zip(self.columns, fields)})
+        return rows
+
+    def open(self, rows):
+        # Keep the header and the first rows records (dropping anything after
+        # them, partial line included), append after them
+        if rows:
+            with open(self.path, "r+b") as f:
+                lines = f.read().split(b"\n")[:rows + 1]
+                f.seek(0)
+                f.write(b"\n".join(lines) + b"\n")
+                f.truncate()
+            self.file = open(self.path, "a", newline="")
+        else:
+            self.file = open(self.path, "w", newline="")
+            self.file.write(",".join(self.columns) + "\n")
+
+    def write(self, records):
+        lines = []
+        for values in records:
+            fields = []
+            for name in self.columns:
+                value = values.get(name)
+                fields.append("" if value is None or value != value else repr(float(value)))
+            lines.append(",".join(fields) + "\n")
+        self.file.write("".join(lines))
+
+    def rewrite(self, sort_by=None, fill=None):
+        # Rewrite the closed file, rows passed through fill and/or ordered by
+        # one column
+        rows = self.existing_rows()
+        changed = fill(rows) if fill else 0
+        if not (changed or sort_by):
+            return
+        if sort_by:
+            rows.sort(key=lambda r: (math.isnan(r[sort_by]), r[sort_by]))
+        self.open(0)
+        self.write(rows)
+        self.flush(True)
+        self.close()
+
+    def flush(self, sync):
+        self.file.flush()
+        if sync:
+            os.fsync(self.file.fileno())
+
+    def close(self):
+        if self.file:
+            self.file.close()
+            self.file = None
+
+
+class Hdf5Sink:
+    # One chunked, resizable float64 dataset per column
+
+    def __init__(self, path, columns, chunk=256):
+        self.path = path
+        self.columns = columns
+        self.chunk = chunk
+        self.file = None
+        self.size = 0
+
+    def existing_rows(self):
+        if not os.path.exists(self.path):
+            return []
+        try:
+            with h5py.File(self.path, "r") as f:
+                if not all(name in f for name in self.columns):
+                    return []
+                n = min(len(f[name]) for name in self.columns)
+                arrays = {name: f[name][:n] for name in self.columns}
+        except OSError:
+            return []  # Unreadable (crashed before the first flush)
+        return [{name: float(arrays[name][i]) for name in self.columns} for i in range(n)]
+
+    def open(self, rows):
+        self.file = h5py.File(self.path, "a" if rows else "w")
+        for name in self.columns:
+            if name not in self.file:
+                self.file.create_dataset(name, shape=(0,), maxshape=(None,),
+                                         dtype="f8", chunks=(self.chunk,))
+            # Columns past the last complete record are cut back
+            self.file[name].resize((rows,))
+        self.size = rows
+
+    def write(self, records):
+        n = len(records)
+        for name in self.columns:
+            column = np.array([np.nan if r.get(name) is None else r.get(name) for r in records], dtype=float)
+            dataset = self.file[name]
+            dataset.resize((self.size + n,))
+            dataset[self.size:] = column
+        self.size += n
+
+    def rewrite(self, sort_by=None, fill=None):
+        if fill:
+            rows = self.existing_rows()
+            if fill(rows):
+                with h5py.File(self.path, "a") as f:
+                    for name in self.columns:
+                        f[name][:len(rows)] = [r[name] for r in rows]
+        if sort_by:
+            with h5py.File(self.path, "a") as f:
+                order = np.argsort(f[sort_by][:], kind="stable")
+                for name in self.columns:
+                    f[name][:] = f[name][:][order]
+
+    def flush(self, sync):
+        # h5py has no fsync; flushing hands the data to the OS
+        self.file.flush()
+
+    def close(self):
+        if self.file:
+            self.file.close()
+            self.file = None
+
+
+class ResultWriter(threading.Thread):
+    # Streams records (dicts keyed by column name) to disk while a sweep runs.
+    # write() only queues the record; this thread writes in batches, flushes
+    # every flush_interval seconds (or flush_every records) and fsyncs every
+    # fsync_interval seconds, so at most one interval is lost on a crash.
+
+    def __init__(self, base_path, columns, fmt="CSV", flush_every=50,
+                 flush_interval=0.5, fsync_interval=2.0, log=None):
+        super().__init__(name="ResultWriter", daemon=True)
+        self.columns = list(columns)
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self.fsync_interval = fsync_interval
+        self.log = log or (lambda message: None)
+        self._queue = queue.Queue()
+        self.written = 0
+
+        stem = os.path.splitext(base_path)[0]
+        self.sinks = []
+        if fmt in ("CSV", "CSV + HDF5"):
+            self.sinks.append(CsvSink(stem + ".csv", self.columns))
+        if fmt in ("HDF5", "CSV + HDF5"):
+            if h5py is None:
+                self.log("[WARNING] h5py is not installed, writing CSV only")
+                if fmt == "HDF5":
+                    self.sinks.append(CsvSink(stem + ".csv", self.columns))
+            else:
+                self.sinks.append(Hdf5Sink(stem + ".h5", self.columns))
+
+    def paths(self):
+        return [sink.path for sink in self.sinks]
+
+    def existing_rows(self):
+        # Records already on disk from an earlier (possibly crashed) run; the
+        # shortest sink wins so every format resumes from the same record
+        rows = None
+        for sink in self.sinks:
+            found = sink.existing_rows()
+            if rows is None or len(found) < len(rows):
+                rows = found
+        return rows or []
+
+    def open(self, resume=False):
+        # resume=True appends after the last complete record, otherwise the
+        # files are started fresh. Call before start().
+        rows = len(self.existing_rows()) if resume else 0
+        for sink in self.sinks:
+            sink.open(rows)
+        self.written = rows
+        return rows
+
+    def write(self, values):
+        self._queue.put(values)
+
+    def close(self, timeout=10, sort_by=None, fill=None):
+        # sort_by: column to reorder the finished files by (e.g. a sweep that
+        # ran out of order written back in canonical grid order); fill: called
+        # with the file's rows (dicts) to complete values known only at the
+        # end, returns how many rows it changed
+        self._queue.put(None)
+        self.join(timeout)
+        if (sort_by or fill) and not self.is_alive():
+            for sink in self.sinks:
+                try:
+                    sink.rewrite(sort_by, fill)
+                except Exception as e:
+                    self.log(f"[ERROR] Rewriting {sink.path} failed: {e}")
+
+    def run(self):
+        batch = []
+        last_flush = last_sync = time.monotonic()
+        done = False
+        while not done:
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+                if item is None:
+                    done = True
+                else:
+                    batch.append(item)
+            except queue.Empty:
+                pass
+
+            now = time.monotonic()
+            if batch and (done or len(batch) >= self.flush_every or now - last_flush >= self.flush_interval):
+                sync = done or now - last_sync >= self.fsync_interval
+                self._flush(batch, sync)
+                self.written += len(batch)
+                batch = []
+                last_flush = now
+                if sync:
+                    last_sync = now
+            elif done:
+                self._flush([], True)
+
+        for sink in self.sinks:
+            sink.close()
+
+    def _flush(self, batch, sync):
+        for sink in self.sinks:
+            try:
+                if batch:
+                    sink.write(batch)
+                sink.flush(sync)
+            except Exception as e:
+                self.log(f"[ERROR] Writing results to {sink.path} failed: {e}")
@@ -0,0 +1,55 @@
+import numpy as np
+
+
+class ColumnStore:
+    # Growable columnar results: one preallocated NumPy array per column,
+    # capacity doubles when full. Missing float values are stored as NaN.
+
+    def __init__(self, columns, capacity=256):
+        # columns: list of (name, dtype)
+        self.columns = [name for name, _ in columns]
+        self._dtypes = dict(columns)
+        self._capacity = max(1, int(capacity))
+        self._data = {name: np.empty(self._capacity, dtype=dtype) for name, dtype in columns}
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def _grow(self):
+        self._capacity *= 2
+        for name, arr in self._data.items():
+            grown = np.empty(self._capacity, dtype=arr.dtype)
+            grown[:self.size] = arr[:self.size]
+            self._data[name] = grown
+
+    def append(self, values):
+        if self.size == self._capacity:
+            self._grow()
+        for name in self.columns:
+            value = values.get(name)
+            self._data[name][self.size] = np.nan if value is None else value
+        self.size += 1
+
+    def column(self, name):
+        # View of the filled part; valid until the next append that grows the store
+        return self._data[name][:self.size]
+
+    def value(self, row, name):
+        return self._data[name][row]
+
+    def set_value(self, row, name, value):
+        self._data[name][row] = np.nan if value is None else value
+
+    def find(self, name, value):
+        # Rows whose column `name` equals value
+        return np.flatnonzero(self.column(name) == value)
+
+    def sort_by(self, name):
+        # Stable reorder of every column by one column (NaN last)
+        order = np.argsort(self.column(name), kind="stable")
+        for column in self.columns:
+            self._data[column][:self.size] = self._data[column][:self.size][order]
+
+    def clear(self):
+        self.size = 0
@@ -0,0 +1,147 @@
+import time
+
+
+SETTLE_MODES = ["Fixed", "Adaptive", "OPC"]
+# Polls an adaptive settle typically needs (first reading, then agreement
+# within tolerance on the next one or two)
+TYPICAL_POLLS = 3
+# Seconds an *OPC? settle typically takes: one bus round trip once the EXG
+# has levelled
+OPC_TYPICAL_TIME = 0.01
+
+
+class FixedSettle:
+    # Plain dwell, same behaviour as the old hard-coded sleeps
+    mode = "Fixed"
+
+    def __init__(self, delay):
+        self.delay = max(0.0, float(delay))
+
+    def settle(self):
+        time.sleep(self.delay)
+        return self.delay
+
+
+class OpcSettle:
+    # Blocks on *OPC? so we move on as soon as the instrument reports the
+    # pending level change complete, plus an optional extra dwell for the DUT
+    mode = "OPC"
+
+    def __init__(self, instr, extra_delay=0.0, timeout_ms=5000):
+        self.instr = instr
+        self.extra_delay = max(0.0, float(extra_delay))
+        self.timeout_ms = timeout_ms
+
+    def settle(self):
+        t0 = time.perf_counter()
+        old_timeout = getattr(self.instr, "timeout", None)
+        try:
+            if old_timeout is not None:
+                self.instr.timeout = max(old_timeout, self.timeout_ms)
+            self.instr.query("*OPC?")
+        finally:
+            if old_timeout is not None:
+                self.instr.timeout = old_timeout
+        if self.extra_delay:
+            time.sleep(self.extra_delay)
+        return time.perf_counter() - t0
+
+
+class AdaptiveSettle:
+    # Polls every probe until two consecutive readings agree within that
+    # probe's tolerance. probes is a list of (name, read_fn, tol, relative);
+    # relative tolerances are fractions of the reading, absolute ones are in
+    # the reading's own unit (e.g. dB for Pout).
+    mode = "Adaptive"
+
+    def __init__(self, probes, interval=0.05, min_time=0.0, max_time=3.0):
+        self.probes = probes
+        self.interval = interval
+        self.min_time = min_time
+        self.max_time = max_time
+        self.timed_out = False
+
+    def _read_all(self):
+        return [read_fn() for (_, read_fn, _, _) in self.probes]
+
+    def _is_stable(self, prev, curr):
+        for (_, _, tol, relative), a, b in zip(self.probes, prev, curr):
+            if a is None or b is None:
+                return False
+            limit = tol * max(abs(a), abs(b)) if relative else tol
+            if abs(b - a) > limit:
+                return False
+        return True
+
+    def settle(self):
+        t0 = time.perf_counter()
+        self.timed_out = False
+        if self.min_time:
+            time.sleep(self.min_time)
+
+        prev = self._read_all()
+        while True:
+            time.sleep(self.interval)
+            curr = self._read_all()
+            elapsed = time.perf_counter() - t0
+            if self._is_stable(prev, curr):
+                return elapsed
+            if elapsed >= self.max_time:
+                self.timed_out = True
+                return elapsed
+            prev = curr
+
+
+class SettleConfig:
+    def __init__(self, mode="Fixed", delay=1.5, current_tol=0.01, power_tol_db=0.05,
+                 max_time=3.0, interval=0.05, opc_timeout_ms=5000):
+        if mode not in SETTLE_MODES:
+            raise ValueError(f"Unknown settling mode: {mode}")
+        self.mode = mode
+        self.delay = delay
+        self.current_tol = current_tol
+        self.power_tol_db = power_tol_db
+        self.max_time = max_time
+        self.interval = interval
+        self.opc_timeout_ms = opc_timeout_ms
+
+    def typical_time(self):
+        # Seconds a point usually settles in, for run time estimates: an
+        # adaptive settle that agrees after a few polls, capped at max_time,
+        # or one *OPC? round trip
+        if self.mode == "Fixed":
+            return self.delay
+        if self.mode == "Adaptive":
+            return min(self.max_time, TYPICAL_POLLS * self.interval)
+        return OPC_TYPICAL_TIME
+
+    def worst_time(self):
+        # Longest a point can take to settle: the adaptive time limit or the
+        # *OPC? timeout
+        if self.mode == "Fixed":
+            return self.delay
+        if self.mode == "Adaptive":
+            return self.max_time
+        return self.opc_timeout_ms / 1000
+
+    def describe(self):
+        if self.mode == "Fixed":
+            return f"Fixed {self.delay} s"
+        if self.mode == "OPC":
+            return "*OPC?"
+        return (f"Adaptive (Id ±{self.current_tol * 100:g}%, Pout ±{self.power_tol_db} dB, "
+                f"max {self.max_time} s)")
+
+
+def create_settler(config, opc_instr=None, read_current=None, read_power=None):
+    if config.mode == "OPC":
+        return OpcSettle(opc_instr, timeout_ms=config.opc_timeout_ms)
+    if config.mode == "Adaptive":
+        probes = []
+        if read_current is not None:
+            probes.append(("Id", read_current, config.current_tol, True))
+        if read_power is not None:
+            probes.append(("Pout", read_power, config.power_tol_db, False))
+        if probes:
+            return AdaptiveSettle(probes, interval=config.interval, max_time=config.max_time)
+    return FixedSettle(config.delay)
@@ -0,0 +1,450 @@
+import os
+import math
+import time
+import random
+import threading
+
+import numpy as np
+
+
+# Set SSPL_RF_SIM=1 to make the shared VisaPool (and so every app) talk to
+# the simulated bench below instead of pyvisa. SSPL_RF_SIM_LATENCY is the
+# time per bus transfer in seconds, SSPL_RF_SIM_CHANNELS the NGP800
+# "gate,drain" channels the DUT is wired to.
+SIM_ENV = "SSPL_RF_SIM"
+LATENCY_ENV = "SSPL_RF_SIM_LATENCY"
+CHANNELS_ENV = "SSPL_RF_SIM_CHANNELS"
+
+NGP800_RESOURCE = "USB0::0x0AAD::0x0197::SIM800::INSTR"
+EXG_RESOURCE = "USB0::0x0957::0x1F01::SIM5173::INSTR"
+NRX_RESOURCE = "USB0::0x0AAD::0x0178::SIMNRX::INSTR"
+
+UNITS = {"HZ": 1.0, "KHZ": 1e3, "MHZ": 1e6, "GHZ": 1e9,
+         "S": 1.0, "MS": 1e-3, "US": 1e-6, "NS": 1e-9,
+         "DBM": 1.0, "V": 1.0, "MV": 1e-3, "A": 1.0, "MA": 1e-3}
+
+
+def simulation_enabled():
+    return os.environ.get(SIM_ENV, "").strip().lower() not in ("", "0", "false", "no")
+
+
+def parse_number(text):
+    # "1000000000.0 Hz", "1GHz", "-10 dBm", "ON" -> float (ON/OFF as 1/0)
+    text = text.strip()
+    upper = text.upper()
+    if upper in ("ON", "OFF"):
+        return 1.0 if upper == "ON" else 0.0
+    for unit in sorted(UNITS, key=len, reverse=True):
+        if upper.endswith(unit):
+            return float(text[:len(text) - len(unit)]) * UNITS[unit]
+    return float(text)
+
+
+def split_message(message):
+    # "INST:NSEL 2;:VOLT 1.5;:OUTP ON" -> [("INST:NSEL", "2"), ("VOLT", "1.5"), ("OUTP", "ON")]
+    commands = []
+    for part in message.strip().split(";"):
+        part = part.strip().lstrip(":")
+        if not part:
+            continue
+        header, _, args = part.partition(" ")
+        commands.append((header.upper(), args.strip()))
+    return commands
+
+
+class DutModel:
+    # Simple depletion-mode FET with a compressing RF gain stage:
+    #   Id = Idss * (1 - Vg/Vp)^2 * tanh(alpha * Vd) * (1 + lambda * Vd)
+    # plus the RF drive's share of drain current at efficiency eta, and
+    #   Pout = Rapp-compressed (Pin + gain(f)), gain falling off around f0.
+
+    def __init__(self, idss=0.5, vp=-3.0, alpha=1.5, lam=0.02, gain_db=15.0, psat_dbm=33.0,
+                 smoothness=2.0, f0=2e9, rolloff_db_per_ghz2=0.5, efficiency=0.5,
+                 ig_leak=1e-6, noise_db=0.0, seed=0):
+        self.idss = idss
+        self.vp = vp
+        self.alpha = alpha
+        self.lam = lam
+        self.gain_db = gain_db
+        self.psat_dbm = psat_dbm
+        self.smoothness = smoothness
+        self.f0 = f0
+        self.rolloff = rolloff_db_per_ghz2
+        self.efficiency = efficiency
+        self.ig_leak = ig_leak
+        self.noise_db = noise_db
+        self.rng = random.Random(seed)
+
+    def dc_current(self, vg, vd):
+        if vd <= 0 or vg <= self.vp:
+            return 0.0
+        channel = self.idss * (1 - vg / self.vp) ** 2
+        return channel * math.tanh(self.alpha * vd) * (1 + self.lam * vd)
+
+    def gain(self, freq):
+        return self.gain_db - self.rolloff * ((freq - self.f0) / 1e9) ** 2
+
+    def pout_dbm(self, pin_dbm, freq, biased=True):
+        if not biased:
+            return pin_dbm - 30.0  # unbiased device: isolation only
+        p_lin = 10 ** ((pin_dbm + self.gain(freq)) / 10)
+        p_sat = 10 ** (self.psat_dbm / 10)
+        p = self.smoothness
+        p_out = p_lin / (1 + (p_lin / p_sat) ** (2 * p)) ** (1 / (2 * p))
+        noise = self.rng.gauss(0.0, self.noise_db) if self.noise_db else 0.0
+        return 10 * math.log10(p_out) + noise
+
+    def rf_current(self, pout_dbm, vd):
+        if vd <= 0:
+            return 0.0
+        return 10 ** (pout_dbm / 10) * 1e-3 / (self.efficiency * vd)
+
+
+class SimBench:
+    # Shared state of the simulated bench: the three instruments see the same
+    # DUT, so NGP800 bias and EXG drive show up in Id and in the meter's Pout.
+
+    def __init__(self, dut=None, gate_channel="1", drain_channel="2"):
+        self.lock = threading.RLock()
+        self.dut = dut or DutModel()
+        self.gate_channel = gate_channel
+        self.drain_channel = drain_channel
+        self.ngp800 = None
+        self.exg = None
+
+    def bias(self):
+        # (Vg, Vd) actually applied to the DUT
+        ngp = self.ngp800
+        if ngp is None:
+            return 0.0, 0.0
+        return ngp.output_voltage(self.gate_channel), ngp.output_voltage(self.drain_channel)
+
+    def rf_in(self):
+        # (Pin dBm or None when RF is off, frequency Hz) at the DUT input now
+        exg = self.exg
+        if exg is None or not exg.output:
+            return None, 0.0
+        return exg.current_power(), exg.freq
+
+    def pout(self, pin=None, freq=None):
+        vg, vd = self.bias()
+        if pin is None:
+            pin, freq = self.rf_in()
+            if pin is None:
+                return -90.0  # meter noise floor
+        dbm = self.dut.pout_dbm(pin, freq, biased=vd > 0 and vg > self.dut.vp)
+        if self.exg is not None and self.exg.pulse_on and self.exg.pulse_period > 0:
+            # Average power of a pulsed carrier
+            duty = min(1.0, self.exg.pulse_width / self.exg.pulse_period)
+            dbm += 10 * math.log10(max(duty, 1e-9))
+        return dbm
+
+    def drain_current(self):
+        vg, vd = self.bias()
+        current = self.dut.dc_current(vg, vd)
+        pin, freq = self.rf_in()
+        if pin is not None and current > 0:
+            current += self.dut.rf_current(self.dut.pout_dbm(pin, freq), vd)
+        return current
+
+    def gate_current(self):
+        vg, _ = self.bias()
+        return self.dut.ig_leak * abs(vg)
+
+
+class SimSession:
+    # pyvisa-like session: write / read / query / query_binary_values with a
+    # fixed latency per bus transfer. Replies of a compound query are joined
+    # with ";" like the real instruments do.
+
+    idn = "SIM"
+
+    def __init__(self, resource_name, bench, latency=0.0):
+        self.resource_name = resource_name
+        self.bench = bench
+        self.latency = latency
+        self.timeout = 2000
+        self.write_termination = "\n"
+        self.read_termination = "\n"
+        self._reply = None
+        self.log = []
+
+    def _transfer(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+    def write(self, message):
+        self._transfer()
+        self.log.append(message)
+        replies = []
+        with self.bench.lock:
+            for header, args in split_message(message):
+                if header == "*IDN?":
+                    reply = self.idn
+                else:
+                    reply = self.handle(header, args)
+                if header.endswith("?"):
+                    replies.append(reply if reply is not None else "0")
+        if replies:
+            self._reply = ";".join(str(r) for r in replies)
+        return len(message)
+
+    def read(self):
+        self._transfer()
+        if self._reply is None:
+            raise TimeoutError(f"{self.resource_name}: read with no query pending")
+        reply, self._reply = self._reply, None
+        return reply + self.read_termination
+
+    def query(self, message):
+        self.write(message)
+        return self.read()
+
+    def query_binary_values(self, message, datatype="f", is_big_endian=False, container=list):
+        values = self.binary_values(message)
+        if values is None:
+            raise ValueError(f"{self.resource_name}: {message} has no binary form")
+        return container(values)
+
+    def binary_values(self, message):
+        return None
+
+    def handle(self, header, args):
+        # Returns the reply for a query; setting commands return None
+        return None
+
+    def close(self):
+        pass
+
+
+class SimNGP800(SimSession):
+    idn = "Rohde&Schwarz,NGP800,SIM0800,1.0"
+
+    def __init__(self, resource_name, bench, latency=0.0):
+        super().__init__(resource_name, bench, latency)
+        self.selected = "1"
+        self.voltage = {ch: 0.0 for ch in "1234"}
+        self.current_limit = {ch: 1.0 for ch in "1234"}
+        self.output = {ch: False for ch in "1234"}
+        bench.ngp800 = self
+
+    def output_voltage(self, ch):
+        return self.voltage[ch] if self.output[ch] else 0.0
+
+    def channel_current(self, ch):
+        if not self.output[ch]:
+            return 0.0
+        if ch == self.bench.drain_channel:
+            current = self.bench.drain_current()
+        elif ch == self.bench.gate_channel:
+            current = self.bench.gate_current()
+        else:
+            current = 0.0
+        return min(current, self.current_limit[ch])
+
+    def handle(self, header, args):
+        ch = self.selected
+        if header in ("INST:NSEL", "INST", "INSTRUMENT:NSELECT"):
+            self.selected = str(int(parse_number(args)))
+        elif header in ("VOLT", "SOUR:VOLT"):
+            self.voltage[ch] = parse_number(args)
+        elif header in ("CURR", "SOUR:CURR"):
+            self.current_limit[ch] = parse_number(args)
+        elif header in ("OUTP", "OUTP:STAT"):
+            self.output[ch] = parse_number(args) != 0
+        elif header == "MEAS:CURR?":
+            return repr(self.channel_current(ch))
+        elif header == "MEAS:VOLT?":
+            return repr(self.output_voltage(ch))
+        elif header == "VOLT?":
+            return repr(self.voltage[ch])
+        elif header == "CURR?":
+            return repr(self.current_limit[ch])
+        elif header == "OUTP?":
+            return "1" if self.output[ch] else "0"
+        elif header == "*OPC?":
+            return "1"
+        return None
+
+
+class SimN5173B(SimSession):
+    idn = "Agilent Technologies,N5173B,SIM5173,1.0"
+
+    def __init__(self, resource_name, bench, latency=0.0):
+        super().__init__(resource_name, bench, latency)
+        self.freq = 1e9
+        self.power = -20.0
+        self.output = False
+        self.power_mode = "FIX"
+        self.list_powers = []
+        self.dwell = 0.05
+        self.list_start = None
+        self.list_stop = None
+        self.pulse_on = False
+        self.pulse_period = 0.0
+        self.pulse_width = 0.0
+        bench.exg = self
+
+    def list_done_at(self):
+        return self.list_start + len(self.list_powers) * self.dwell
+
+    def list_points_done(self):
+        # List points that have settled (and so sent a TRIG 2 pulse) so far;
+        # ABOR freezes the count at the time of the abort
+        if self.list_start is None:
+            return 0
+        end = self.list_stop if self.list_stop is not None else time.perf_counter()
+        return min(int((end - self.list_start) / self.dwell), len(self.list_powers))
+
+    def current_power(self):
+        # Level at the output now; in a running list sweep the list point
+        if self.power_mode == "LIST" and self.list_start is not None and self.list_stop is None and self.list_powers:
+            i = int((time.perf_counter() - self.list_start) / self.dwell)
+            return self.list_powers[min(max(i, 0), len(self.list_powers) - 1)]
+        return self.power
+
+    def handle(self, header, args):
+        if header in ("FREQ", "FREQ:CW", "SOUR:FREQ"):
+            self.freq = parse_number(args)
+        elif header == "FREQ?":
+            return repr(self.freq)
+        elif header in ("POW", "POW:LEV", "SOUR:POW"):
+            self.power = parse_number(args)
+        elif header == "POW?":
+            return repr(self.power)
+        elif header in ("OUTP", "OUTP:STAT"):
+            self.output = parse_number(args) != 0
+        elif header == "OUTP?":
+            return "1" if self.output else "0"
+        elif header == "POW:MODE":
+            self.power_mode = args.upper()
+        elif header == "LIST:POW":
+            self.list_powers = [float(v) for v in args.split(",") if v.strip()]
+        elif header == "SWE:DWEL":
+            self.dwell = parse_number(args)
+        elif header == "INIT":
+            if self.power_mode == "LIST":
+                self.list_start = time.perf_counter()
+                self.list_stop = None
+        elif header == "ABOR":
+            if self.list_start is not None and self.list_stop is None:
+                self.list_stop = time.perf_counter()
+        elif header == "PULM:STAT":
+            self.pulse_on = parse_number(args) != 0
+        elif header == "PULM:INT:PER":
+            self.pulse_period = parse_number(args)
+        elif header == "PULM:INT:WIDT":
+            self.pulse_width = parse_number(args)
+        elif header == "*OPC?":
+            if self.power_mode == "LIST" and self.list_start is not None and self.list_stop is None:
+                # Blocks until the list sweep has stepped through every point
+                remaining = self.list_done_at() - time.perf_counter()
+                if remaining > 0:
+                    self.bench.lock.release()
+                    try:
+                        time.sleep(remaining)
+                    finally:
+                        self.bench.lock.acquire()
+            return "1"
+        return None
+
+
+class SimPowerMeter(SimSession):
+    # NRX by default; device="NRP2" answers like an NRP2
+    def __init__(self, resource_name, bench, latency=0.0, device="NRX"):
+        super().__init__(resource_name, bench, latency)
+        self.idn = f"ROHDE&SCHWARZ,{device},SIM{device},1.0"
+        self.freq = 1e9
+        self.trigger_source = "IMM"
+        self.buffer_size = 0
+        self.buffer_on = False
+        self.armed = False
+        self.armed_at = None
+        self.buffer = []
+        self.binary = False
+
+    def reading(self):
+        return self.bench.pout()
+
+    def fetch(self):
+        if not (self.buffer_on and self.armed):
+            return [self.reading()]
+        if self.trigger_source == "EXT":
+            # Triggered by the EXG list sweep: one reading per list point
+            exg = self.bench.exg
+            if exg is None or self.armed_at is None or exg.list_start is None or exg.list_start < self.armed_at:
+                return []
+            powers = exg.list_powers[:min(exg.list_points_done(), self.buffer_size)]
+            return [self.bench.pout(p, exg.freq) for p in powers]
+        return list(self.buffer)
+
+    def binary_values(self, message):
+        if message.strip().upper().lstrip(":") in ("FETC?", "FETCH?") and self.binary:
+            with self.bench.lock:
+                return np.asarray(self.fetch(), dtype=np.float32)
+        return None
+
+    def handle(self, header, args):
+        if header in ("READ?", "MEAS:POW?", "MEAS?"):
+            return repr(self.reading())
+        if header in ("FETC?", "FETCH?"):
+            return ",".join(repr(v) for v in self.fetch())
+        if header == "SENS:FREQ":
+            self.freq = parse_number(args)
+        elif header == "TRIG:SOUR":
+            self.trigger_source = args.upper()
+        elif header in ("TRIG:COUN", "SENS:BUFF:SIZE"):
+            self.buffer_size = int(parse_number(args))
+        elif header == "SENS:BUFF:STAT":
+            self.buffer_on = parse_number(args) != 0
+            if not self.buffer_on:
+                self.armed = False
+        elif header == "INIT":
+            self.armed = True
+            self.armed_at = time.perf_counter()
+            self.buffer = []
+        elif header == "*TRG":
+            if self.armed and len(self.buffer) < self.buffer_size:
+                self.buffer.append(self.reading())
+        elif header == "ABOR":
+            self.armed = False
+        elif header == "FORM":
+            self.binary = args.upper().startswith("REAL")
+        elif header == "*OPC?":
+            return "1"
+        return None
+
+
+class SimResourceManager:
+    # Stands in for pyvisa.ResourceManager: one NGP800, one N5173B and one
+    # power meter on a shared SimBench
+    def __init__(self, latency=0.0, dut=None, gate_channel="1", drain_channel="2", meter="NRX"):
+        self.bench = SimBench(dut, gate_channel, drain_channel)
+        self.latency = latency
+        self.factories = {
+            NGP800_RESOURCE: lambda name: SimNGP800(name, self.bench, self.latency),
+            EXG_RESOURCE: lambda name: SimN5173B(name, self.bench, self.latency),
+            NRX_RESOURCE: lambda name: SimPowerMeter(name, self.bench, self.latency, meter),
+        }
+        self.sessions = {}
+
+    def list_resources(self):
+        return tuple(self.factories)
+
+    def open_resource(self, resource_name, **kwargs):
+        if resource_name not in self.factories:
+            raise ValueError(f"No simulated instrument at {resource_name}")
+        session = self.sessions.get(resource_name)
+        if session is None:
+            session = self.factories[resource_name](resource_name)
+            self.sessions[resource_name] = session
+        return session
+
+    def close(self):
+        self.sessions = {}
+
+
+def resource_manager_from_env():
+    latency = float(os.environ.get(LATENCY_ENV, "0.002") or 0)
+    gate, _, drain = os.environ.get(CHANNELS_ENV, "1,2").partition(",")
+    return SimResourceManager(latency=latency, gate_channel=gate.strip(), drain_channel=drain.strip() or "2")
@@ -0,0 +1,67 @@
+from decimal import Decimal
+
+import numpy as np
+
+
+def decimals(*values):
+    # Decimal places needed to write every value exactly as typed (0.1 -> 1)
+    places = 0
+    for value in values:
+        exponent = Decimal(repr(float(value))).normalize().as_tuple().exponent
+        if isinstance(exponent, int):
+            places = max(places, -exponent)
+    return places
+
+
+def step_count(start, stop, step):
+    # Number of whole steps from start towards stop; the end point counts
+    # whenever it lies on the grid, whatever float error (stop - start) / step has
+    if step == 0:
+        raise ValueError("Step must not be zero")
+    steps = (stop - start) / step
+    if steps < 0:
+        return -1  # step points away from stop: no points at all
+    nearest = round(steps)
+    return int(nearest) if abs(steps - nearest) < 1e-9 * max(1.0, abs(steps)) else int(np.floor(steps))
+
+
+def linear_axis(start, stop, step):
+    # start, start + step, ... up to and including stop, computed as
+    # start + i * step from an integer count and rounded to the input's decimals
+    n = step_count(start, stop, step) + 1
+    values = start + step * np.arange(max(n, 0), dtype=float)
+    return np.round(values, decimals(start, stop, step))
+
+
+def log_axis(start, stop, points):
+    # points values spaced evenly on a log scale, start and stop included
+    if start <= 0 or stop <= 0:
+        raise ValueError("Log axis needs positive start and stop")
+    if int(points) < 1:
+        raise ValueError("Log axis needs at least one point")
+    return np.geomspace(start, stop, int(points))
+
+
+def list_axis(values):
+    # Values as given ("5, 10, 15" or any iterable of numbers), order kept
+    if isinstance(values, str):
+        values = [v for v in values.replace(";", ",").split(",") if v.strip()]
+    return np.array([float(v) for v in values], dtype=float)
+
+
+def adaptive_axis(start, stop, step, fine_step, fine_start, fine_stop):
+    # Coarse linear axis with a fine one over [fine_start, fine_stop] (e.g.
+    # around pinch-off or the compression knee), merged in sweep direction
+    coarse = linear_axis(start, stop, step)
+    lo, hi = sorted((fine_start, fine_stop))
+    fine = linear_axis(lo, hi, abs(fine_step))
+    fine = fine[(fine >= min(start, stop)) & (fine <= max(start, stop))]
+    merged = np.unique(np.round(np.concatenate([coarse, fine]),
+                                decimals(start, stop, step, fine_step, fine_start, fine_stop)))
+    return merged[::-1] if step < 0 else merged
+
+
+def axis_index(values):
+    # {value: index} for exact lookups of values taken from the axis itself
+    return {float(v): i for i, v in enumerate(values)}
+
@@ -0,0 +1,298 @@
+import os
+import sys
+import time
+import signal
+import argparse
+import threading
+
+from sim_instruments import SIM_ENV
+from instrument_discovery import InstrumentDiscovery
+from visa_pool import get_pool
+from ngp800_driver import ngp800_for
+from sweep_engine import SweepEngine
+from sweep_planner import format_eta
+from exg_list import ExgListSweep
+from records import RF_COLUMNS, IV_COLUMNS, rf_derived, CompressionReference
+from result_writer import RESULT_FORMATS, ResultWriter
+from iv_sweep import order_note
+from recipes import RecipeError, PlanCache, DEFAULT_CACHE_DIR, format_plan
+
+
+# Headless sweep runner for unattended (nightly / production lot) runs.
+# Takes one or more recipe files (YAML, TOML or JSON, see recipes.py),
+# compiles them all up front, finds or opens the instruments and runs them
+# back to back on the same engines the apps use, streaming the records to
+# CSV / HDF5. Never imports PyQt6 or pyqtgraph.
+#
+#   python sweep_cli.py lot42_iv.yaml lot42_rf.toml [--resume] [--sim] [--keep-going]
+#
+# Recipes are compiled once and cached by content hash (--cache-dir,
+# --no-cache); a typo in the last recipe of a queue fails before the first
+# one starts.
+#
+# Exit status: 0 every point of every recipe measured, 1 recipe / instrument
+# error, 2 a sweep stopped early (limit trip, Ctrl+C, instrument error).
+
+EXIT_OK, EXIT_ERROR, EXIT_INCOMPLETE = 0, 1, 2
+# Lines --quiet still prints
+QUIET_PREFIXES = ("[WARNING]", "[ERROR]", "[SUMMARY]", "[TRIP]", "[GRID]", "[QUEUE]", "Error", "Plan:", "Done:")
+
+
+class Runner:
+    # Runs one CompiledPlan; stop_event may be shared by a whole queue
+    def __init__(self, plan, output=None, fmt=None, resume=False, quiet=False, stop_event=None):
+        self.plan = plan
+        self.output = plan.output_path(output)
+        self.fmt = fmt or plan.settings["format"]
+        self.resume = resume
+        self.quiet = quiet
+        self.stop_event = stop_event or threading.Event()
+        self.pause_event = threading.Event()
+        self.writer = None
+        self.records = 0
+
+    def log(self, message):
+        if self.quiet and not message.startswith(QUIET_PREFIXES):
+            return
+        print(f"[{time.strftime('%H:%M:%S')}] {message}", flush=True)
+
+    def open_instruments(self):
+        wanted = self.plan.instruments
+        pinned = self.plan.settings["instruments"]
+        found = {}
+        for kind in wanted:
+            if pinned.get(kind):
+                found[kind] = get_pool().identify(pinned[kind])[0]
+        missing = [kind for kind in wanted if kind not in found]
+        if missing:
+            discovered = InstrumentDiscovery(log=self.log).discover(wanted=missing)
+            for kind, (instr, idn) in discovered.items():
+                found[kind] = instr
+        missing = [kind for kind in wanted if kind not in found]
+        if missing:
+            raise RecipeError(f"Instruments not found: {', '.join(missing)}")
+        return found
+
+    def open_writer(self, columns):
+        # Records already on disk when resuming, else []
+        if not self.output:
+            self.log("[WARNING] No output file given, records are not saved")
+            return []
+        os.makedirs(os.path.dirname(os.path.abspath(self.output)), exist_ok=True)
+        self.writer = ResultWriter(self.output, columns, fmt=self.fmt, log=self.log)
+        existing = self.writer.existing_rows() if self.resume else []
+        self.writer.open(resume=self.resume)
+        self.writer.start()
+        self.log(f"Streaming results to {', '.join(self.writer.paths())}"
+                 + (f", resuming after {len(existing)} records" if existing else ""))
+        return existing
+
+    def write(self, values):
+        self.records += 1
+        if self.writer:
+            self.writer.write(values)
+
+    def close_writer(self, sort_by=None, fill=None):
+        if self.writer:
+            self.writer.close(sort_by=sort_by, fill=fill)
+            self.log(f"Results file closed ({self.writer.written} records)")
+            self.writer = None
+
+    def run(self):
+        instruments = self.open_instruments()
+        if self.plan.kind == "rf":
+            return self.run_rf(instruments)
+        return self.run_iv(instruments)
+
+    def run_rf(self, instruments):
+        plan = self.plan.sweep_plan()
+        rf = self.plan.settings["rf"]
+        losses = [rf[k] for k in ("input_loss_db", "input_gain_db", "output_loss_db")]
+        ngp, exg, meter = instruments["ngp800"], instruments["exg"], instruments["power_meter"]
+        grid = plan.grid()
+        existing = self.open_writer(RF_COLUMNS)
+        if len(existing) >= grid.total:
+            self.log("Done: all points of this sweep are already recorded")
+            self.close_writer()
+            return EXIT_OK
+        plan.start_index = len(existing)
+        self.log(f"Plan: {grid.describe()}")
+
+        driver = ngp800_for(ngp)
+        compression = CompressionReference(plan.rf_powers)
+        for values in existing:
+            compression.seed(values)
+        engine = None
+        # Everything from the first bias write on sits inside the try, so a
+        # failing setup still turns the rails and RF off
+        try:
+            # Bias and frequency as the app leaves them before a run
+            with driver.batch():
+                driver.apply(plan.vg_chan, plan.vg)
+                driver.apply(plan.vd_chan, plan.vd)
+            exg.write(f"FREQ {plan.rf_freq} Hz")
+            meter.write(f"SENS:FREQ {plan.rf_freq} Hz")
+
+            engine = SweepEngine(ngp, exg, meter, self.stop_event, self.pause_event, rf_control=ExgListSweep(exg))
+            engine.start()
+            engine.submit(plan)
+            while True:
+                kind, payload = engine.results.get()
+                if kind == "log":
+                    self.log(payload)
+                elif kind == "record":
+                    rec = payload
+                    values = {name: getattr(rec, name) for name in RF_COLUMNS if hasattr(rec, name)}
+                    values.update(rf_derived(rec.power_in, rec.power_out, rec.vd or 0.0, rec.current or 0.0, *losses))
+                    compression.add(values)
+                    self.write(values)
+                elif kind == "finished":
+                    break
+        finally:
+            if engine is not None:
+                engine.shutdown()
+                engine.join(5)
+            # outputs_off is always sent, whatever the driver's cache says
+            try:
+                driver.outputs_off((plan.vg_chan, plan.vd_chan))
+            except Exception as e:
+                self.log(f"[WARNING] Failed to turn NGP800 outputs off: {e}")
+            try:
+                exg.write("OUTP OFF")
+            except Exception as e:
+                self.log(f"[WARNING] Failed to turn RF output off: {e}")
+
+        complete = len(existing) + self.records >= grid.total
+        # Rows written before their segment's compression reference are
+        # filled in as the file is closed
+        self.close_writer(sort_by="point" if complete and grid.reordered() else None,
+                          fill=compression.fill if compression.unfilled else None)
+        self.log(f"Done: {len(existing) + self.records}/{grid.total} points")
+        return EXIT_OK if complete else EXIT_INCOMPLETE
+
+    def run_iv(self, instruments):
+        existing = self.open_writer(IV_COLUMNS)
+        resume_points = [(r["vg"], r["vd"], r["current"]) for r in existing]
+        sweep = self.plan.iv_sweep(instruments["ngp800"], self.stop_event, self.pause_event,
+                                   resume_points=resume_points, emit=self.on_iv)
+        grid = sweep.grid
+        self.log(f"Plan: {grid.describe()}")
+        note = order_note(grid)
+        if note:
+            self.log(note)
+        sweep.run()
+
+        complete = len(sweep.done_points) + self.records >= grid.total
+        self.close_writer(sort_by="point" if complete and grid.reordered() else None)
+        self.log(f"Done: {len(sweep.done_points) + self.records}/{grid.total} points")
+        return EXIT_OK if complete else EXIT_INCOMPLETE
+
+    def on_iv(self, kind, payload):
+        if kind == "log":
+            self.log(payload)
+        elif kind == "record":
+            self.write({name: getattr(payload, name) for name in IV_COLUMNS})
+        elif kind == "parameters":
+            idss, pinch_off, gm_max = payload
+            self.log(f"[SUMMARY] IDSS={idss} A, pinch-off={pinch_off}, GM max={gm_max} S")
+
+
+def compile_all(paths, cache):
+    # CompiledPlans for every recipe, or RecipeError listing each bad one
+    plans, errors = [], []
+    for path in paths:
+        try:
+            plans.append(cache.load(path)[0])
+        except RecipeError as e:
+            errors.append(str(e))
+    if errors:
+        raise RecipeError("\n".join(errors))
+    return plans
+
+
+def run_queue(plans, args):
+    # Runs the plans back to back; stops at the first one that does not
+    # complete unless --keep-going. Ctrl+C stops the current sweep (outputs
+    # off, records kept, --resume continues later) and the rest of the queue.
+    stop_event = threading.Event()
+    signal.signal(signal.SIGINT, lambda signum, frame: stop_event.set())
+    results = []
+    for i, plan in enumerate(plans, 1):
+        if stop_event.is_set():
+            break
+        runner = Runner(plan, output=args.output, fmt=args.format, resume=args.resume, quiet=args.quiet,
+                        stop_event=stop_event)
+        if len(plans) > 1:
+            runner.log(f"[QUEUE] {i}/{len(plans)} {plan.name}, expected {format_eta(plan.expected_duration)}")
+        start = time.monotonic()
+        try:
+            status = runner.run()
+        except RecipeError as e:
+            runner.log(f"[ERROR] {plan.name}: {e}")
+            status = EXIT_ERROR
+        except Exception as e:
+            runner.log(f"[ERROR] {plan.name}: {type(e).__name__}: {e}")
+            status = EXIT_ERROR
+        finally:
+            runner.close_writer()
+        results.append((plan, status, time.monotonic() - start))
+        if status != EXIT_OK and not args.keep_going:
+            break
+
+    if len(plans) > 1:
+        names = {EXIT_OK: "complete", EXIT_ERROR: "error", EXIT_INCOMPLETE: "incomplete"}
+        for plan, status, elapsed in results:
+            print(f"[QUEUE] {plan.name}: {names[status]} in {format_eta(elapsed)} "
+                  f"(expected {format_eta(plan.expected_duration)})", flush=True)
+        for plan in plans[len(results):]:
+            print(f"[QUEUE] {plan.name}: not run", flush=True)
+    if len(results) < len(plans):
+        return max([EXIT_INCOMPLETE] + [status for plan, status, elapsed in results])
+    return max(status for plan, status, elapsed in results)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run sweep recipes without the GUI")
+    parser.add_argument("recipes", nargs="+", help="recipe files (YAML, TOML or JSON), run in the order given")
+    parser.add_argument("--output", help="results file (overrides the recipe's \"output\"; one recipe only)")
+    parser.add_argument("--format", choices=RESULT_FORMATS, help="results format")
+    parser.add_argument("--resume", action="store_true", help="continue after the records already in the file")
+    parser.add_argument("--sim", action="store_true", help="run on the simulated bench (SSPL_RF_SIM=1)")
+    parser.add_argument("--dry-run", action="store_true", help="print the compiled plans and estimated time only")
+    parser.add_argument("--steps", action="store_true", help="with --dry-run, list what each plan sets and measures")
+    parser.add_argument("--keep-going", action="store_true", help="run the rest of the queue after a failed recipe")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR, help="compiled plan cache directory")
+    parser.add_argument("--no-cache", action="store_true", help="always compile the recipes")
+    parser.add_argument("--quiet", action="store_true", help="only warnings, errors and summaries")
+    args = parser.parse_args(argv)
+
+    if args.output and len(args.recipes) > 1:
+        parser.error("--output needs a single recipe; give each recipe its own \"output\"")
+    if args.sim:
+        os.environ[SIM_ENV] = "1"
+
+    try:
+        cache = PlanCache(args.cache_dir, enabled=not args.no_cache)
+        plans = compile_all(args.recipes, cache)
+        if args.dry_run:
+            for plan in plans:
+                print(format_plan(plan, steps=args.steps))
+            if len(plans) > 1:
+                print(f"Queue: {len(plans)} recipes, "
+                      f"estimated {format_eta(sum(plan.expected_duration for plan in plans))}")
+            if cache.enabled:
+                print(f"Plan cache: {cache.hits} cached, {cache.misses} compiled")
+            return EXIT_OK
+        return run_queue(plans, args)
+    except RecipeError as e:
+        print(f"[ERROR] {e}", file=sys.stderr)
+        return EXIT_ERROR
+    except Exception as e:
+        print(f"[ERROR] {type(e).__name__}: {e}", file=sys.stderr)
+        return EXIT_ERROR
+    finally:
+        get_pool().close_all()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
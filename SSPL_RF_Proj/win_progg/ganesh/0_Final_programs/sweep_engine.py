@@ -0,0 +1,509 @@
+import copy
+import time
+import queue
+import threading
+
+from settling import SettleConfig, create_settler
+from power_meter import PowerMeter
+from records import RFRecord
+from ngp800_driver import ngp800_for
+from async_io import InstrumentIO
+from sweep_planner import Axis, SweepProgress, compile_grid, FREQ, BIAS, POWER
+
+
+# Columns of the NGP800 bias readback row (Vg channel first, then Vd)
+VG, IG, VD, ID = range(4)
+
+# When to query FREQ?/POW? back from the EXG; records always carry the commanded values
+VERIFY_MODES = ["First/Last", "Every N", "Off"]
+
+
+class SweepPlan:
+    def __init__(self, rf_powers, vg, vd, vg_chan, vd_chan, settle=None,
+                 continuous_rf=True, curr_max=None, hardware_list=False, dwell=0.05,
+                 meter_averaging=None, meter_aperture=None, buffered_pout=False,
+                 rf_freq=None, verify_rf="First/Last", verify_every=10,
+                 rf_freqs=None, biases=None, start_index=0, order="Slow axis outer", axis_costs=None,
+                 grid_plan=None, rf_off_between_segments=False):
+        self.rf_powers = list(rf_powers)
+        self.vg = vg
+        self.vd = vd
+        self.vg_chan = vg_chan
+        self.vd_chan = vd_chan
+        self.settle = settle if settle is not None else SettleConfig()
+        # Keep RF on and only change the level between points; output is
+        # toggled at the start/end of the plan or on a safety trip
+        self.continuous_rf = continuous_rf
+        self.curr_max = curr_max
+        # Hardware-sequenced mode: EXG list sweep steps the power on its own
+        # timer and the meter buffers one triggered reading per point
+        self.hardware_list = hardware_list
+        self.dwell = dwell
+        # Power meter averaging count / aperture (s); None leaves the meter as is.
+        # buffered_pout triggers the meter with *TRG per point and fetches all
+        # Pout readings in one block at the end of the plan.
+        self.meter_averaging = meter_averaging
+        self.meter_aperture = meter_aperture
+        self.buffered_pout = buffered_pout
+        # Commanded RF frequency (Hz); None reads it from the EXG once per plan.
+        # verify_rf / verify_every pick the points where the EXG is read back.
+        self.rf_freq = rf_freq
+        self.verify_rf = verify_rf
+        self.verify_every = verify_every
+        # 2-D/3-D runs: frequencies (Hz) and (vg, vd) pairs swept around the
+        # power list in one plan; None keeps rf_freq / (vg, vd) fixed.
+        # start_index skips the first points of the grid (resume).
+        self.rf_freqs = list(rf_freqs) if rf_freqs else None
+        self.biases = list(biases) if biases else None
+        self.start_index = start_index
+        # Execution order (sweep_planner.ORDERS) and {axis: change cost in s}
+        # overriding sweep_planner.DEFAULT_CHANGE_COST. Records carry their
+        # canonical (freq, bias, power) grid index whatever the order.
+        self.order = order
+        self.axis_costs = axis_costs or {}
+        self.point_indices = None
+        # GridPlan compiled ahead of time (recipes.CompiledPlan); None
+        # compiles it from the axes above when the plan runs
+        self.grid_plan = grid_plan
+        # RF stays on for the whole plan; True switches it off for every
+        # retune / bias step between grid segments
+        self.rf_off_between_segments = rf_off_between_segments
+
+    def point_cost(self, worst=False):
+        # Expected seconds per point for run time estimates; adaptive / OPC
+        # settling is costed at its typical time, or at its limit when worst
+        if self.hardware_list:
+            return self.dwell
+        return self.settle.worst_time() if worst else self.settle.typical_time()
+
+    def grid(self):
+        if self.grid_plan is not None:
+            return self.grid_plan
+        return compile_grid([
+            Axis(FREQ, self.rf_freqs or [self.rf_freq], self.axis_costs.get(FREQ)),
+            Axis(BIAS, self.biases or [(self.vg, self.vd)], self.axis_costs.get(BIAS)),
+            Axis(POWER, self.rf_powers, self.axis_costs.get(POWER)),
+        ], self.order, self.point_cost(), self.point_cost(worst=True))
+
+
+class SweepEngine(threading.Thread):
+    # One long-lived measurement thread per app. Plans are submitted with submit()
+    # and every point of a plan runs in a single loop on this thread. Results are
+    # streamed back on self.results as (kind, payload) tuples:
+    #   ("log", str), ("record", RFRecord), ("point_done", rf_power),
+    #   ("progress", SweepProgress.snapshot()), ("finished", None)
+
+    def __init__(self, instrument, exg_instr, pm_instr, stop_event, pause_event, rf_control=None):
+        super().__init__(name="SweepEngine", daemon=True)
+        self.instrument = instrument
+        self.ngp = ngp800_for(instrument)  # state cache shared with the GUI thread
+        self.exg_instr = exg_instr
+        self.meter = PowerMeter(pm_instr, log=self.log) if pm_instr else None
+        self.rf_control = rf_control  # i_exg_n5173B.ControlScreen, needed for hardware list sweeps
+        self.stop_event = stop_event
+        self.pause_event = pause_event
+
+        self.results = queue.Queue()
+        self._plans = queue.Queue()
+        self.busy = False
+
+        self.io = InstrumentIO(("ngp800", "exg", "meter"))
+        self.rf_on = None  # unknown until the engine switches it
+        self.rf_switch_count = 0
+        self.progress = None
+        self.tripped = False
+
+    def submit(self, plan):
+        self.busy = True
+        self._plans.put(plan)
+
+    def shutdown(self):
+        self._plans.put(None)
+
+    def run(self):
+        while True:
+            plan = self._plans.get()
+            if plan is None:
+                break
+            try:
+                self.run_plan(plan)
+            except Exception as e:
+                self.log(f"[ERROR] Exception in SweepEngine: {e}")
+            self.busy = False
+            self._emit("finished", None)
+        self.io.close()
+
+    def _emit(self, kind, payload):
+        self.results.put((kind, payload))
+
+    def log(self, message):
+        self._emit("log", message)
+
+    def wait_if_paused(self):
+        while self.pause_event.is_set() and not self.stop_event.is_set():
+            time.sleep(0.1)
+
+    def set_rf_output(self, on):
+        if self.rf_on == on:
+            return
+        self.exg_instr.write("OUTP ON" if on else "OUTP OFF")
+        self.rf_on = on
+        self.rf_switch_count += 1
+
+    def point_done(self, rf_power):
+        self._emit("point_done", rf_power)
+        if self.progress:
+            self.progress.point_done()
+            self._emit("progress", self.progress.snapshot())
+
+    def retune(self, freq_hz):
+        # EXG and power meter frequency correction always move together
+        self.exg_instr.write(f"FREQ {freq_hz} Hz")
+        if self.meter:
+            self.meter.set_frequency(freq_hz)
+        self.log(f"RF Frequency set to {freq_hz} Hz")
+
+    def set_bias(self, plan, vg, vd):
+        # Gate before drain
+        with self.ngp.batch():
+            self.ngp.apply(plan.vg_chan, vg)
+            self.ngp.apply(plan.vd_chan, vd)
+        self.log(f"Bias set to Vg={vg} V, Vd={vd} V")
+
+    def read_current(self, plan):
+        return self.ngp.measure_current(plan.vd_chan)
+
+    def read_bias(self, plan):
+        # [Vg_actual, Ig, Vd_actual, Id] in one NGP800 query
+        return self.ngp.readback((plan.vg_chan, plan.vd_chan))
+
+    def read_power(self):
+        return self.meter.read()
+
+    def run_plan(self, plan):
+        if self.meter and (plan.meter_averaging or plan.meter_aperture):
+            try:
+                self.meter.configure(plan.meter_averaging, plan.meter_aperture)
+                self.log(f"Power meter: averaging={plan.meter_averaging}, aperture={plan.meter_aperture} s")
+            except Exception as e:
+                self.log(f"[WARNING] Failed to configure power meter: {e}")
+
+        if plan.rf_freq is None and self.exg_instr:
+            try:
+                plan.rf_freq = float(self.exg_instr.query("FREQ?").strip())
+            except Exception as e:
+                self.log(f"[WARNING] RF frequency read failed: {e}")
+
+        # Every plan runs as a grid; a plain power sweep is a single segment.
+        # Segments are runs of points where only the power changes, so the
+        # retune / bias step only happens between segments.
+        grid = plan.grid()
+        self.progress = SweepProgress(grid, plan.start_index)
+        self.tripped = False
+        multi = grid.total > len(plan.rf_powers)
+        if multi:
+            self.log(f"[GRID] {grid.describe()}, outer to inner: {', '.join(a.name for a in grid.axes)}")
+        self.log(f"Estimated run time: {grid.format_estimate(plan.start_index)}")
+
+        if plan.hardware_list:
+            self.log(f"SweepEngine started (hardware list mode, dwell {plan.dwell} s)")
+        else:
+            self.log(f"SweepEngine started (RF only mode, {grid.total - plan.start_index} points)")
+            self.log(f"Settling: {plan.settle.describe()}")
+            self.log("RF output: " + ("continuous" if plan.continuous_rf else "toggled per point"))
+
+        # RF is switched on once for the plan and off once at its end (or on
+        # a trip), not per segment
+        self.rf_on = None
+        self.rf_switch_count = 0
+        points_done = 0
+        writes0, reads0 = self.ngp.transactions()
+        # The front panel, an OCP trip or a failed outputs_off may have changed
+        # the NGP800 since the last plan: forget the cache and set the bias
+        # (select, volts, OUTP ON) afresh at the first segment
+        self.ngp.invalidate()
+        freq_set = plan.rf_freq
+        bias_set = None
+        try:
+            for first, fixed, powers in grid.segments(POWER, plan.start_index):
+                if self.stop_event.is_set() or self.tripped:
+                    break
+                freq, (vg, vd) = fixed[FREQ], fixed[BIAS]
+                if multi:
+                    self.log(f"[GRID] Segment at point {first + 1}/{grid.total}: "
+                             f"{freq} Hz, Vg={vg} V, Vd={vd} V, {len(powers)} powers")
+                try:
+                    if plan.rf_off_between_segments and self.rf_on and (freq != freq_set or (vg, vd) != bias_set):
+                        self.set_rf_output(False)
+                    if freq != freq_set:
+                        self.retune(freq)
+                        freq_set = freq
+                    if (vg, vd) != bias_set:
+                        self.set_bias(plan, vg, vd)
+                        bias_set = (vg, vd)
+                except Exception as e:
+                    self.log(f"[ERROR] Failed to move to the next grid segment: {e}")
+                    break
+
+                segment = copy.copy(plan)
+                segment.rf_powers, segment.rf_freq, segment.vg, segment.vd = powers, freq, vg, vd
+                segment.point_indices = [grid.canonical_index(k) for k in range(first, first + len(powers))]
+                points_done += self.run_segment(segment)
+        finally:
+            self.progress = None
+            try:
+                self.set_rf_output(False)
+            except Exception as e:
+                self.log(f"[WARNING] Failed to turn RF output off: {e}")
+
+        writes, reads = self.ngp.transactions()
+        self.log(f"[SUMMARY] {points_done}/{grid.total - plan.start_index} points, "
+                 f"RF output switched {self.rf_switch_count} times, "
+                 f"NGP800 {writes - writes0} writes / {reads - reads0} reads")
+
+    def run_segment(self, plan):
+        # Points done in one segment; RF is left as it is for the next one
+        if plan.hardware_list:
+            return self.run_hardware_list(plan)
+        return self._run_points(plan)
+
+    def _run_points(self, plan):
+        buffered = plan.buffered_pout and self.meter is not None
+        settler = create_settler(
+            plan.settle,
+            opc_instr=self.exg_instr,
+            read_current=lambda: self.read_current(plan),
+            read_power=self.read_power if (self.meter and not buffered) else None,
+        )
+        total_settle = 0.0
+        points_done = 0
+        pending = []  # (rf_power, bias, rf_freq, power_in, settle_s) while Pout sits in the meter buffer
+
+        if buffered:
+            self.meter.arm_buffer(len(plan.rf_powers), trigger="BUS")
+
+        for index, rf_power in enumerate(plan.rf_powers):
+            self.wait_if_paused()
+            if self.stop_event.is_set():
+                self.log("Sweep interrupted. Exiting remaining steps.")
+                break
+
+            try:
+                if not plan.continuous_rf:
+                    self.set_rf_output(False)
+                self.exg_instr.write(f"POW {rf_power} dBm")
+                self.set_rf_output(True)
+                self.log(f"RF Power set to {rf_power} dBm")
+            except Exception as e:
+                self.log(f"Error setting RF power: {e}")
+                break
+
+            settle_s = None
+            try:
+                settle_s = settler.settle()
+                total_settle += settle_s
+                if getattr(settler, "timed_out", False):
+                    self.log(f"[WARNING] Not settled within {plan.settle.max_time} s at {rf_power} dBm")
+                self.log(f"[SETTLE] {rf_power} dBm: {settle_s:.3f} s ({settler.mode})")
+            except Exception as e:
+                self.log(f"[WARNING] Settling failed at {rf_power} dBm: {e}")
+
+            current = None
+            try:
+                if buffered:
+                    self.meter.trigger()
+                    # The buffer now holds this point's Pout: keep its slot even
+                    # if the bias read fails, so readings stay aligned with points
+                    try:
+                        bias, rf_freq, power_in, _ = self.measure_point(plan, rf_power, index, read_meter=False)
+                    except Exception:
+                        pending.append((index, rf_power, None, plan.rf_freq, rf_power, settle_s))
+                        raise
+                    pending.append((index, rf_power, bias, rf_freq, power_in, settle_s))
+                else:
+                    bias, rf_freq, power_in, live_power = self.measure_point(plan, rf_power, index)
+                    self.emit_record(plan, index, bias, rf_freq, power_in, live_power, settle_s)
+                current = bias[ID]
+            except Exception as e:
+                self.log(f"[ERROR] Exception in SweepEngine: {e}")
+            finally:
+                if not plan.continuous_rf:
+                    try:
+                        self.set_rf_output(False)
+                    except Exception:
+                        pass
+
+            points_done += 1
+            if not buffered:
+                self.point_done(rf_power)
+
+            if plan.curr_max is not None and current is not None and current > plan.curr_max:
+                self.set_rf_output(False)
+                self.tripped = True
+                self.ngp.invalidate()  # the supply may have tripped its outputs too
+                self.log(f"[TRIP] Current limit exceeded: {current} > {plan.curr_max}. RF off, stopping sweep.")
+                break
+
+        if buffered:
+            self.flush_buffered_points(plan, pending)
+
+        if points_done:
+            self.log(f"Total settle time: {total_settle:.2f} s over {points_done} points "
+                     f"(avg {total_settle / points_done:.3f} s)")
+        return points_done
+
+    def flush_buffered_points(self, plan, pending):
+        readings = []
+        size = self.meter.buffer_size
+        if not pending:
+            self.meter.abort()
+        else:
+            try:
+                if len(pending) < size:
+                    # Partial buffer (stop / trip): the meter only completes on
+                    # its last trigger, so pad it with throwaway readings and
+                    # keep the ones already taken
+                    self.log(f"[WARNING] Buffer incomplete ({len(pending)}/{size}), "
+                             f"padding {size - len(pending)} triggers to fetch the Pout taken")
+                    for _ in range(size - len(pending)):
+                        self.meter.trigger()
+                readings = self.meter.fetch_buffer()[:len(pending)]
+                self.meter.release_buffer()
+            except Exception as e:
+                self.log(f"[WARNING] Buffered power meter fetch failed, Pout not available: {e}")
+                try:
+                    self.meter.abort()
+                except Exception:
+                    pass
+
+        for i, (index, rf_power, bias, rf_freq, power_in, settle_s) in enumerate(pending):
+            live_power = float(readings[i]) if i < len(readings) else None
+            self.emit_record(plan, index, bias, rf_freq, power_in, live_power, settle_s)
+            self.point_done(rf_power)
+
+    def run_hardware_list(self, plan):
+        powers = plan.rf_powers
+        n = len(powers)
+        if self.rf_control is None or self.meter is None:
+            self.log("[ERROR] Hardware list sweep needs the EXG control screen and a power meter.")
+            return 0
+
+        t_start = time.perf_counter()
+
+        rf_freq = plan.rf_freq
+        self.rf_control.load_power_list(powers, plan.dwell)
+        self.meter.arm_buffer(n, trigger="EXT")
+
+        # Id has no hardware trigger on the NGP800, so sample the bias once per
+        # list point in the middle of each dwell window while the EXG steps itself
+        biases = [None] * n
+        aborted = False
+        self.rf_control.start_list_sweep()
+        if not self.rf_on:
+            self.rf_switch_count += 1
+        self.rf_on = True
+        try:
+            t0 = time.perf_counter()
+            for i in range(n):
+                if self.stop_event.is_set():
+                    aborted = True
+                    break
+                delay = t0 + (i + 0.5) * plan.dwell - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                try:
+                    biases[i] = self.read_bias(plan)
+                except Exception as e:
+                    self.log(f"[WARNING] Current read failed at point {i}: {e}")
+                    continue
+                current = biases[i][ID]
+                if plan.curr_max is not None and current > plan.curr_max:
+                    self.tripped = True
+                    self.log(f"[TRIP] Current limit exceeded at {powers[i]} dBm: {current} > {plan.curr_max}. "
+                             f"List sweep aborted, RF off, stopping sweep.")
+                    aborted = True
+                    break
+
+            if not aborted:
+                self.rf_control.wait_list_sweep(timeout_s=n * plan.dwell + 5)
+        finally:
+            # Back to CW at the segment's lowest power with RF still on;
+            # run_plan switches it off after the last segment
+            self.rf_control.stop_list_sweep(rf_off=False, hold_power=min(powers))
+
+        if self.tripped:
+            self.set_rf_output(False)
+            self.ngp.invalidate()  # the supply may have tripped its outputs too
+        if aborted:
+            self.meter.abort()
+            if not self.tripped:
+                self.log("Sweep interrupted. Hardware list sweep aborted.")
+            return 0
+
+        readings = self.meter.fetch_buffer()
+        self.meter.release_buffer()
+        if len(readings) != n:
+            self.log(f"[WARNING] Power meter returned {len(readings)} readings for {n} points")
+
+        for i, rf_power in enumerate(powers):
+            live_power = float(readings[i]) if i < len(readings) else None
+            self.emit_record(plan, i, biases[i], rf_freq, rf_power, live_power, plan.dwell)
+            self.point_done(rf_power)
+
+        elapsed = time.perf_counter() - t_start
+        self.log(f"List segment: {n} points in {elapsed:.2f} s ({elapsed / n * 1000:.1f} ms/point)")
+        return n
+
+    def emit_record(self, plan, index, bias, rf_freq, power_in, live_power, settle_s=None):
+        # index: position in plan.rf_powers; bias: NGP800 readback row
+        # [Vg, Ig, Vd, Id], or None if it failed
+        vg, ig, vd, current = [None] * 4 if bias is None else [float(v) for v in bias]
+        point = plan.point_indices[index] if plan.point_indices else index
+        record = RFRecord(time.time(), plan.vg, plan.vd, current,
+                          freq=rf_freq, power_in=power_in, power_out=live_power, settle_s=settle_s,
+                          ig=ig, vg_actual=vg, vd_actual=vd, point=point)
+        self._emit("record", record)
+
+    def read_rf_settings(self):
+        return float(self.exg_instr.query("FREQ?").strip()), float(self.exg_instr.query("POW?").strip())
+
+    def should_verify(self, plan, index):
+        last = len(plan.rf_powers) - 1
+        if plan.verify_rf == "First/Last":
+            return index in (0, last)
+        if plan.verify_rf == "Every N":
+            return index % max(1, plan.verify_every) == 0 or index == last
+        return False
+
+    def measure_point(self, plan, rf_power, index, read_meter=True):
+        # Frequency and Pin are recorded as commanded; the EXG is only read
+        # back on verification points. NGP800, EXG and power meter sit on
+        # separate buses, so whatever is read is queried concurrently.
+        verify = self.exg_instr is not None and self.should_verify(plan, index)
+        bias, rf, live_power = self.io.run_concurrently(
+            ("ngp800", self.read_bias, plan),
+            ("exg", self.read_rf_settings) if verify else None,
+            ("meter", self.read_power) if (self.meter and read_meter) else None,
+        )
+        if isinstance(bias, Exception):
+            raise bias
+
+        rf_freq = plan.rf_freq
+        power_in = rf_power
+        if isinstance(rf, Exception):
+            self.log(f"[WARNING] RF readback failed: {rf}")
+        elif rf is not None:
+            freq_read, power_read = rf
+            if (rf_freq is not None and abs(freq_read - rf_freq) > 1.0) or abs(power_read - rf_power) > 0.01:
+                self.log(f"[WARNING] EXG readback {freq_read} Hz / {power_read} dBm "
+                         f"differs from commanded {rf_freq} Hz / {rf_power} dBm")
+            else:
+                self.log(f"[VERIFY] EXG at {freq_read} Hz / {power_read} dBm")
+
+        if isinstance(live_power, Exception):
+            self.log(f"[WARNING] Power meter read failed: {live_power}")
+            live_power = None
+
+        self.log(f"Measured current: {bias[ID]:.8f} A (Ig={bias[IG]:.8f} A, "
+                 f"Vg={bias[VG]:.3f} V, Vd={bias[VD]:.3f} V)")
+        return bias, rf_freq, power_in, live_power
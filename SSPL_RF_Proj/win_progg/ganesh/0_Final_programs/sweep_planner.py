@@ -0,0 +1,218 @@
+import time
+
+import numpy as np
+
+
+# Axis names the sweep engine knows how to drive
+FREQ, BIAS, POWER = "freq", "bias", "power"
+
+# Rough cost (s) of one value change on each axis. A retune moves the EXG
+# synthesizer and the power meter's SENS:FREQ correction, a bias step waits
+# for the drain current to settle, a power step only re-levels the EXG.
+DEFAULT_CHANGE_COST = {FREQ: 0.5, BIAS: 0.3, POWER: 0.02}
+
+
+# Execution orders. "Slow axis outer" nests the axes by change cost,
+# "Serpentine" does the same but runs every inner axis back and forth so
+# consecutive points are always one step apart, "As entered" keeps the
+# canonical order. "Auto" takes whichever has the lowest estimated run time.
+ORDERS = ["Auto", "Slow axis outer", "Serpentine", "As entered"]
+
+
+class Axis:
+    # change_cost: seconds per value change (settling + command latency),
+    # step_cost: extra seconds per index step moved in one change (slew)
+    def __init__(self, name, values, change_cost=None, step_cost=0.0):
+        self.name = name
+        self.values = list(values)
+        if change_cost is None:
+            change_cost = DEFAULT_CHANGE_COST.get(name, 0.0)
+        self.change_cost = change_cost
+        self.step_cost = step_cost
+
+    def __len__(self):
+        return len(self.values)
+
+
+class GridPlan:
+    # Nested sweep over several axes. The axes as given define the canonical
+    # grid (what results are sorted back to); self.axes holds them outermost
+    # first in execution order. Point k of the run maps to one index per axis,
+    # which is all segments, resume and progress need. point_cost is the
+    # typical measurement time per point, for estimate(); worst_point_cost
+    # (e.g. adaptive settling at its time limit) bounds it from above.
+
+    def __init__(self, axes, order="Slow axis outer", point_cost=0.0, worst_point_cost=None):
+        self.canonical = list(axes)
+        self.order = order
+        if order == "As entered":
+            self.axes = list(self.canonical)
+        else:
+            # sorted() is stable: axes with equal cost keep the order given
+            self.axes = sorted(self.canonical, key=lambda a: a.change_cost, reverse=True)
+        self.serpentine = order == "Serpentine"
+        self.point_cost = point_cost
+        self.worst_point_cost = point_cost if worst_point_cost is None else max(point_cost, worst_point_cost)
+        self.shape = np.array([len(a) for a in self.axes], dtype=np.int64)
+        self.strides = self._strides(self.shape)
+        self.total = int(self.shape.prod()) if self.axes else 0
+        position = [self.canonical.index(a) for a in self.axes]
+        self.canonical_strides = self._strides([len(a) for a in self.canonical])[position]
+        # The whole grid is worked out once: per-axis indices of every point
+        # in execution order, and each point's canonical index
+        self._indices = self._compute_indices()
+        self._canonical = self._indices @ self.canonical_strides
+
+    @staticmethod
+    def _strides(shape):
+        strides = np.ones(len(shape), dtype=np.int64)
+        for d in range(len(shape) - 2, -1, -1):
+            strides[d] = strides[d + 1] * shape[d + 1]
+        return strides
+
+    def __len__(self):
+        return self.total
+
+    def axis(self, name):
+        for a in self.axes:
+            if a.name == name:
+                return a
+        return None
+
+    def _compute_indices(self):
+        k = np.arange(self.total, dtype=np.int64)[:, None]
+        idx = (k // self.strides) % self.shape
+        if self.serpentine:
+            # An axis runs backwards on every odd pass through its values
+            backwards = (k // (self.strides * self.shape)) % 2 == 1
+            idx = np.where(backwards, self.shape - 1 - idx, idx)
+        return idx
+
+    def indices(self, start=0, stop=None):
+        # (points, axes) array of per-axis value indices for points start..stop
+        return self._indices[start:stop]
+
+    def index(self, k):
+        return tuple(self._indices[k].tolist())
+
+    def point(self, k):
+        return {a.name: a.values[i] for a, i in zip(self.axes, self.index(k))}
+
+    def canonical_index(self, k):
+        # Flat index of point k in the canonical grid
+        return int(self._canonical[k])
+
+    def reordered(self):
+        # True if execution order differs from canonical order
+        return bool(np.any(self._canonical != np.arange(self.total)))
+
+    def changes(self):
+        # How often each axis changes value over the whole run
+        moves = np.diff(self.indices(), axis=0) != 0
+        return {a.name: int(n) for a, n in zip(self.axes, moves.sum(axis=0))}
+
+    def estimate(self, start=0, worst=False):
+        # Estimated seconds for points start..end: every axis is set once,
+        # then each change costs change_cost + step_cost * index steps;
+        # worst=True is the upper bound at worst_point_cost
+        if start >= self.total:
+            return 0.0
+        change = np.array([a.change_cost for a in self.axes], dtype=float)
+        step = np.array([a.step_cost for a in self.axes], dtype=float)
+        moves = np.abs(np.diff(self.indices(start), axis=0))
+        point_cost = self.worst_point_cost if worst else self.point_cost
+        return float(change.sum() + ((moves > 0) @ change).sum() + (moves @ step).sum()
+                     + point_cost * (self.total - start))
+
+    def format_estimate(self, start=0):
+        # "00:02", or "00:02 (at most 01:08)" when points may take longer
+        text = format_eta(self.estimate(start))
+        if self.worst_point_cost > self.point_cost:
+            text += f" (at most {format_eta(self.estimate(start, worst=True))})"
+        return text
+
+    def segments(self, inner, start=0):
+        # Runs of consecutive points where only `inner` changes:
+        # yields (first point index, {other axis: value}, [inner values])
+        k = start
+        while k < self.total:
+            fixed = self.point(k)
+            values = [fixed.pop(inner)]
+            first = k
+            k += 1
+            while k < self.total:
+                p = self.point(k)
+                value = p.pop(inner)
+                if p != fixed:
+                    break
+                values.append(value)
+                k += 1
+            yield first, fixed, values
+
+    def describe(self):
+        sizes = " x ".join(f"{a.name} {len(a)}" for a in self.axes)
+        changes = self.changes()
+        swept = [a.name for a in self.axes if len(a) > 1]
+        moves = ", ".join(f"{name} {changes[name]} changes" for name in swept)
+        return (f"{sizes} = {self.total} points, {self.order.lower()}"
+                + (f" ({moves})" if moves else "") + f", est. {self.format_estimate()}")
+
+
+def compile_grid(axes, order="Auto", point_cost=0.0, worst_point_cost=None):
+    # GridPlan in the requested order; "Auto" compares the estimates of the
+    # fixed orders and keeps the first cheapest (slow axis outer on a tie)
+    if order != "Auto":
+        return GridPlan(axes, order, point_cost, worst_point_cost)
+    plans = [GridPlan(axes, o, point_cost, worst_point_cost) for o in ORDERS[1:]]
+    return min(plans, key=lambda plan: plan.estimate())
+
+
+class SweepProgress:
+    # Points done vs. the grid, with an ETA for the whole run and for every
+    # axis (time until that axis moves to its next value) from the mean time
+    # per point measured so far in this run.
+
+    def __init__(self, grid, start=0):
+        self.grid = grid
+        self.start = start
+        self.done = start
+        self.t0 = time.perf_counter()
+
+    def point_done(self):
+        self.done = min(self.done + 1, self.grid.total)
+
+    def snapshot(self):
+        measured = self.done - self.start
+        elapsed = time.perf_counter() - self.t0
+        per_point = elapsed / measured if measured else None
+        k = min(self.done, self.grid.total - 1)
+        axes = []
+        for a, i, stride in zip(self.grid.axes, self.grid.index(k), self.grid.strides.tolist()):
+            # Points left in this axis' current value (the one being measured next)
+            left = stride - (self.done % stride) if self.done < self.grid.total else 0
+            eta = per_point * left if per_point is not None else None
+            axes.append((a.name, i + 1, len(a), eta))
+        remaining = self.grid.total - self.done
+        return {
+            "done": self.done, "total": self.grid.total, "elapsed": elapsed,
+            "eta": per_point * remaining if per_point is not None else None,
+            "axes": axes,
+        }
+
+
+def format_eta(seconds):
+    if seconds is None:
+        return "--:--"
+    seconds = int(round(seconds))
+    if seconds >= 3600:
+        return f"{seconds // 3600}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+    return f"{seconds // 60:02d}:{seconds % 60:02d}"
+
+
+def format_progress(snapshot):
+    # "12/63 points, ETA 01:24 | freq 1/3 (00:30) | power 12/21 (00:02)"
+    parts = [f"{snapshot['done']}/{snapshot['total']} points, ETA {format_eta(snapshot['eta'])}"]
+    for name, position, size, eta in snapshot["axes"]:
+        if size > 1:
+            parts.append(f"{name} {position}/{size} ({format_eta(eta)})")
+    return " | ".join(parts)
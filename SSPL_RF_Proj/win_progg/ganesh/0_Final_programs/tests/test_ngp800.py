@@ -0,0 +1,47 @@
+import pytest
+
+from ngp800_driver import NGP800
+from sim_instruments import SimResourceManager, NGP800_RESOURCE
+
+
+@pytest.fixture
+def ngp():
+    session = SimResourceManager().open_resource(NGP800_RESOURCE)
+    return NGP800(session)
+
+
+def test_select_set_enable_is_one_compound_message(ngp):
+    ngp.apply("1", -1.5)
+    assert ngp.instr.log == ["INST:NSEL 1;:VOLT -1.5;:OUTP ON"]
+    ngp.apply("1", -1.0)
+    assert ngp.instr.log[-1] == "VOLT -1.0"
+
+
+def test_batch_joins_both_rails_and_readback_parses_one_row(ngp):
+    with ngp.batch():
+        ngp.apply("1", -1.0)
+        ngp.apply("2", 5.0)
+    assert ngp.instr.log == ["INST:NSEL 1;:VOLT -1.0;:OUTP ON;:INST:NSEL 2;:VOLT 5.0;:OUTP ON"]
+    row = ngp.readback(("1", "2"))
+    assert len(row) == 4
+    assert row[0] == pytest.approx(-1.0) and row[2] == pytest.approx(5.0)
+    assert ngp.transactions() == (2, 1)
+
+
+def test_unchanged_set_points_are_skipped_until_invalidated(ngp):
+    ngp.apply("2", 5.0)
+    writes = ngp.writes
+    ngp.apply("2", 5.0)
+    assert ngp.writes == writes
+    ngp.instr.output["2"] = False  # front panel / OCP trip
+    ngp.invalidate()
+    ngp.apply("2", 5.0)
+    assert ngp.instr.log[-1] == "INST:NSEL 2;:VOLT 5.0;:OUTP ON"
+    assert ngp.instr.output["2"]
+
+
+def test_outputs_off_is_always_sent(ngp):
+    ngp.outputs_off(("1", "2"))
+    ngp.outputs_off(("1", "2"))
+    assert ngp.instr.log[-1] == "INST:NSEL 1;:OUTP OFF;:INST:NSEL 2;:OUTP OFF"
+    assert len(ngp.instr.log) == 2
@@ -0,0 +1,43 @@
+import pytest
+from pyvisa.errors import VisaIOError
+from pyvisa.constants import StatusCode
+
+from power_meter import PowerMeter
+
+
+class Meter:
+    # Buffer of three readings; binary FETC? raises `error` when given
+    def __init__(self, error=None):
+        self.error = error
+        self.log = []
+
+    def write(self, message):
+        self.log.append(message)
+
+    def query(self, message):
+        return "-10.0,-9.5,-9.0\n"
+
+    def query_binary_values(self, message, **kwargs):
+        if self.error:
+            raise self.error
+        return [-10.0, -9.5, -9.0]
+
+
+def test_binary_fetch():
+    meter = PowerMeter(Meter())
+    assert list(meter.fetch_buffer()) == [-10.0, -9.5, -9.0]
+    assert meter.instr.log[-1] == "FORM ASC"
+
+
+@pytest.mark.parametrize("error", [VisaIOError(StatusCode.error_timeout), ValueError("no binary form")])
+def test_ascii_fallback_is_logged(error):
+    messages = []
+    meter = PowerMeter(Meter(error), log=messages.append)
+    assert list(meter.fetch_buffer()) == [-10.0, -9.5, -9.0]
+    assert messages and messages[0].startswith("[WARNING]")
+
+
+def test_other_errors_propagate():
+    meter = PowerMeter(Meter(AttributeError("session closed")))
+    with pytest.raises(AttributeError):
+        meter.fetch_buffer()
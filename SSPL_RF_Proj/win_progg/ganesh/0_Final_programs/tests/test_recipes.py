@@ -0,0 +1,136 @@
+import pytest
+
+import recipes
+from recipes import parse_recipe, validate_recipe, compile_recipe
+
+
+def header_example():
+    # The YAML example in the comment block at the top of recipes.py
+    lines = []
+    with open(recipes.__file__) as f:
+        for line in f:
+            if line.startswith("#   name:") or lines:
+                if not line.startswith("#   "):
+                    break
+                lines.append(line[4:])
+    return "".join(lines).encode()
+
+
+def test_header_example_validates():
+    recipe = validate_recipe(parse_recipe(header_example(), ".yaml"))
+    assert recipe["name"] == "lot42_pa_2g4"
+    assert recipe["rf"]["freq_hz"] == 2.4e9
+    plan = compile_recipe(recipe)
+    assert plan.total_points == 31
+
+
+def test_yaml_exponent_without_sign_is_a_number():
+    recipe = parse_recipe(b"a: 2.4e9\nb: 1e-3\nc: 2.4e+9\nd: 1e9x\n", ".yaml")
+    assert recipe == {"a": 2.4e9, "b": 1e-3, "c": 2.4e9, "d": "1e9x"}
+
+
+def test_compiled_plan_is_read_only_and_survives_the_cache(tmp_path):
+    path = tmp_path / "example.yaml"
+    path.write_bytes(header_example())
+    cache = recipes.PlanCache(str(tmp_path / "cache"))
+    plan, cached = cache.load(str(path))
+    assert not cached
+    with pytest.raises(AttributeError):
+        plan.kind = "iv"
+    with pytest.raises(TypeError):
+        plan.settings["rf"]["freq_hz"] = 1e9
+    again, cached = cache.load(str(path))
+    assert cached
+    assert again.settings["rf"]["freq_hz"] == 2.4e9
+    with pytest.raises(TypeError):
+        again.limits["vd_max"] = 100
+    assert again.grid.total == plan.grid.total
+
+
+def test_plan_cache_key_covers_the_planning_code(monkeypatch):
+    digest = recipes.recipe_digest(b"sweep: iv", "a", ".yaml")
+    monkeypatch.setattr(recipes, "_source_hash", "changed planner")
+    assert recipes.recipe_digest(b"sweep: iv", "a", ".yaml") != digest
+
+
+def test_fine_window_refines_an_axis():
+    raw = {"sweep": "iv", "iv": {"vg_start": -3, "vg_stop": 0, "vg_step": 1, "vg_fine_step": 0.5,
+                                 "vg_fine_start": -2, "vg_fine_stop": -1,
+                                 "vd_start": 0, "vd_stop": 2, "vd_step": 1}}
+    plan = compile_recipe(validate_recipe(raw))
+    assert plan.vg_values == (-3.0, -2.0, -1.5, -1.0, 0.0)
+    assert plan.total_points == 15
+    del raw["iv"]["vg_fine_stop"]
+    with pytest.raises(recipes.RecipeError, match="go together"):
+        compile_recipe(validate_recipe(raw))
+
+
+def iv_recipe(**iv):
+    section = {"vg_start": -3, "vg_stop": 0, "vg_step": 1, "vd_start": 0, "vd_stop": 2, "vd_step": 1}
+    section.update(iv)
+    return {"name": "t", "sweep": "iv", "iv": section}
+
+
+def test_defaults_are_filled_in():
+    recipe = validate_recipe(iv_recipe())
+    assert recipe["format"] == "CSV"
+    assert recipe["bias"]["vg_channel"] == 1 and recipe["bias"]["vd_channel"] == 2
+    assert recipe["iv"]["order"] == "As entered"
+
+
+def test_every_problem_is_reported_at_once():
+    raw = iv_recipe(vd_step="one", vg_dwell=-1, colour="red")
+    del raw["iv"]["vg_start"]
+    raw["bias"] = {"vg_channel": 5}
+    raw["format"] = "XLS"
+    with pytest.raises(recipes.RecipeError) as e:
+        validate_recipe(raw)
+    message = str(e.value)
+    for problem in ("iv.vg_start is required", "iv.vd_step must be a number", "iv.vg_dwell must not be negative",
+                    "unknown key iv.colour", "bias.vg_channel must be 1..4", "format must be one of"):
+        assert problem in message
+
+
+def test_rf_sweep_needs_bias_and_no_iv_section():
+    raw = {"sweep": "rf", "rf": {"freq_hz": 1e9, "power_start": -10, "power_stop": 0, "power_step": 1},
+           "iv": {}}
+    with pytest.raises(recipes.RecipeError) as e:
+        validate_recipe(raw)
+    assert "bias.vg is required for an rf sweep" in str(e.value)
+    assert "\"iv\" section given for a rf sweep" in str(e.value)
+
+
+def test_compile_refuses_axes_beyond_the_limits_or_pointing_away():
+    raw = iv_recipe(vd_stop=12)
+    raw["limits"] = {"vd_max": 10}
+    with pytest.raises(recipes.RecipeError, match="exceeds limits.vd_max"):
+        compile_recipe(validate_recipe(raw))
+    with pytest.raises(recipes.RecipeError, match="points away"):
+        compile_recipe(validate_recipe(iv_recipe(vg_step=-1)))
+
+
+def rf_recipe(**rf):
+    section = {"freq_hz": 1e9, "power_start": -10, "power_stop": 0, "power_step": 5}
+    section.update(rf)
+    return {"name": "t", "sweep": "rf", "bias": {"vg": -1, "vd": 5}, "rf": section}
+
+
+def test_log_frequency_axis():
+    plan = compile_recipe(validate_recipe(rf_recipe(freq_stop_hz=1e10, freq_spacing="Log", freq_points=3)))
+    assert plan.freqs == pytest.approx((1e9, 10 ** 9.5, 1e10))
+    assert plan.total_points == 9
+    assert plan.sweep_plan().rf_freqs == pytest.approx([1e9, 10 ** 9.5, 1e10])
+
+
+def test_log_frequency_axis_needs_points_and_no_step():
+    with pytest.raises(recipes.RecipeError) as e:
+        validate_recipe(rf_recipe(freq_stop_hz=1e10, freq_step_hz=1e9, freq_spacing="Log"))
+    assert "needs freq_stop_hz and freq_points" in str(e.value)
+    assert "freq_step_hz does not apply" in str(e.value)
+    with pytest.raises(recipes.RecipeError, match="freq_points only applies"):
+        validate_recipe(rf_recipe(freq_points=3))
+
+
+def test_zero_frequency_step_is_refused():
+    with pytest.raises(recipes.RecipeError, match="rf.freq_step_hz must not be zero"):
+        compile_recipe(validate_recipe(rf_recipe(freq_stop_hz=2e9, freq_step_hz=0)))
@@ -0,0 +1,57 @@
+from records import CompressionReference, rf_derived
+
+
+def row(point, gain):
+    return {"point": point, "gain": gain}
+
+
+def test_compression_resets_per_segment():
+    ref = CompressionReference([-10, 0, 10])
+    rows = [row(point, gain) for point, gain in enumerate([15.0, 14.5, 13.0, 12.0, 11.75, 11.0])]
+    for values in rows:
+        assert ref.add(values) == []
+    assert [r["compression"] for r in rows] == [0.0, 0.5, 2.0, 0.0, 0.25, 1.0]
+    assert ref.unfilled == 0
+
+
+def test_descending_segment_is_completed_when_its_reference_arrives():
+    # Serpentine: the second segment runs from the top power down. Its rows
+    # are handed back straight away without compression, then filled in.
+    ref = CompressionReference([-10, 0, 10])
+    first = row(0, 15.0)
+    assert ref.add(first) == [] and first["compression"] == 0.0
+    top, middle = row(5, 11.0), row(4, 11.75)
+    assert ref.add(top) == [] and "compression" not in top
+    assert ref.add(middle) == []
+    bottom = row(3, 12.0)
+    late = ref.add(bottom)
+    assert late == [top, middle]
+    assert [r["compression"] for r in (top, middle, bottom)] == [1.0, 0.25, 0.0]
+    assert ref.unfilled == 2
+
+
+def test_fill_completes_rows_read_back_from_the_file():
+    ref = CompressionReference([10, 0, -10])
+    ref.add(row(0, 11.0))
+    ref.add(row(1, 11.5))
+    ref.add(row(2, 12.0))
+    ref.add(row(3, 13.0))  # next segment, stopped before its reference
+    on_disk = [dict(row(p, g), compression=float("nan")) for p, g in ((0, 11.0), (1, 11.5), (2, 12.0), (3, 13.0))]
+    assert ref.fill(on_disk) == 3
+    assert [r["compression"] for r in on_disk[:3]] == [1.0, 0.5, 0.0]
+    assert on_disk[3]["compression"] != on_disk[3]["compression"]
+
+
+def test_resumed_rows_seed_the_reference():
+    ref = CompressionReference([-10, 0, 10])
+    ref.seed(dict(row(3.0, 12.0), compression=0.0))
+    values = row(4, 11.5)
+    ref.add(values)
+    assert values["compression"] == 0.5
+    assert ref.unfilled == 0
+
+
+def test_rf_derived_needs_both_powers():
+    assert rf_derived(None, 5.0, 5.0, 0.1) == {}
+    values = rf_derived(0.0, 10.0, 5.0, 0.1, input_loss_db=1.0, output_loss_db=2.0)
+    assert values["gain"] == 13.0
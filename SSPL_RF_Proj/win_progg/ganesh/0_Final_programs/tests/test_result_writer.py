@@ -0,0 +1,83 @@
+import time
+
+from records import CompressionReference
+from result_writer import ResultWriter, CsvSink
+
+COLUMNS = ["timestamp", "vg", "vd", "current", "point"]
+
+
+def write_run(path, rows):
+    writer = ResultWriter(str(path), COLUMNS)
+    writer.open()
+    writer.start()
+    for k in range(rows):
+        writer.write({"timestamp": 1000.0 + k, "vg": -1.0, "vd": float(k), "current": 0.01 * k, "point": k})
+    writer.close()
+
+
+def test_existing_rows_reads_whole_lines_only_and_leaves_the_file_alone(tmp_path):
+    path = tmp_path / "run.csv"
+    write_run(path, 3)
+    with open(path, "ab") as f:
+        f.write(b"1003.0,-1.0,3.")  # interrupted write
+    before = path.read_bytes()
+    rows = CsvSink(str(path), COLUMNS).existing_rows()
+    assert [r["point"] for r in rows] == [0.0, 1.0, 2.0]
+    assert path.read_bytes() == before
+
+
+def test_resume_drops_the_partial_line_and_appends(tmp_path):
+    path = tmp_path / "run.csv"
+    write_run(path, 3)
+    with open(path, "ab") as f:
+        f.write(b"1003.0,-1.0,3.")
+    writer = ResultWriter(str(path), COLUMNS)
+    assert writer.open(resume=True) == 3
+    writer.start()
+    writer.write({"timestamp": 1003.0, "vg": -1.0, "vd": 3.0, "current": 0.03, "point": 3})
+    writer.close()
+    lines = path.read_text().splitlines()
+    assert lines[0] == ",".join(COLUMNS)
+    assert [float(line.split(",")[-1]) for line in lines[1:]] == [0.0, 1.0, 2.0, 3.0]
+
+
+def test_fresh_open_overwrites(tmp_path):
+    path = tmp_path / "run.csv"
+    write_run(path, 3)
+    write_run(path, 1)
+    assert len(CsvSink(str(path), COLUMNS).existing_rows()) == 1
+
+
+def test_close_sorts_a_reordered_run_back_to_canonical_order(tmp_path):
+    path = tmp_path / "run.csv"
+    writer = ResultWriter(str(path), COLUMNS)
+    writer.open()
+    writer.start()
+    for point in (2, 0, 1):
+        writer.write({"timestamp": 0.0, "vg": 0.0, "vd": 0.0, "current": None, "point": point})
+    writer.close(sort_by="point")
+    rows = CsvSink(str(path), COLUMNS).existing_rows()
+    assert [r["point"] for r in rows] == [0.0, 1.0, 2.0]
+    assert rows[0]["current"] != rows[0]["current"]  # missing value reads back as NaN
+
+
+def test_rows_are_on_disk_before_close_and_filled_in_at_close(tmp_path):
+    # A descending segment: compression is known only after its last row
+    columns = ["point", "gain", "compression"]
+    path = tmp_path / "rf.csv"
+    writer = ResultWriter(str(path), columns, flush_interval=0.01)
+    writer.open()
+    writer.start()
+    ref = CompressionReference([10, 0, -10])
+    for point, gain in ((0, 11.0), (1, 11.5)):
+        values = {"point": point, "gain": gain}
+        ref.add(values)
+        writer.write(values)
+    time.sleep(0.2)
+    assert len(CsvSink(str(path), columns).existing_rows()) == 2  # nothing held back
+    values = {"point": 2, "gain": 12.0}
+    ref.add(values)
+    writer.write(values)
+    writer.close(fill=ref.fill)
+    rows = CsvSink(str(path), columns).existing_rows()
+    assert [r["compression"] for r in rows] == [1.0, 0.5, 0.0]
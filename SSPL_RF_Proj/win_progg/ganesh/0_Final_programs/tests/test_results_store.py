@@ -0,0 +1,38 @@
+import numpy as np
+
+from results_store import ColumnStore
+
+
+def store(capacity=2):
+    return ColumnStore([("point", np.int64), ("gain", np.float64)], capacity=capacity)
+
+
+def test_append_grows_and_keeps_rows():
+    s = store()
+    for k in range(5):
+        s.append({"point": k, "gain": k * 0.5})
+    assert len(s) == 5
+    assert s.column("point").tolist() == [0, 1, 2, 3, 4]
+    assert s.value(3, "gain") == 1.5
+
+
+def test_missing_float_is_nan():
+    s = store()
+    s.append({"point": 0})
+    assert np.isnan(s.value(0, "gain"))
+
+
+def test_sort_by_is_stable_and_moves_every_column():
+    s = store()
+    for point, gain in [(2, 1.0), (0, 2.0), (1, 3.0), (0, 4.0)]:
+        s.append({"point": point, "gain": gain})
+    s.sort_by("point")
+    assert s.column("point").tolist() == [0, 0, 1, 2]
+    assert s.column("gain").tolist() == [2.0, 4.0, 3.0, 1.0]
+
+
+def test_clear():
+    s = store()
+    s.append({"point": 0, "gain": 1.0})
+    s.clear()
+    assert len(s) == 0 and s.column("gain").size == 0
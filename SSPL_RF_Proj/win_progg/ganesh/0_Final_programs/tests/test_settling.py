@@ -0,0 +1,33 @@
+import itertools
+
+import pytest
+
+from settling import SettleConfig, AdaptiveSettle, OpcSettle, create_settler, OPC_TYPICAL_TIME
+
+
+def test_adaptive_settle_times_out_on_a_drifting_reading():
+    values = itertools.count(0.0, 1.0)
+    settler = AdaptiveSettle([("Id", lambda: next(values), 0.01, True)], interval=0.01, max_time=0.05)
+    elapsed = settler.settle()
+    assert settler.timed_out
+    assert elapsed >= 0.05
+
+
+def test_adaptive_settle_returns_once_stable():
+    settler = AdaptiveSettle([("Pout", lambda: 10.0, 0.05, False)], interval=0.01, max_time=1.0)
+    assert settler.settle() < 0.5
+    assert not settler.timed_out
+
+
+def test_estimate_costs_per_mode():
+    fixed = SettleConfig(mode="Fixed", delay=0.5)
+    assert fixed.typical_time() == fixed.worst_time() == 0.5
+    adaptive = SettleConfig(mode="Adaptive", max_time=3.0, interval=0.05)
+    assert adaptive.typical_time() == pytest.approx(0.15) and adaptive.worst_time() == 3.0
+    opc = SettleConfig(mode="OPC", opc_timeout_ms=2000)
+    assert opc.typical_time() == OPC_TYPICAL_TIME and opc.worst_time() == 2.0
+
+
+def test_opc_settler_uses_the_configured_timeout():
+    settler = create_settler(SettleConfig(mode="OPC", opc_timeout_ms=2000), opc_instr=object())
+    assert isinstance(settler, OpcSettle) and settler.timeout_ms == 2000
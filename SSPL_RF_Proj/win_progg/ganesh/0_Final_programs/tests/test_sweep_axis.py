@@ -0,0 +1,44 @@
+import pytest
+
+from sweep_axis import linear_axis, log_axis, list_axis, adaptive_axis, axis_index, step_count
+
+
+def test_linear_axis_keeps_the_end_point():
+    assert linear_axis(0.0, 1.0, 0.1).tolist() == [0.0, 0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0]
+    assert linear_axis(-20, 10, 0.5)[-1] == 10.0
+    assert linear_axis(5, 0, -1).tolist() == [5, 4, 3, 2, 1, 0]
+
+
+def test_linear_axis_stops_before_an_off_grid_end():
+    assert linear_axis(0, 1, 0.3).tolist() == [0.0, 0.3, 0.6, 0.9]
+
+
+def test_step_away_from_stop_gives_no_points():
+    assert step_count(0, 1, -0.1) == -1
+    assert len(linear_axis(0, 1, -0.1)) == 0
+    with pytest.raises(ValueError):
+        step_count(0, 1, 0)
+
+
+def test_list_axis_parses_text():
+    assert list_axis("5, 10;15").tolist() == [5.0, 10.0, 15.0]
+
+
+def test_adaptive_axis_merges_the_fine_window_in_sweep_direction():
+    assert adaptive_axis(-3, 0, 1, 0.25, -2.5, -1.5).tolist() == [-3, -2.5, -2.25, -2, -1.75, -1.5, -1, 0]
+    assert adaptive_axis(0, -3, -1, 0.5, -1, -2).tolist() == [0, -1, -1.5, -2, -3]
+    # fine points outside the coarse range are dropped
+    assert adaptive_axis(0, 2, 1, 0.5, 1.5, 3).tolist() == [0, 1, 1.5, 2]
+
+
+def test_axis_index_looks_up_axis_values():
+    axis = linear_axis(0, 1, 0.1)
+    index = axis_index(axis)
+    assert index[float(axis[7])] == 7
+    assert index[0.7] == 7
+
+
+def test_log_axis_spans_decades():
+    assert log_axis(1e9, 1e11, 3) == pytest.approx([1e9, 1e10, 1e11])
+    with pytest.raises(ValueError):
+        log_axis(0, 1e9, 3)
@@ -0,0 +1,151 @@
+import itertools
+import threading
+
+import pytest
+
+from settling import SettleConfig
+from sim_instruments import SimResourceManager, NGP800_RESOURCE, EXG_RESOURCE, NRX_RESOURCE
+from sweep_engine import SweepEngine, SweepPlan
+from exg_list import ExgListSweep
+
+POWERS = [-10.0, -8.0, -6.0, -4.0, -2.0]
+
+
+@pytest.fixture
+def bench():
+    rm = SimResourceManager()
+    return [rm.open_resource(name) for name in (NGP800_RESOURCE, EXG_RESOURCE, NRX_RESOURCE)]
+
+
+def make_engine(bench, **kwargs):
+    ngp, exg, meter = bench
+    return SweepEngine(ngp, exg, meter, threading.Event(), threading.Event(), **kwargs)
+
+
+def rf_plan(powers=POWERS, **kwargs):
+    kwargs.setdefault("settle", SettleConfig(mode="Fixed", delay=0.0))
+    return SweepPlan(powers, -1.0, 5.0, "1", "2", rf_freq=1e9, **kwargs)
+
+
+def run(engine, plan):
+    # Runs the plan on the test thread; (records, log lines)
+    engine.run_plan(plan)
+    records, logs = [], []
+    while not engine.results.empty():
+        kind, payload = engine.results.get()
+        if kind == "record":
+            records.append(payload)
+        elif kind == "log":
+            logs.append(payload)
+    return records, logs
+
+
+def fail_bias_read(engine, call):
+    # read_bias raises on its call-th call
+    calls = [0]
+    read_bias = engine.read_bias
+
+    def failing(plan):
+        calls[0] += 1
+        if calls[0] == call:
+            raise RuntimeError("bias read failed")
+        return read_bias(plan)
+    engine.read_bias = failing
+
+
+def rising_current(engine, step=0.1):
+    # Drain current reads step, 2 * step, ... so curr_max trips part way
+    calls = [0]
+    read_bias = engine.read_bias
+
+    def rising(plan):
+        calls[0] += 1
+        bias = list(read_bias(plan))
+        bias[3] = step * calls[0]
+        return bias
+    engine.read_bias = rising
+
+
+def test_buffered_pout_stays_aligned_when_a_point_fails(bench):
+    engine = make_engine(bench)
+    fail_bias_read(engine, 3)
+    records, logs = run(engine, rf_plan(buffered_pout=True))
+    assert [r.power_in for r in records] == POWERS
+    assert all(r.power_out is not None for r in records)
+    assert records[2].current is None and records[3].current is not None
+    # Pout rises with Pin on the simulated DUT: each reading sits in its own slot
+    assert [r.power_out for r in records] == sorted(r.power_out for r in records)
+
+
+def test_buffered_pout_taken_before_a_trip_is_kept(bench):
+    engine = make_engine(bench)
+    rising_current(engine)
+    records, logs = run(engine, rf_plan(buffered_pout=True, curr_max=0.25))
+    assert engine.tripped
+    assert [r.power_in for r in records] == POWERS[:3]
+    assert all(r.power_out is not None for r in records)
+    assert any("Buffer incomplete (3/5)" in line for line in logs)
+    assert bench[2].buffer_on is False
+
+
+def list_plan(**kwargs):
+    return rf_plan(hardware_list=True, dwell=0.02, **kwargs)
+
+
+def test_hardware_list_records_every_point(bench):
+    engine = make_engine(bench, rf_control=ExgListSweep(bench[1]))
+    records, logs = run(engine, list_plan())
+    assert [r.power_in for r in records] == POWERS
+    assert all(r.power_out is not None and r.current is not None for r in records)
+    assert [r.power_out for r in records] == sorted(r.power_out for r in records)
+    assert engine.rf_switch_count == 2
+
+
+def test_hardware_list_trips_on_curr_max(bench):
+    engine = make_engine(bench, rf_control=ExgListSweep(bench[1]))
+    rising_current(engine)
+    plan = list_plan(curr_max=0.25, rf_freqs=[1e9, 2e9])
+    records, logs = run(engine, plan)
+    assert engine.tripped
+    assert any(line.startswith("[TRIP]") for line in logs)
+    # The list is aborted, RF is off and the second frequency never starts
+    exg = bench[1]
+    assert "ABOR" in exg.log and exg.log[-1] == "OUTP OFF"
+    assert engine.ngp.output == {}
+    assert "FREQ 2000000000.0 Hz" not in exg.log
+    assert records == []
+
+
+def test_adaptive_settle_timeout_is_logged_and_the_point_still_measured(bench):
+    engine = make_engine(bench)
+    drift = itertools.count(0.1, 0.1)
+    engine.read_current = lambda plan: next(drift)
+    settle = SettleConfig(mode="Adaptive", max_time=0.03, interval=0.01)
+    records, logs = run(engine, rf_plan(POWERS[:2], settle=settle))
+    assert len(records) == 2
+    assert sum(line.startswith("[WARNING] Not settled within 0.03 s") for line in logs) == 2
+    assert all(r.settle_s >= 0.03 for r in records)
+
+
+@pytest.mark.parametrize("mode, every, verified", [
+    ("First/Last", 10, [0, 4]),
+    ("Every N", 2, [0, 2, 4]),
+    ("Every N", 3, [0, 3, 4]),
+    ("Off", 10, []),
+])
+def test_exg_is_read_back_only_on_verification_points(bench, mode, every, verified):
+    engine = make_engine(bench)
+    records, logs = run(engine, rf_plan(verify_rf=mode, verify_every=every))
+    exg = bench[1]
+    assert exg.log.count("POW?") == len(verified) and exg.log.count("FREQ?") == len(verified)
+    assert sum(line.startswith("[VERIFY]") for line in logs) == len(verified)
+    # records carry the commanded values either way
+    assert [r.power_in for r in records] == POWERS and all(r.freq == 1e9 for r in records)
+
+
+def test_exg_readback_mismatch_is_warned(bench):
+    engine = make_engine(bench)
+    engine.read_rf_settings = lambda: (1e9, -3.0)
+    records, logs = run(engine, rf_plan(POWERS[:1]))
+    assert any("EXG readback 1000000000.0 Hz / -3.0 dBm differs" in line for line in logs)
+    assert records[0].power_in == POWERS[0]
@@ -0,0 +1,79 @@
+import pytest
+
+from settling import SettleConfig
+from sweep_engine import SweepPlan
+from sweep_planner import Axis, GridPlan, compile_grid
+
+
+def rf_plan(settle):
+    return SweepPlan([-10.0, -5.0, 0.0], -1.0, 5.0, "1", "2", settle=settle, rf_freq=1e9,
+                     axis_costs={"freq": 0.0, "bias": 0.0, "power": 0.0})
+
+
+def test_adaptive_estimate_is_typical_with_the_limit_as_upper_bound():
+    grid = rf_plan(SettleConfig(mode="Adaptive", max_time=3.0, interval=0.05)).grid()
+    assert grid.estimate() == pytest.approx(3 * 0.15)
+    assert grid.estimate(worst=True) == pytest.approx(3 * 3.0)
+    assert grid.format_estimate() == "00:00 (at most 00:09)"
+
+
+def test_fixed_estimate_has_no_upper_bound():
+    grid = rf_plan(SettleConfig(mode="Fixed", delay=2.0)).grid()
+    assert grid.estimate() == grid.estimate(worst=True) == pytest.approx(6.0)
+    assert grid.format_estimate() == "00:06"
+
+
+def axes():
+    # Canonical order freq, bias, power; freq slowest to change
+    return [Axis("freq", [1e9, 2e9], 0.5), Axis("bias", [4.0, 5.0], 0.3), Axis("power", [-10, -5, 0], 0.02)]
+
+
+def test_slow_axis_outer_nests_by_change_cost():
+    grid = GridPlan([Axis("power", [-10, 0], 0.02), Axis("freq", [1e9, 2e9], 0.5)], "Slow axis outer")
+    assert [a.name for a in grid.axes] == ["freq", "power"]
+    assert [grid.point(k) for k in range(4)] == [
+        {"freq": 1e9, "power": -10}, {"freq": 1e9, "power": 0},
+        {"freq": 2e9, "power": -10}, {"freq": 2e9, "power": 0}]
+    # canonical order is power outer, so every point maps elsewhere
+    assert [grid.canonical_index(k) for k in range(4)] == [0, 2, 1, 3]
+    assert grid.reordered()
+
+
+def test_as_entered_keeps_the_canonical_order():
+    grid = GridPlan(axes(), "As entered")
+    assert [grid.canonical_index(k) for k in range(grid.total)] == list(range(12))
+    assert not grid.reordered()
+
+
+def test_serpentine_runs_inner_axes_back_and_forth():
+    grid = GridPlan(axes(), "Serpentine")
+    powers = [grid.point(k)["power"] for k in range(grid.total)]
+    assert powers == [-10, -5, 0, 0, -5, -10] * 2
+    assert [grid.point(k)["bias"] for k in range(0, 12, 3)] == [4.0, 5.0, 5.0, 4.0]
+    # every canonical point is visited exactly once, and // n_powers is its segment
+    canonical = [grid.canonical_index(k) for k in range(grid.total)]
+    assert sorted(canonical) == list(range(12))
+    assert [c // 3 for c in canonical] == [0, 0, 0, 1, 1, 1, 3, 3, 3, 2, 2, 2]
+    assert all(max(abs(a - b) for a, b in zip(grid.index(k), grid.index(k + 1))) == 1 for k in range(11))
+
+
+def test_auto_picks_the_cheapest_order():
+    grid = compile_grid([Axis("power", [-10, -5, 0], 0.02), Axis("freq", [1e9, 2e9, 3e9], 0.5)], "Auto")
+    assert grid.axes[0].name == "freq"
+    assert grid.estimate() == min(GridPlan(grid.canonical, o).estimate()
+                                  for o in ("Slow axis outer", "Serpentine", "As entered"))
+
+
+def test_segments_and_resume_start():
+    grid = GridPlan(axes(), "Slow axis outer")
+    segments = list(grid.segments("power"))
+    assert len(segments) == 4
+    assert segments[1] == (3, {"freq": 1e9, "bias": 5.0}, [-10, -5, 0])
+    assert list(grid.segments("power", start=4))[0] == (4, {"freq": 1e9, "bias": 5.0}, [-5, 0])
+    assert grid.changes() == {"freq": 1, "bias": 3, "power": 11}
+
+
+def test_opc_estimate_is_one_round_trip_with_the_timeout_as_upper_bound():
+    grid = rf_plan(SettleConfig(mode="OPC")).grid()
+    assert grid.estimate() == pytest.approx(3 * 0.01)
+    assert grid.estimate(worst=True) == pytest.approx(3 * 5.0)
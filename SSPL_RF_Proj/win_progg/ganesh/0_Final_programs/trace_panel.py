@@ -0,0 +1,134 @@
+import numpy as np
+import pyqtgraph as pg
+from PyQt6.QtCore import QTimer
+from PyQt6.QtWidgets import (
+    QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QCheckBox, QLabel, QComboBox,
+    QTableWidget, QTableWidgetItem, QFileDialog, QHeaderView
+)
+
+from visa_trace import get_trace, HISTOGRAM_EDGES
+
+
+TRACE_COLORS = ["c", "m", "y", "g", "r", "b", "w"]
+SUMMARY_COLUMNS = ["Instrument", "Command", "Count", "Total (s)", "Mean (ms)", "p95 (ms)", "Max (ms)",
+                   "Bytes", "Timeouts", "Errors"]
+
+
+class TracePanel(QWidget):
+    # Live view of the VISA trace: latency histogram per instrument and the
+    # commands that cost the most time, refreshed once a second while shown.
+    # "Export..." writes the buffer as Chrome trace JSON for a timeline view.
+
+    def __init__(self, trace=None, parent=None, interval_ms=1000):
+        super().__init__(parent)
+        self.trace = trace or get_trace()
+        self.setWindowTitle("VISA Trace")
+        self.resize(900, 650)
+        layout = QVBoxLayout(self)
+
+        controls = QHBoxLayout()
+        self.record_check = QCheckBox("Record")
+        self.record_check.setChecked(self.trace.enabled)
+        self.record_check.toggled.connect(self.set_recording)
+        controls.addWidget(self.record_check)
+        controls.addWidget(QLabel("Instrument:"))
+        self.instrument_combo = QComboBox()
+        self.instrument_combo.addItem("All")
+        self.instrument_combo.currentTextChanged.connect(self.refresh)
+        controls.addWidget(self.instrument_combo)
+        clear_button = QPushButton("Clear")
+        clear_button.clicked.connect(self.clear)
+        controls.addWidget(clear_button)
+        export_button = QPushButton("Export...")
+        export_button.clicked.connect(self.export)
+        controls.addWidget(export_button)
+        controls.addStretch()
+        self.status_label = QLabel("")
+        controls.addWidget(self.status_label)
+        layout.addLayout(controls)
+
+        self.plot = pg.PlotWidget()
+        self.plot.setLogMode(x=True, y=False)
+        self.plot.setLabel("bottom", "Call latency (s)")
+        self.plot.setLabel("left", "Calls")
+        self.plot.addLegend()
+        layout.addWidget(self.plot, 2)
+        self.curves = {}
+
+        self.table = QTableWidget(0, len(SUMMARY_COLUMNS))
+        self.table.setHorizontalHeaderLabels(SUMMARY_COLUMNS)
+        self.table.horizontalHeader().setSectionResizeMode(1, QHeaderView.ResizeMode.Stretch)
+        self.table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        layout.addWidget(self.table, 1)
+
+        self.timer = QTimer(self)
+        self.timer.setInterval(interval_ms)
+        self.timer.timeout.connect(self.refresh)
+
+    def showEvent(self, event):
+        self.refresh()
+        self.timer.start()
+        super().showEvent(event)
+
+    def hideEvent(self, event):
+        self.timer.stop()
+        super().hideEvent(event)
+
+    def set_recording(self, on):
+        self.trace.enabled = on
+
+    def clear(self):
+        self.trace.clear()
+        self.refresh()
+
+    def selected_events(self):
+        events = self.trace.events()
+        name = self.instrument_combo.currentText()
+        if name != "All":
+            events = [e for e in events if e.instrument == name]
+        return events
+
+    def update_instruments(self):
+        names = self.trace.instruments()
+        known = [self.instrument_combo.itemText(i) for i in range(1, self.instrument_combo.count())]
+        for name in names:
+            if name not in known:
+                self.instrument_combo.addItem(name)
+
+    def refresh(self):
+        self.update_instruments()
+        events = self.selected_events()
+
+        histogram = self.trace.histogram(events)
+        for name in histogram:
+            if name not in self.curves:
+                pen = TRACE_COLORS[len(self.curves) % len(TRACE_COLORS)]
+                self.curves[name] = self.plot.plot(stepMode="center", fillLevel=0, pen=pg.mkPen(pen, width=2),
+                                                   brush=pg.mkBrush(pen), name=name)
+        empty = np.zeros(len(HISTOGRAM_EDGES) - 1)
+        for name, curve in self.curves.items():
+            curve.setData(HISTOGRAM_EDGES, histogram.get(name, empty))
+
+        rows = self.trace.summary(events)
+        self.table.setRowCount(len(rows))
+        for r, row in enumerate(rows):
+            cells = [row["instrument"], row["command"], row["count"], f"{row['total_s']:.3f}",
+                     f"{row['mean_s'] * 1000:.3f}", f"{row['p95_s'] * 1000:.3f}", f"{row['max_s'] * 1000:.3f}",
+                     row["bytes"], row["timeouts"], row["errors"]]
+            for c, value in enumerate(cells):
+                self.table.setItem(r, c, QTableWidgetItem(str(value)))
+
+        total = sum(e.duration for e in events)
+        dropped = f", {self.trace.dropped} dropped" if self.trace.dropped else ""
+        self.status_label.setText(f"{len(events)} calls, {total:.2f} s on the bus{dropped}")
+
+    def export(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Export VISA Trace", "visa_trace.json",
+                                              "Chrome trace (*.json);;All Files (*)")
+        if not path:
+            return
+        try:
+            count = self.trace.export_chrome(path, self.selected_events())
+            self.status_label.setText(f"Exported {count} calls to {path}")
+        except Exception as e:
+            self.status_label.setText(f"Export failed: {e}")
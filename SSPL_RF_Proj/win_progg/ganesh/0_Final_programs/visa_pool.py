@@ -0,0 +1,120 @@
+import threading
+from contextlib import contextmanager
+
+import pyvisa
+
+import sim_instruments
+from visa_trace import TracedSession, get_trace
+
+
+class VisaPool:
+    # Process-wide VISA sessions keyed by resource string. A resource is opened
+    # (and asked *IDN?) once; every screen and tool after that gets the same
+    # session. lease() hands the session out under a per-resource lock so a
+    # multi-command exchange (select + set, write + read) is never interleaved
+    # with another thread's. Sessions are handed out wrapped in a
+    # TracedSession, so every call is timed in the trace (visa_trace).
+
+    def __init__(self, rm=None, trace=None):
+        self.rm = rm
+        self.trace = trace if trace is not None else get_trace()
+        self._lock = threading.Lock()
+        self._sessions = {}
+        self._idns = {}
+        self._locks = {}
+
+    def resource_manager(self):
+        # SSPL_RF_SIM=1 swaps the VISA library for the simulated bench
+        with self._lock:
+            if self.rm is None:
+                if sim_instruments.simulation_enabled():
+                    self.rm = sim_instruments.resource_manager_from_env()
+                else:
+                    self.rm = pyvisa.ResourceManager()
+            return self.rm
+
+    def list_resources(self):
+        return self.resource_manager().list_resources()
+
+    @staticmethod
+    def key(resource):
+        # Resource string, or an open session (anything with resource_name)
+        return getattr(resource, "resource_name", resource)
+
+    def lock(self, resource):
+        key = self.key(resource)
+        with self._lock:
+            if key not in self._locks:
+                self._locks[key] = threading.RLock()
+            return self._locks[key]
+
+    @contextmanager
+    def lease(self, resource):
+        with self.lock(resource):
+            if isinstance(resource, str):
+                yield self.open(resource)
+            else:
+                yield resource
+
+    def open(self, resource, setup=None):
+        # setup(session) runs once when the session is first opened
+        with self.lock(resource):
+            session = self._sessions.get(resource)
+            if session is None:
+                session = TracedSession(self.resource_manager().open_resource(resource), self.trace)
+                if setup:
+                    setup(session)
+                self._sessions[resource] = session
+            return session
+
+    def identify(self, resource, setup=None):
+        # (session, idn); *IDN? is only sent the first time a resource is seen
+        with self.lock(resource):
+            if resource in self._idns and resource in self._sessions:
+                return self._sessions[resource], self._idns[resource]
+            session = self.open(resource, setup)
+            try:
+                idn = session.query("*IDN?").strip()
+            except Exception:
+                self.close(resource)
+                raise
+            self._idns[resource] = idn
+            # Trace under the model name ("NGP800") instead of the resource string
+            fields = idn.split(",")
+            if len(fields) > 1 and fields[1].strip():
+                session.name = fields[1].strip()
+            return session, idn
+
+    def idn(self, resource):
+        return self._idns.get(self.key(resource))
+
+    def sessions(self):
+        with self._lock:
+            return dict(self._sessions)
+
+    def close(self, resource):
+        key = self.key(resource)
+        with self.lock(key):
+            session = self._sessions.pop(key, None)
+            self._idns.pop(key, None)
+            if session is not None:
+                try:
+                    session.close()
+                except Exception:
+                    pass
+
+    def close_all(self):
+        for resource in list(self.sessions()):
+            self.close(resource)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = VisaPool()
+        return _pool
@@ -0,0 +1,226 @@
+import os
+import json
+import time
+import struct
+import threading
+from collections import deque
+
+import numpy as np
+from pyvisa import constants
+
+
+# Events kept per process; the oldest are dropped first
+DEFAULT_CAPACITY = int(os.environ.get("SSPL_RF_TRACE_CAPACITY", "100000"))
+
+# Latency histogram bin edges (s): log spaced from 10 us to 10 s
+HISTOGRAM_EDGES = np.logspace(-5, 1, 61)
+
+
+def command_key(message):
+    # Headers of a (compound) SCPI message, arguments dropped:
+    # "INST:NSEL 2;:VOLT 1.5;:OUTP ON" -> "INST:NSEL;VOLT;OUTP"
+    headers = []
+    for part in str(message).split(";"):
+        header = part.strip().lstrip(":").split(" ", 1)[0]
+        if header:
+            headers.append(header.upper())
+    return ";".join(headers)
+
+
+def is_timeout(error):
+    return isinstance(error, TimeoutError) or getattr(error, "error_code", None) == constants.StatusCode.error_timeout
+
+
+class TraceEvent:
+    # One session call. start is time.perf_counter(), duration in seconds;
+    # status is None, "timeout" or the error text.
+    __slots__ = ("instrument", "op", "command", "start", "duration", "bytes_out", "bytes_in",
+                 "thread", "status")
+
+    def __init__(self, instrument, op, command, start, duration, bytes_out, bytes_in, thread, status):
+        self.instrument = instrument
+        self.op = op
+        self.command = command
+        self.start = start
+        self.duration = duration
+        self.bytes_out = bytes_out
+        self.bytes_in = bytes_in
+        self.thread = thread
+        self.status = status
+
+    def __repr__(self):
+        return (f"TraceEvent({self.instrument} {self.op} {self.command!r}, {self.duration * 1000:.3f} ms"
+                + (f", {self.status}" if self.status else "") + ")")
+
+
+class VisaTrace:
+    # Bounded in-memory log of every traced session call. Appends are cheap
+    # (one lock, one deque append); summaries and exports work on a copy.
+
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self.enabled = capacity > 0
+        self._events = deque(maxlen=max(1, capacity))
+        self._lock = threading.Lock()
+        self.dropped = 0
+        # perf_counter / wall clock pair so exported timestamps can be dated
+        self.t0 = time.perf_counter()
+        self.wall0 = time.time()
+
+    def record(self, event):
+        with self._lock:
+            if len(self._events) == self._events.maxlen:
+                self.dropped += 1
+            self._events.append(event)
+
+    def events(self, since=None):
+        # Copy of the buffer; since=perf_counter time keeps only later events
+        with self._lock:
+            events = list(self._events)
+        if since is not None:
+            events = [e for e in events if e.start >= since]
+        return events
+
+    def clear(self):
+        with self._lock:
+            self._events.clear()
+            self.dropped = 0
+
+    def rename(self, old, new):
+        # Relabel an instrument's events (resource string -> model once identified)
+        with self._lock:
+            for e in self._events:
+                if e.instrument == old:
+                    e.instrument = new
+
+    def instruments(self):
+        return sorted({e.instrument for e in self.events()})
+
+    def summary(self, events=None):
+        # Per (instrument, command) statistics, most total time first
+        groups = {}
+        for e in self.events() if events is None else events:
+            groups.setdefault((e.instrument, e.command), []).append(e)
+        rows = []
+        for (instrument, command), group in groups.items():
+            durations = np.array([e.duration for e in group])
+            rows.append({
+                "instrument": instrument, "command": command, "count": len(group),
+                "total_s": float(durations.sum()), "mean_s": float(durations.mean()),
+                "p95_s": float(np.percentile(durations, 95)), "max_s": float(durations.max()),
+                "bytes": sum(e.bytes_out + e.bytes_in for e in group),
+                "timeouts": sum(1 for e in group if e.status == "timeout"),
+                "errors": sum(1 for e in group if e.status and e.status != "timeout"),
+            })
+        rows.sort(key=lambda r: r["total_s"], reverse=True)
+        return rows
+
+    def histogram(self, events=None, edges=HISTOGRAM_EDGES):
+        # {instrument: counts per latency bin}
+        by_instrument = {}
+        for e in self.events() if events is None else events:
+            by_instrument.setdefault(e.instrument, []).append(e.duration)
+        return {name: np.histogram(np.clip(d, edges[0], edges[-1]), edges)[0]
+                for name, d in by_instrument.items()}
+
+    def export_chrome(self, path, events=None):
+        # Chrome trace-event JSON (chrome://tracing, Perfetto): one track per
+        # instrument, one complete ("X") event per call
+        events = self.events() if events is None else events
+        tids = {}
+        trace_events = []
+        for e in events:
+            tid = tids.setdefault(e.instrument, len(tids) + 1)
+            event = {
+                "name": e.command or e.op, "cat": e.op, "ph": "X", "pid": 1, "tid": tid,
+                "ts": round((e.start - self.t0) * 1e6, 3), "dur": round(e.duration * 1e6, 3),
+                "args": {"thread": e.thread, "bytes_out": e.bytes_out, "bytes_in": e.bytes_in},
+            }
+            if e.status:
+                event["args"]["status"] = e.status
+                event["cname"] = "terrible"
+            trace_events.append(event)
+        meta = [{"name": "process_name", "ph": "M", "pid": 1, "args": {"name": "VISA"}}]
+        meta += [{"name": "thread_name", "ph": "M", "pid": 1, "tid": tid, "args": {"name": name}}
+                 for name, tid in tids.items()]
+        with open(path, "w") as f:
+            json.dump({
+                "traceEvents": meta + trace_events,
+                "displayTimeUnit": "ms",
+                "otherData": {"start_time": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.wall0)),
+                              "dropped_events": self.dropped},
+            }, f)
+        return len(trace_events)
+
+
+TRACED_METHODS = ("write", "read", "query", "query_binary_values")
+
+
+class TracedSession:
+    # Wraps a VISA session and records every write / read / query in a
+    # VisaTrace. Everything else (timeout, terminations, close, ...) goes
+    # straight to the session. name labels the instrument in the trace.
+
+    def __init__(self, session, trace, name=None):
+        object.__setattr__(self, "session", session)
+        object.__setattr__(self, "trace", trace)
+        object.__setattr__(self, "name", name or getattr(session, "resource_name", "?"))
+
+    def __getattr__(self, attr):
+        return getattr(self.session, attr)
+
+    def __setattr__(self, attr, value):
+        if attr == "name":
+            self.trace.rename(self.name, value)
+            object.__setattr__(self, attr, value)
+        elif attr in TRACED_METHODS:
+            # Replacing a traced call (e.g. a timing wrapper) wraps the traced one
+            object.__setattr__(self, attr, value)
+        else:
+            setattr(self.session, attr, value)
+
+    def _call(self, op, command, fn, args, kwargs, bytes_in=len):
+        trace = self.trace
+        if not trace.enabled:
+            return fn(*args, **kwargs)
+        status = None
+        result = None
+        start = time.perf_counter()
+        try:
+            result = fn(*args, **kwargs)
+            return result
+        except Exception as e:
+            status = "timeout" if is_timeout(e) else f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            duration = time.perf_counter() - start
+            out = len(command) if op in ("write", "query", "query_binary") else 0
+            trace.record(TraceEvent(self.name, op, command_key(command) if command else f"<{op}>",
+                                    start, duration, out, bytes_in(result) if result is not None else 0,
+                                    threading.current_thread().name, status))
+
+    def write(self, message, *args, **kwargs):
+        return self._call("write", message, self.session.write, (message,) + args, kwargs, bytes_in=lambda r: 0)
+
+    def read(self, *args, **kwargs):
+        return self._call("read", "", self.session.read, args, kwargs)
+
+    def query(self, message, *args, **kwargs):
+        return self._call("query", message, self.session.query, (message,) + args, kwargs)
+
+    def query_binary_values(self, message, *args, **kwargs):
+        datatype = kwargs.get("datatype", args[0] if args else "f")
+        return self._call("query_binary", message, self.session.query_binary_values, (message,) + args, kwargs,
+                          bytes_in=lambda r: len(r) * struct.calcsize(datatype))
+
+
+_trace = None
+_trace_lock = threading.Lock()
+
+
+def get_trace():
+    global _trace
+    with _trace_lock:
+        if _trace is None:
+            _trace = VisaTrace()
+        return _trace